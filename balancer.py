@@ -1,33 +1,68 @@
 #!/usr/bin/python3
+import asyncio
 import calendar
 import configparser
 import datetime
+import functools
+import hashlib
+import heapq
 import inspect
+import json
 import logging
+import math
 import os
 import pickle
 import random
-import smtplib
 import socket
+import statistics
 import sys
+import threading
 import time
-from email import encoders
-from email.mime.base import MIMEBase
-from email.mime.multipart import MIMEMultipart
-from email.mime.text import MIMEText
+from collections import deque
 from logging.handlers import RotatingFileHandler
 from time import sleep
 
-import ccxt
-import requests
+IMPORT_STARTED = time.perf_counter()
+
+import ccxt  # noqa: E402 imported after IMPORT_STARTED to measure its duration
 
 MIN_ORDER_SIZE = 0.001
 MIN_FIAT_ORDER_SIZE = 100
+FEE_RATE = 0.01
+MARKET = None
+MARKETS_TTL_SECONDS = 86400
 INIT = False
 ORDER = None
 LAST_ORDER = None
+OPEN_ORDER = None
+LADDER = []
+LADDER_TARGET = None
+ORDER_SEQUENCE = 0
+RECONCILED = 0
+EXECUTION = None
+ORDER_STATE = None
+BAND = None
 BAL = {'cryptoBalance': 0, 'totalBalanceInCrypto': 0, 'price': 0}
-EMAIL_SENT = False
+SNAPSHOT = None
+TICKERS = {}
+FEED = None
+ADAPTER = None
+BREAKER = None
+VOLATILITY = None
+SCHEDULER = None
+MAYER = None
+MAYER_REMOTE = {'session': None, 'etag': None, 'modified': None, 'mayer': None}
+STREAM_MAX_AGE_SECONDS = 60
+FRESH_PRICE_MAX_AGE_SECONDS = 2
+REQUEST_BURST = 1
+PRIORITY_PREFIXES = ('create', 'cancel', 'edit')
+PRIVATE_PREFIXES = ('private_', 'create', 'cancel', 'edit', 'fetch_balance', 'fetch_order', 'fetch_open_orders',
+                    'fetch_closed_orders', 'fetch_my_trades', 'fetch_deposits', 'fetch_withdrawals', 'fetch_ledger',
+                    'fetch_positions', 'fetch_trading_fee')
+# exchanges authenticating with an increasing nonce, their private requests must not overtake each other
+NONCE_EXCHANGES = ['kraken', 'paymium']
+OPEN_ORDERS_PAGE = 20
+BAND_BISECTIONS = 20
 EMAIL_ONLY = False
 KEEP_ORDERS = False
 NO_LOG = False
@@ -38,7 +73,27 @@ STOP_ERRORS = ['order_size', 'smaller', 'MIN_NOTIONAL', 'nsufficient', 'too low'
                'exceeds account', 'price', 'nvalid arg', 'nvalid orderQty', 'Service Unavailable', 'ExchangeNotAvailable']
 ACCOUNT_ERRORS = ['account has been disabled', 'key is disabled', 'authentication failed', 'permission denied',
                   'invalid api key', 'access denied']
-RETRY_MESSAGE = 'Got an error %s %s, retrying in about 5 seconds...'
+RETRY_MESSAGE = 'Got an error %s %s, retrying in about %d seconds...'
+# maximal attempts of the endpoints whose callers cope with the default,
+# any other endpoint raises RetriesExhausted after DEFAULT_RETRY_LIMIT attempts
+RETRY_LIMITS = {'get_closed_order': 10, 'get_net_deposits': 10, 'set_leverage': 10}
+DEFAULT_RETRY_LIMIT = 12
+BACKOFF_SECONDS = 5
+MAX_BACKOFF_SECONDS = 300
+BREAKER_THRESHOLD = 5
+BREAKER_PAUSE_SECONDS = 900
+VOLATILITY_WINDOW_SECONDS = 7200
+CROSSING_DEVIATIONS = 2
+DEPOSIT_CHECK_SECONDS = 3600
+MAYER_REFRESH_SECONDS = 60
+MAYER_MAX_AGE_SECONDS = 900
+MAYER_URL = 'https://bitcoinition.com/current.json'
+MAYER_DAYS = 200
+DAY_MS = 86400000
+REPORT_TIME = datetime.time(12, 2)
+REPORT_DEADLINE = datetime.time(12, 25)
+FILL_POLL_SECONDS = 2
+MAX_FILL_POLL_SECONDS = 20
 NOT_IMPLEMENTED_MESSAGE = '%s is not implemented for %s'
 NA = 'n/a'
 
@@ -49,6 +104,16 @@ class ExchangeConfig:
         self.report_cadences = ['T', 'D', 'M', 'A']
         self.mayer_file = f'{DATA_DIR}mayer.avg'
         self.api_password = ''
+        self.ticker_max_age_seconds = 10
+        self.stream = False
+        self.reprice_orders = False
+        self.ladder_steps = 0
+        self.slice_modes = ['TWAP', 'ICEBERG']
+        self.slice_notional = 0
+        self.slice_mode = 'TWAP'
+        self.slice_window_minutes = 30
+        self.reconcile_minutes = 0
+        self.trigger_band_minutes = 0
         config = configparser.ConfigParser(interpolation=None)
         config.read(f'{DATA_DIR}{INSTANCE}.txt')
 
@@ -90,9 +155,35 @@ class ExchangeConfig:
             if self.report not in self.report_cadences:
                 raise SystemExit(f"Invalid value for report: '{self.report}' possible values are: {self.report_cadences}")
             self.period_in_seconds = round(self.period_in_minutes * 60)
+            self.min_period_in_seconds = self.period_in_seconds
+            self.max_period_in_seconds = self.period_in_seconds
             self.satoshi_factor = 0.00000001
             if config.has_option('config', 'mayer_file'):
                 self.mayer_file = str(props['mayer_file']).strip('"')
+            if config.has_option('config', 'ticker_max_age_seconds'):
+                self.ticker_max_age_seconds = abs(float(props['ticker_max_age_seconds']))
+            if config.has_option('config', 'stream'):
+                self.stream = bool(str(props['stream']).strip('"').lower() == 'true')
+            if config.has_option('config', 'reprice_orders'):
+                self.reprice_orders = bool(str(props['reprice_orders']).strip('"').lower() == 'true')
+            if config.has_option('config', 'ladder_steps'):
+                self.ladder_steps = abs(int(props['ladder_steps']))
+            if config.has_option('config', 'slice_notional'):
+                self.slice_notional = abs(float(props['slice_notional']))
+            if config.has_option('config', 'slice_mode'):
+                self.slice_mode = str(props['slice_mode']).strip('"').upper()
+            if self.slice_mode not in self.slice_modes:
+                raise SystemExit(f"Invalid value for slice_mode: '{self.slice_mode}' possible values are: {self.slice_modes}")
+            if config.has_option('config', 'slice_window_minutes'):
+                self.slice_window_minutes = abs(float(props['slice_window_minutes']))
+            if config.has_option('config', 'reconcile_minutes'):
+                self.reconcile_minutes = abs(float(props['reconcile_minutes']))
+            if config.has_option('config', 'trigger_band_minutes'):
+                self.trigger_band_minutes = abs(float(props['trigger_band_minutes']))
+            if config.has_option('config', 'min_period_in_minutes'):
+                self.min_period_in_seconds = round(abs(float(props['min_period_in_minutes'])) * 60)
+            if config.has_option('config', 'max_period_in_minutes'):
+                self.max_period_in_seconds = round(abs(float(props['max_period_in_minutes'])) * 60)
             self.recipient_addresses = str(props['recipient_addresses']).strip('"').replace(' ', '').split(",")
             self.sender_address = str(props['sender_address']).strip('"')
             self.sender_password = str(props['sender_password']).strip('"')
@@ -107,9 +198,13 @@ class Order:
     """
     Holds the relevant data of an order
     """
-    __slots__ = 'id', 'price', 'amount', 'side', 'datetime'
+    __slots__ = 'id', 'price', 'amount', 'side', 'datetime', 'filled', 'remaining', 'average', 'status'
 
     def __init__(self, ccxt_order, amount_fiat: float = None, amount_crypto: float = None, price: float = None):
+        self.filled = None
+        self.remaining = None
+        self.average = None
+        self.status = None
         if 'id' in ccxt_order:
             self.id = ccxt_order['id']
         elif 'uuid' in ccxt_order:
@@ -139,8 +234,964 @@ class Order:
         elif 'info' in ccxt_order:
             self.datetime = ccxt_order['info']['created_at']
 
+        self.update_fill(ccxt_order)
+
+    def update_fill(self, ccxt_order: dict):
+        """
+        Takes over the status and the filled amount of a unified ccxt order where provided
+        """
+        if ccxt_order.get('status'):
+            self.status = ccxt_order['status']
+        if ccxt_order.get('filled') is not None:
+            self.filled = ccxt_order['filled']
+            self.remaining = self.amount - self.filled if self.amount is not None else ccxt_order.get('remaining')
+        if ccxt_order.get('average'):
+            self.average = ccxt_order['average']
+
+    def is_partially_filled(self):
+        return bool(self.filled) and bool(self.remaining) and self.remaining > 0
+
     def __str__(self):
-        return f"{self.side}, price: {self.price}, amount: {self.amount}, order id: {self.id}, created: {self.datetime}"
+        filled = f", filled: {self.filled}" if self.is_partially_filled() else ''
+        return f"{self.side}, price: {self.price}, amount: {self.amount}{filled}, order id: {self.id}, " \
+               f"created: {self.datetime}"
+
+
+class AccountSnapshot:
+    """
+    Holds the balances and positions fetched once per cycle
+    """
+    __slots__ = 'balance', 'positions', 'trade_balance'
+
+    def __init__(self):
+        self.balance = None
+        self.positions = None
+        self.trade_balance = None
+
+    def invalidate(self):
+        self.balance = None
+        self.positions = None
+        self.trade_balance = None
+
+
+class TradeBalance:
+    """
+    Holds the kraken trade balance (TradeBalance endpoint) of the base currency
+    """
+    __slots__ = 'equity', 'free_margin', 'used_margin', 'margin_level', 'trade_balance'
+
+    def __init__(self, result: dict):
+        self.equity = float(result['e']) if 'e' in result else 0
+        self.free_margin = float(result['mf']) if 'mf' in result else 0
+        self.used_margin = float(result['m']) if 'm' in result else 0
+        # the margin level is only present while positions are open
+        self.margin_level = float(result['ml']) if 'ml' in result else 0
+        self.trade_balance = float(result['tb']) if 'tb' in result else 0
+
+
+class RetriesExhausted(Exception):
+    """
+    Raised when an exchange call kept failing, the current cycle is abandoned
+    """
+    def __init__(self, endpoint: str, attempts: int):
+        super().__init__(f'{endpoint} failed {attempts} times')
+        self.endpoint = endpoint
+
+
+class CircuitBreaker:
+    """
+    Counts consecutive network errors and pauses the bot while the exchange seems to be unavailable
+    """
+
+    def __init__(self, threshold: int, pause_seconds: int):
+        self.threshold = threshold
+        self.pause_seconds = pause_seconds
+        self.failures = 0
+
+    def record(self, error: Exception = None):
+        """
+        :param error: the error of the last request or None if it succeeded
+        """
+        self.failures = self.failures + 1 if isinstance(error, ccxt.NetworkError) else 0
+
+    def is_open(self):
+        return self.failures >= self.threshold
+
+    def pause(self):
+        LOG.warning('Exchange unreachable after %d attempts, pausing for %d seconds', self.failures, self.pause_seconds)
+        sleep_for(self.pause_seconds)
+        # half open, the next failure opens the breaker again
+        self.failures = self.threshold - 1
+
+
+class VolatilityEstimator:
+    """
+    Estimates the realised volatility from the prices observed over the last window_seconds
+    """
+
+    def __init__(self, window_seconds: int):
+        self.window_seconds = window_seconds
+        self.prices = []
+
+    def observe(self, price: float):
+        if not price:
+            return
+        now = time.time()
+        self.prices.append((now, price))
+        while self.prices[0][0] < now - self.window_seconds:
+            self.prices.pop(0)
+
+    def last_price(self):
+        return self.prices[-1][1] if self.prices else None
+
+    def variance_per_second(self):
+        """
+        :return: the variance of the log returns per second or None with less than three observations
+        """
+        if len(self.prices) < 3 or self.prices[-1][0] <= self.prices[0][0]:
+            return None
+        squares = sum(math.log(price / previous[1]) ** 2 for previous, (_, price) in zip(self.prices, self.prices[1:]))
+        return squares / (self.prices[-1][0] - self.prices[0][0])
+
+
+class Scheduler:
+    """
+    Runs jobs at their due time, the job due next is on top of a min-heap
+    A job returns the time it is due again, None ends the run
+    """
+
+    def __init__(self):
+        self.jobs = []
+        self.sequence = 0
+
+    def schedule(self, name: str, job, due: float = None):
+        heapq.heappush(self.jobs, (time.time() if due is None else due, self.sequence, name, job))
+        self.sequence += 1
+
+    def reschedule(self, name: str, due: float = None):
+        """
+        Moves the scheduled job to the given time, now by default
+        """
+        for i, (_, sequence, scheduled, job) in enumerate(self.jobs):
+            if scheduled == name:
+                self.jobs[i] = (time.time() if due is None else due, sequence, scheduled, job)
+                heapq.heapify(self.jobs)
+                return
+
+    def run(self):
+        while self.jobs:
+            due, _, name, job = heapq.heappop(self.jobs)
+            sleep_for(max(due - time.time(), 0))
+            due = job()
+            if due is None:
+                return
+            self.schedule(name, job, due)
+
+
+class RequestBudget:
+    """
+    Token bucket pacing the requests sent to an exchange
+    Order requests (priority lane) are served before queries
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.timestamp = time.monotonic()
+        self.waiting_orders = 0
+        self.condition = threading.Condition()
+
+    def refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.timestamp) * self.rate)
+        self.timestamp = now
+
+    def acquire(self, cost: float = 1, priority: bool = False):
+        """
+        Blocks until the request may be sent
+        :param cost: weight of the request in tokens, costs above the capacity are paid off by the following requests
+        :param priority: True for order requests
+        """
+        needed = min(cost, self.capacity)
+        with self.condition:
+            if priority:
+                self.waiting_orders += 1
+            try:
+                while True:
+                    self.refill()
+                    if self.tokens >= needed and (priority or not self.waiting_orders):
+                        self.tokens -= cost
+                        return
+                    self.condition.wait(max((needed - self.tokens) / self.rate, 0.01))
+            finally:
+                if priority:
+                    self.waiting_orders -= 1
+                    self.condition.notify_all()
+
+
+class ThrottledExchange:
+    """
+    Routes every request of the wrapped ccxt exchange through its request budget, weighted with the endpoint cost of ccxt
+    Requests of order calls use the priority lane, private calls are sent one at a time if serialize_private is set
+    """
+
+    def __init__(self, exchange, budget: RequestBudget, serialize_private: bool = False):
+        self.exchange = exchange
+        self.budget = budget
+        self.serialize_private = serialize_private
+        self.private_lock = threading.Lock()
+        self.lane = threading.local()
+        # ccxt calls throttle with the cost of the endpoint before signing and sending each request
+        exchange.throttle = self.throttle
+
+    def throttle(self, cost: float = None):
+        self.budget.acquire(cost or 1, getattr(self.lane, 'priority', False))
+
+    def __getattr__(self, name: str):
+        attribute = getattr(self.exchange, name)
+        priority = name.startswith(PRIORITY_PREFIXES)
+        serialized = self.serialize_private and name.startswith(PRIVATE_PREFIXES)
+        if not callable(attribute) or not (priority or serialized):
+            return attribute
+
+        def throttled(*args, **kwargs):
+            self.lane.priority = priority
+            try:
+                if serialized:
+                    # the nonce is created inside the call, holding the lock keeps them in sending order
+                    with self.private_lock:
+                        return attribute(*args, **kwargs)
+                return attribute(*args, **kwargs)
+            finally:
+                self.lane.priority = False
+
+        return throttled
+
+
+class StreamFeed:
+    """
+    Keeps the last price, the open order states and the bitmex position up to date from a websocket stream
+    The exchange is expected to provide ccxt.pro style watch_ticker, watch_orders and watch_positions coroutines
+    Updates older than STREAM_MAX_AGE_SECONDS are not served, all data is dropped when the stream ends
+    """
+
+    def __init__(self, exchange, symbol: str, watch_positions: bool = False):
+        self.exchange = exchange
+        self.symbol = symbol
+        self.watch_positions = watch_positions
+        self.price = None
+        self.price_timestamp = 0
+        self.orders = {}
+        self.fills = {}
+        self.order_timestamps = {}
+        self.position = None
+        self.position_timestamp = 0
+        self.running = False
+        self.thread = None
+
+    def start(self):
+        self.running = True
+        self.thread = threading.Thread(target=self.run, name='stream', daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.running = False
+
+    def run(self):
+        try:
+            asyncio.run(self.watch())
+        finally:
+            if self.running:
+                LOG.error('Stream ended unexpectedly, falling back to polling')
+            self.running = False
+            self.price = None
+            self.position = None
+            self.orders = {}
+            self.fills = {}
+
+    async def watch(self):
+        watchers = [self.watch_ticker_updates(), self.watch_order_updates()]
+        if self.watch_positions:
+            watchers.append(self.watch_position_updates())
+        await asyncio.gather(*watchers)
+        if hasattr(self.exchange, 'close'):
+            await self.exchange.close()
+
+    async def watch_ticker_updates(self):
+        while self.running:
+            try:
+                ticker = await self.exchange.watch_ticker(self.symbol)
+                if ticker and ticker['bid']:
+                    self.price = float(ticker['bid'])
+                    self.price_timestamp = time.time()
+            except ccxt.NotSupported as error:
+                LOG.warning('Streaming of tickers not supported: %s', str(error.args))
+                return
+            except Exception as error:  # any error restarts the watcher instead of silently ending the stream
+                LOG.error('Got an error %s %s while streaming tickers', type(error).__name__, str(error.args))
+                await asyncio.sleep(5)
+
+    async def watch_order_updates(self):
+        while self.running:
+            try:
+                orders = await self.exchange.watch_orders(self.symbol)
+                for order in orders:
+                    self.orders[order['id']] = order['status']
+                    self.fills[order['id']] = order.get('filled')
+                    self.order_timestamps[order['id']] = time.time()
+            except ccxt.NotSupported as error:
+                LOG.warning('Streaming of orders not supported: %s', str(error.args))
+                return
+            except Exception as error:  # any error restarts the watcher instead of silently ending the stream
+                LOG.error('Got an error %s %s while streaming orders', type(error).__name__, str(error.args))
+                await asyncio.sleep(5)
+
+    async def watch_position_updates(self):
+        while self.running:
+            try:
+                positions = await self.exchange.watch_positions([self.symbol])
+                for position in positions:
+                    info = position['info'] if 'info' in position else position
+                    if 'symbol' in info and info['symbol'] == CONF.symbol:
+                        # bitmex streams partial updates only
+                        self.position = {**self.position, **info} if self.position else info
+                        self.position_timestamp = time.time()
+            except ccxt.NotSupported as error:
+                LOG.warning('Streaming of positions not supported: %s', str(error.args))
+                return
+            except Exception as error:  # any error restarts the watcher instead of silently ending the stream
+                LOG.error('Got an error %s %s while streaming positions', type(error).__name__, str(error.args))
+                await asyncio.sleep(5)
+
+    def get_price(self, max_age: float = STREAM_MAX_AGE_SECONDS):
+        """
+        :return: the last streamed price or None if there is none younger than max_age seconds
+        """
+        if self.price and time.time() - self.price_timestamp <= max_age:
+            return self.price
+        return None
+
+    def get_order_status(self, order_id: str):
+        """
+        Final states are served regardless of their age, an open state only while it is recent
+        :return: the last streamed status of the order or None if there is no usable update
+        """
+        status = self.orders.get(order_id)
+        if status in ['open', 'active'] and time.time() - self.order_timestamps.get(order_id, 0) > STREAM_MAX_AGE_SECONDS:
+            return None
+        return status
+
+    def get_position(self):
+        """
+        :return: the last streamed position or None if there is no recent one
+        """
+        if self.position is not None and time.time() - self.position_timestamp <= STREAM_MAX_AGE_SECONDS:
+            return self.position
+        return None
+
+
+class MovingAverage:
+    """
+    Simple moving average over the daily closes of the last days, the sum is kept rolling so that each new
+    close is added in constant time
+    """
+
+    def __init__(self, days: int, closes: list = None):
+        self.days = days
+        self.closes = deque(maxlen=days)
+        self.total = 0
+        self.update(closes or [])
+
+    def update(self, closes: list):
+        """
+        Adds the closes of the days after the last one
+        :param closes: [timestamp in ms, close] of completed days in ascending order
+        """
+        for timestamp, close in closes:
+            if self.closes and timestamp <= self.closes[-1][0]:
+                continue
+            if len(self.closes) == self.days:
+                self.total -= self.closes[0][1]
+            self.closes.append((timestamp, close))
+            self.total += close
+
+    def average(self):
+        """
+        :return: the average or None as long as there are less closes than days
+        """
+        return self.total / self.days if len(self.closes) == self.days else None
+
+    def next_day(self):
+        """
+        :return: the timestamp in ms of the first day that is not covered yet
+        """
+        return self.closes[-1][0] + DAY_MS if self.closes else None
+
+
+class MayerProvider:
+    """
+    Keeps the Mayer multiple up to date in a background thread, so that neither the BTC/USD ticker nor the mayer
+    file nor the remote source are asked in the trading path
+    The 200 day average is calculated from the daily closes of the exchange, where the exchange does not provide
+    them the mayer file is read again when it has been modified and the remote source is asked without it
+    """
+
+    def __init__(self, refresh_seconds: int):
+        self.refresh_seconds = refresh_seconds
+        self.sma = None
+        self.average = None
+        self.average_mtime = None
+        self.mayer = None
+        self.timestamp = 0
+        self.running = False
+        self.wakeup = threading.Event()
+        self.thread = None
+
+    def start(self):
+        self.refresh()
+        self.running = True
+        self.thread = threading.Thread(target=self.run, name='mayer', daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.running = False
+        self.wakeup.set()
+
+    def run(self):
+        while self.running:
+            self.wakeup.wait(self.refresh_seconds)
+            if not self.running:
+                return
+            try:
+                self.refresh()
+            except Exception as error:  # any error is retried with the next refresh instead of ending the thread
+                LOG.error('Got an error %s %s while refreshing the Mayer multiple', type(error).__name__,
+                          str(error.args))
+
+    def refresh(self):
+        self.reload_average()
+        if self.average:
+            price = get_current_price(get_btc_usd_pair(), 3)
+            mayer = calculate_mayer(price, self.average) if price else None
+        else:
+            mayer = fetch_mayer()
+        if mayer:
+            self.mayer = mayer
+            self.timestamp = time.time()
+
+    def reload_average(self):
+        self.sma = update_moving_average(self.sma)
+        if self.sma and self.sma.average():
+            self.average = self.sma.average()
+            self.average_mtime = None
+            return
+        mtime = os.path.getmtime(CONF.mayer_file) if CONF.mayer_file and os.path.isfile(CONF.mayer_file) else None
+        if mtime != self.average_mtime:
+            self.average = read_daily_average()
+            self.average_mtime = mtime
+
+    def get(self):
+        """
+        :return: the last Mayer multiple with its age in seconds or None if there is none yet
+        """
+        if self.mayer is None:
+            return None
+        return dict(self.mayer, age=time.time() - self.timestamp)
+
+
+class ExchangeAdapter:
+    """
+    Generic ccxt call pattern and spot account model, the exchange specific adapters below override
+    the calls and calculations where their venue differs
+    The capabilities of the exchange are probed once when the adapter is created
+    """
+    # order amounts are given in fiat (contracts) instead of crypto
+    fiat_amounts = False
+
+    def __init__(self, exchange):
+        self.exchange = exchange
+        self.can_fetch_order = self.supports('fetchOrder')
+        self.can_cancel_all = self.supports('cancelAllOrders')
+        self.can_edit = self.supports('editOrder')
+
+    def supports(self, capability: str):
+        return self.exchange.has.get(capability) in (True, 'emulated')
+
+    @property
+    def symbol(self):
+        return CONF.pair
+
+    @property
+    def min_amount(self):
+        return MIN_ORDER_SIZE
+
+    def fetch_balance(self):
+        return self.exchange.fetch_balance()
+
+    def fetch_open_orders(self, limit: int):
+        return self.exchange.fetch_open_orders(self.symbol, limit=limit, params={'reverse': True})
+
+    def fetch_closed_orders(self, limit: int):
+        return self.exchange.fetch_closed_orders(self.symbol, limit=limit, params={'reverse': True})
+
+    def fetch_order(self, order_id: str):
+        """
+        :return: the unified order or None if the exchange can not look up single orders
+        """
+        if self.can_fetch_order:
+            return self.exchange.fetch_order(order_id, self.symbol)
+        return None
+
+    def fetch_order_status(self, order_id: str):
+        if self.can_fetch_order:
+            return self.exchange.fetch_order_status(order_id, self.symbol)
+        orders = self.exchange.fetch_open_orders(self.symbol)
+        if any(order['id'] == order_id for order in orders or []):
+            return 'open'
+        orders = self.exchange.fetch_closed_orders(self.symbol)
+        for order in orders or []:
+            if order['id'] == order_id:
+                return order['status']
+        return 'unknown'
+
+    def cancel_order(self, order_id: str):
+        return self.exchange.cancel_order(order_id, self.symbol)
+
+    def cancel_all_orders(self):
+        """
+        :return: the exchange response or None if the exchange has no bulk cancel endpoint
+        """
+        if self.can_cancel_all:
+            return self.exchange.cancel_all_orders(self.symbol)
+        return None
+
+    def edit_order(self, order_id: str, side: str, amount: float, price: float):
+        return self.exchange.edit_order(order_id, self.symbol, 'limit', side, amount, price)
+
+    def client_params(self, client_id: str):
+        """
+        :return: the parameters tagging an order with its client order id
+        """
+        return {'clientOrderId': client_id} if client_id else {}
+
+    def order_params(self, side: str, client_id: str):
+        return self.client_params(client_id)
+
+    def fetch_order_by_client_id(self, client_id: str):
+        """
+        :return: the unified order sent with the client order id or None if there is none
+        """
+        orders = (self.exchange.fetch_open_orders(self.symbol) or []) + (self.exchange.fetch_closed_orders(self.symbol) or [])
+        return next((order for order in orders if order.get('clientOrderId') == client_id), None)
+
+    def create_limit_order(self, side: str, amount: float, price: float, client_id: str = None):
+        params = self.order_params(side, client_id)
+        if side == 'buy':
+            return self.exchange.create_limit_buy_order(self.symbol, amount, price, params)
+        return self.exchange.create_limit_sell_order(self.symbol, amount, price, params)
+
+    def create_market_order(self, side: str, amount: float, client_id: str = None):
+        params = self.order_params(side, client_id)
+        if side == 'buy':
+            return self.exchange.create_market_buy_order(self.symbol, amount, params)
+        return self.exchange.create_market_sell_order(self.symbol, amount, params)
+
+    def round_price(self, price: float):
+        return price
+
+    def order_amounts(self, amount_crypto: float, amount_fiat: float, price: float):
+        """
+        Rounds the amount of an order in the unit the venue trades in
+        :return: (amount_crypto, amount_fiat, amount to be sent), the latter is None if it is too small
+        """
+        return amount_crypto, amount_fiat, amount_crypto
+
+    def split_amount(self, amount: float):
+        """
+        :param amount: amount in the unit the venue trades in
+        :return: (amount_crypto, amount_fiat) rounded to the order size
+        """
+        return to_order_size(amount), None
+
+    def notional_amount(self, notional: float, price: float):
+        """
+        :return: the amount in the unit the venue trades in worth the notional in fiat
+        """
+        return notional / price
+
+    def balance_key(self, currency: str, balance: dict):
+        return currency
+
+    def report_calls(self):
+        """
+        :return: the fetch functions whose data the report reads
+        """
+        return [fetch_balance, get_current_price]
+
+    def calculate_balances(self):
+        balance = {'cryptoBalance': 0, 'totalBalanceInCrypto': 0, 'price': 0}
+        prefetch_account(fetch_balance, get_current_price)
+        balance['cryptoBalance'] = get_crypto_balance()['total']
+        fiat_balance = get_fiat_balance()['total']
+        balance['price'] = get_current_price()
+        balance['totalBalanceInCrypto'] = balance['cryptoBalance'] + (fiat_balance / balance['price'])
+        return balance
+
+    def apply_fill(self, balance: dict, order: Order):
+        """
+        :return: the balance after the fill, the fee is charged in fiat
+        """
+        amount = order.filled if order.is_partially_filled() else order.amount
+        price = order.average or order.price or balance['price']
+        if not price:
+            return balance
+        crypto = balance['cryptoBalance']
+        fiat = (balance['totalBalanceInCrypto'] - crypto) * balance['price']
+        if order.side == 'buy':
+            crypto += amount
+            fiat -= amount * price * (1 + FEE_RATE)
+        else:
+            crypto -= amount
+            fiat += amount * price * (1 - FEE_RATE)
+        return {'cryptoBalance': crypto, 'totalBalanceInCrypto': crypto + fiat / price, 'price': price}
+
+    def actual_quote(self, price: float):
+        crypto_quote = (BAL['cryptoBalance'] / BAL['totalBalanceInCrypto']) * 100 if BAL['cryptoBalance'] > 0 else 0
+        LOG.info('%s total/crypto quote %.2f/%.2f %.2f @ %d', CONF.base, BAL['totalBalanceInCrypto'],
+                 BAL['cryptoBalance'], crypto_quote, BAL['price'])
+        return crypto_quote
+
+    def reduce_action(self, action: dict, order: Order):
+        price = order.average or order.price
+        filled_quote = order.filled * (1 + FEE_RATE) * 100 / BAL['totalBalanceInCrypto']
+        if action['direction'] == 'BUY':
+            filled_quote = filled_quote * price / action['price']
+        else:
+            filled_quote = filled_quote * action['price'] / price
+        remaining = action['percentage'] - filled_quote
+        if BAL['totalBalanceInCrypto'] * remaining / 100 / (1 + FEE_RATE) <= MIN_ORDER_SIZE:
+            return None
+        return dict(action, percentage=remaining)
+
+    def calculate_rung(self, direction: str, target_quote: float, distance: float):
+        tolerance = CONF.tolerance_in_percent
+        band_quote = target_quote - distance if direction == 'BUY' else target_quote + distance
+        crypto = BAL['cryptoBalance']
+        fiat = (BAL['totalBalanceInCrypto'] - crypto) * BAL['price']
+        if not 0 < band_quote < 100 or crypto <= 0 or fiat <= 0:
+            return None
+        band_price = band_quote * fiat / (crypto * (100 - band_quote))
+        size = (crypto + fiat / band_price) * tolerance / 100 / (1 + FEE_RATE)
+        if size <= MIN_ORDER_SIZE:
+            return None
+        return direction, band_price, to_order_size(size), None
+
+    def used_balance(self):
+        return float(get_crypto_balance()['used'] * get_current_price())
+
+    def margin_balance(self):
+        return get_crypto_balance()['total']
+
+    def margin_balance_of_fiat(self):
+        LOG.warning(NOT_IMPLEMENTED_MESSAGE, 'get_margin_balance_of_fiat()', CONF.exchange)
+        return None
+
+    def margin_leverage(self):
+        LOG.warning(NOT_IMPLEMENTED_MESSAGE, 'get_margin_leverage()', CONF.exchange)
+        return None
+
+    def net_deposits(self):
+        LOG.warning(NOT_IMPLEMENTED_MESSAGE, 'get_net_deposit()', CONF.exchange)
+        return None
+
+    def wallet_balance(self, price: float):
+        LOG.warning(NOT_IMPLEMENTED_MESSAGE, 'get_wallet_balance()', CONF.exchange)
+        return None
+
+    def balances(self):
+        LOG.warning(NOT_IMPLEMENTED_MESSAGE, 'get_balances()', CONF.exchange)
+        return None
+
+    def position(self):
+        LOG.warning(NOT_IMPLEMENTED_MESSAGE, 'get_postion_info()', CONF.exchange)
+        return None
+
+    def set_leverage(self, leverage: float):
+        LOG.error('set_leverage() not yet implemented for %s', CONF.exchange)
+
+
+class BitmexAdapter(ExchangeAdapter):
+    """
+    Trades inverse contracts, the amounts are given in fiat and the balance is the margin in crypto
+    """
+    fiat_amounts = True
+
+    @property
+    def symbol(self):
+        return CONF.symbol
+
+    @property
+    def min_amount(self):
+        return MIN_FIAT_ORDER_SIZE
+
+    @property
+    def asset(self):
+        return CONF.base if CONF.base != 'BTC' else 'XBt'
+
+    def fetch_balance(self):
+        return self.exchange.fetch_balance({'currency': self.asset})
+
+    def fetch_positions(self):
+        return self.exchange.private_get_position()
+
+    def round_price(self, price: float):
+        return round(price * 2) / 2
+
+    def order_amounts(self, amount_crypto: float, amount_fiat: float, price: float):
+        amount_fiat = to_bitmex_order_size(amount_fiat or amount_crypto * price)
+        return amount_crypto, amount_fiat, amount_fiat
+
+    def split_amount(self, amount: float):
+        return None, to_bitmex_order_size(amount)
+
+    def notional_amount(self, notional: float, price: float):
+        return notional
+
+    def report_calls(self):
+        return [fetch_balance, get_current_price, fetch_positions]
+
+    def calculate_balances(self):
+        balance = {'cryptoBalance': 0, 'totalBalanceInCrypto': 0, 'price': 0}
+        prefetch_account(fetch_balance, fetch_positions)
+        pos = get_position_info()
+        if pos and pos['homeNotional'] and float(pos['homeNotional']) < 0:
+            LOG.warning('Position short by %f', abs(float(pos['homeNotional'])))
+            create_market_buy_order(abs(float(pos['homeNotional'])))
+            sleep_for(2, 4)
+            pos = get_position_info()
+        # aka margin balance
+        balance['totalBalanceInCrypto'] = get_crypto_balance()['total']
+        if 'markPrice' in pos:
+            balance['price'] = float(pos['markPrice'])
+        if not balance['price']:
+            balance['price'] = get_current_price()
+        if pos['avgEntryPrice'] and float(pos['avgEntryPrice']) > 0:
+            balance['cryptoBalance'] = (abs(int(pos['foreignNotional'])) / float(pos['avgEntryPrice']) *
+                                        balance['price']) / float(pos['avgEntryPrice'])
+        return balance
+
+    def apply_fill(self, balance: dict, order: Order):
+        # the bitmex strategy reads the position, not the balances
+        return balance
+
+    def actual_quote(self, price: float):
+        actual_position = int(get_position_info()['currentQty'])
+        return 100 * actual_position / CONF.start_crypto_price / CONF.start_margin_balance * price / CONF.start_crypto_price
+
+    def reduce_action(self, action: dict, order: Order):
+        remaining = action['amount'] - order.filled
+        return dict(action, amount=remaining) if remaining >= MIN_FIAT_ORDER_SIZE else None
+
+    def calculate_rung(self, direction: str, target_quote: float, distance: float):
+        pos = get_position_info()
+        if not pos:
+            return None
+        position = int(pos['currentQty'])
+        factor = 1 + distance / 100 if direction == 'BUY' else 1 - distance / 100
+        if position <= 0 or factor <= 0:
+            return None
+        band_quote = target_quote / factor
+        band_price = band_quote * CONF.start_crypto_price ** 2 * CONF.start_margin_balance / (100 * position)
+        amount_fiat = int(round(position * CONF.tolerance_in_percent / 100, -2))
+        if amount_fiat < MIN_FIAT_ORDER_SIZE:
+            return None
+        return direction, band_price, None, amount_fiat
+
+    def used_balance(self):
+        position = fetch_positions()
+        if position:
+            for po in position:
+                if po['symbol'] == CONF.symbol:
+                    return float(po['currentQty'])
+        return None
+
+    def margin_balance_of_fiat(self):
+        pos = get_position_info()
+        if not pos or 'markPrice' not in pos or not pos['markPrice']:
+            return {'total': 0}
+        return {'total': float(pos['homeNotional']) * float(pos['markPrice'])}
+
+    def margin_leverage(self):
+        bal = self.balances()
+        return float(bal['marginLeverage']) if bal else None
+
+    def net_deposits(self):
+        result = self.exchange.private_get_user_wallet({'currency': self.asset})
+        return (int(result['deposited']) + int(result['transferIn']) - int(result['withdrawn']) -
+                int(result['transferOut'])) * CONF.satoshi_factor
+
+    def wallet_balance(self, price: float):
+        bal = self.balances()
+        return float(bal['walletBalance']) * CONF.satoshi_factor if bal else None
+
+    def balances(self):
+        for bal in fetch_balance()['info']:
+            if bal['currency'] == self.asset:
+                return bal
+        return None
+
+    def position(self):
+        position = fetch_positions()
+        if position:
+            for po in position:
+                if po['symbol'] == CONF.symbol:
+                    return po
+        return None
+
+    def set_leverage(self, leverage: float):
+        self.exchange.private_post_position_leverage({'symbol': self.symbol, 'leverage': leverage})
+        LOG.info('Setting leverage to %s', leverage)
+
+
+class KrakenAdapter(ExchangeAdapter):
+
+    def __init__(self, exchange):
+        super().__init__(exchange)
+        # CancelAll is not limited to a pair and would cancel the orders of other instances on the same account
+        self.can_cancel_all = False
+
+    def fetch_closed_orders(self, limit: int):
+        return self.exchange.fetch_closed_orders(self.symbol, limit=limit)
+
+    def fetch_trade_balance(self):
+        return TradeBalance(self.exchange.private_post_tradebalance({'asset': CONF.base})['result'])
+
+    def client_params(self, client_id: str):
+        return {'userref': self.userref(client_id)} if client_id else {}
+
+    def order_params(self, side: str, client_id: str):
+        params = self.client_params(client_id)
+        if side == 'buy':
+            params['oflags'] = 'fcib'
+        return params
+
+    def fetch_order_by_client_id(self, client_id: str):
+        params = {'userref': self.userref(client_id)}
+        orders = (self.exchange.fetch_open_orders(self.symbol, params=params) or []) + \
+                 (self.exchange.fetch_closed_orders(self.symbol, params=params) or [])
+        return orders[0] if orders else None
+
+    @staticmethod
+    def userref(client_id: str):
+        # kraken tags orders with a signed 32 bit integer only
+        return int(client_id[:8], 16) & 0x7fffffff
+
+    def balance_key(self, currency: str, balance: dict):
+        # balances held in futures wallets are suffixed with .F
+        alt_currency = 'XBT.F' if currency == 'BTC' else currency + '.F'
+        if alt_currency in balance and balance[alt_currency]['total'] > 0:
+            return alt_currency
+        return currency
+
+    def report_calls(self):
+        return [fetch_balance, get_current_price, fetch_trade_balance]
+
+    def used_balance(self):
+        trade_balance = fetch_trade_balance()
+        return (trade_balance.equity - trade_balance.free_margin) * get_current_price()
+
+    def margin_balance(self):
+        return fetch_trade_balance().equity
+
+    def margin_leverage(self):
+        return fetch_trade_balance().margin_level
+
+    def net_deposits(self):
+        net_deposits = 0
+        deposits = self.exchange.fetch_deposits(CONF.base)
+        for deposit in deposits:
+            net_deposits += deposit['amount']
+        currency = CONF.base if CONF.base != 'BTC' else 'XBt'
+        ledgers = self.exchange.private_post_ledgers({'asset': currency, 'type': 'withdrawal'})['result']['ledger']
+        for withdrawal_id in ledgers:
+            net_deposits += float(ledgers[withdrawal_id]['amount'])
+        return net_deposits
+
+    def wallet_balance(self, price: float):
+        return fetch_trade_balance().trade_balance
+
+
+class BinanceAdapter(ExchangeAdapter):
+
+    def fetch_open_orders(self, limit: int):
+        return self.exchange.fetch_open_orders(self.symbol, limit=limit)
+
+
+class PaymiumAdapter(ExchangeAdapter):
+
+    def fetch_open_orders(self, limit: int):
+        return self.exchange.private_get_user_orders({'active': True})
+
+    def client_params(self, client_id: str):
+        # orders can not be tagged, a lost order is only found by the regular reconciliation
+        return {}
+
+    def fetch_order_by_client_id(self, client_id: str):
+        return None
+
+    def fetch_order_status(self, order_id: str):
+        order = self.exchange.private_get_user_orders_uuid({'uuid': order_id})
+        if order:
+            return order['state']
+        LOG.warning('Order with id %s not found', order_id)
+        return 'unknown'
+
+
+class CoinbaseAdapter(ExchangeAdapter):
+
+    def fetch_open_orders(self, limit: int):
+        return self.exchange.fetch_open_orders(self.symbol, limit=limit)
+
+    def fetch_closed_orders(self, limit: int):
+        return self.exchange.fetch_closed_orders(self.symbol, limit=limit)
+
+    def margin_balance(self):
+        return get_crypto_balance()['total'] + get_fiat_balance()['total'] / get_current_price()
+
+    def margin_leverage(self):
+        return 0  # Margin trading unavailable
+
+    def net_deposits(self):
+        net_deposits = 0
+        net_withdrawals = 0
+        deposits = self.exchange.fetch_deposits(CONF.base)
+        for deposit in deposits:
+            net_deposits += deposit['amount']
+        withdrawals = self.exchange.fetch_withdrawals(CONF.base)
+        for withdrawal in withdrawals:
+            net_withdrawals += withdrawal['amount']
+        if net_deposits > net_withdrawals:
+            return net_deposits - net_withdrawals
+        return 0
+
+    def wallet_balance(self, price: float):
+        balance = 0
+        balances = fetch_balance()
+        if balances:
+            if CONF.base in balances and 'total' in balances[CONF.base]:
+                balance += balances[CONF.base]['total']
+            if CONF.quote in balances and 'total' in balances[CONF.quote]:
+                fiat = balances[CONF.quote]['total']
+                if fiat and fiat > 0:
+                    balance += fiat / price
+            return balance
+        LOG.warning('get_net_deposit() could not retrieve coinbase wallet balance')
+        return 0
+
+
+ADAPTERS = {'bitmex': BitmexAdapter, 'kraken': KrakenAdapter, 'binance': BinanceAdapter, 'paymium': PaymiumAdapter,
+            'coinbase': CoinbaseAdapter, 'coinbasepro': CoinbaseAdapter}
 
 
 class Stats:
@@ -190,6 +1241,56 @@ def function_logger(console_level: int, log_file: str = None, file_level: int =
     return logger
 
 
+def execute(endpoint: str, call, limit: int = None, default=None):
+    """
+    Calls the exchange until it succeeds, backing off exponentially between the attempts
+    :param endpoint: name of the calling wrapper, used to look up its attempt limit
+    :param call: function without arguments
+    :param limit: maximal attempts, overrides the limit of the endpoint
+    :param default: returned once the maximal attempts of a limited endpoint are exhausted
+    :raises RetriesExhausted: once DEFAULT_RETRY_LIMIT attempts of any other endpoint are exhausted
+    """
+    bounded = bool(limit) or endpoint in RETRY_LIMITS
+    limit = limit or RETRY_LIMITS.get(endpoint, DEFAULT_RETRY_LIMIT)
+    attempt = 0
+    while True:
+        try:
+            result = call()
+            if BREAKER:
+                BREAKER.record()
+            return result
+        except (ccxt.ExchangeError, ccxt.NetworkError) as error:
+            handle_account_errors(str(error.args))
+            if BREAKER:
+                BREAKER.record(error)
+            attempt += 1
+            if attempt >= limit:
+                LOG.warning('%s failed, giving up after %d attempts', endpoint, attempt)
+                if bounded:
+                    return default
+                raise RetriesExhausted(endpoint, attempt) from error
+            if BREAKER and BREAKER.is_open():
+                BREAKER.pause()
+            else:
+                delay = calculate_backoff(attempt)
+                LOG.error(RETRY_MESSAGE, type(error).__name__, str(error.args), delay)
+                sleep_for(delay * 0.8, delay * 1.2)
+
+
+def calculate_backoff(attempt: int):
+    return min(BACKOFF_SECONDS * 2 ** (attempt - 1), MAX_BACKOFF_SECONDS)
+
+
+def retrying(function):
+    """
+    Runs the decorated exchange wrapper through the retry executor
+    """
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        return execute(function.__name__, lambda: function(*args, **kwargs))
+    return wrapper
+
+
 def compute_amount(ccxt_amount: float = None, price: float = None, amount_fiat: float = None, amount_crypto: float = None):
     if CONF.exchange == 'bitmex':
         return amount_fiat if amount_fiat is not None else ccxt_amount if \
@@ -201,20 +1302,35 @@ def set_price(ccxt_price: float = None, price: float = None):
     return round(ccxt_price) if ccxt_price is not None else round(price) if price is not None else None
 
 
-def fetch_mayer(tries: int = 0):
+def fetch_mayer():
+    """
+    Fetches the current and the average Mayer multiple with a single conditional request over a kept-alive session,
+    an unchanged response is served from the last one
+    :return: dict or None if the request failed
+    """
+    import requests
+
+    if MAYER_REMOTE['session'] is None:
+        MAYER_REMOTE['session'] = requests.Session()
+    headers = {}
+    if MAYER_REMOTE['mayer'] and MAYER_REMOTE['etag']:
+        headers['If-None-Match'] = MAYER_REMOTE['etag']
+    if MAYER_REMOTE['mayer'] and MAYER_REMOTE['modified']:
+        headers['If-Modified-Since'] = MAYER_REMOTE['modified']
     try:
-        req = requests.get('https://bitcoinition.com/current.json', timeout=10)
+        req = MAYER_REMOTE['session'].get(MAYER_URL, headers=headers, timeout=10)
+        if req.status_code == 304:
+            return dict(MAYER_REMOTE['mayer'])
         if req.text:
             mayer = req.json()['data']
-            return {'current': float(mayer['current_mayer_multiple']),
-                    'average': float(mayer['average_mayer_multiple'])}
+            MAYER_REMOTE['mayer'] = {'current': float(mayer['current_mayer_multiple']),
+                                     'average': float(mayer['average_mayer_multiple'])}
+            MAYER_REMOTE['etag'] = req.headers.get('ETag')
+            MAYER_REMOTE['modified'] = req.headers.get('Last-Modified')
+            return dict(MAYER_REMOTE['mayer'])
     except (requests.exceptions.ConnectionError, requests.exceptions.Timeout, requests.exceptions.ReadTimeout,
             ValueError) as error:
-        LOG.error(RETRY_MESSAGE, type(error).__name__, str(error.args))
-    if tries < 4:
-        sleep_for(4, 6)
-        return fetch_mayer(tries + 1)
-    LOG.warning('Failed to fetch Mayer multiple, giving up after 4 attempts')
+        LOG.warning('Failed to fetch Mayer multiple: %s %s', type(error).__name__, str(error.args))
     return None
 
 
@@ -249,20 +1365,76 @@ def append_mayer(part: dict):
 
 
 def get_mayer():
+    """
+    Serves the Mayer multiple of the background provider, it is only calculated on the spot without a provider
+    :return: dict or None
+    """
+    if MAYER:
+        mayer = MAYER.get()
+        if mayer and mayer['age'] > MAYER_MAX_AGE_SECONDS:
+            LOG.warning('Mayer multiple is %d seconds old', mayer['age'])
+        return mayer
     btc_usd = get_btc_usd_pair()
-    mayer = calculate_mayer(get_current_price(btc_usd, 0, 3))
+    mayer = calculate_mayer(get_current_price(btc_usd, 3))
     if mayer is None:
         mayer = fetch_mayer()
     return mayer
 
 
-def calculate_mayer(price: float):
-    average = read_daily_average()
+def calculate_mayer(price: float, average: float = None):
+    average = average or read_daily_average()
     if average:
         return {'current': price / average}
     return None
 
 
+def update_moving_average(sma: MovingAverage = None):
+    """
+    Bootstraps the 200 day average from the persisted daily closes or from the exchange and adds the days
+    completed since, the exchange is only asked once a day has been completed
+    :return: MovingAverage or None if the exchange does not provide daily candles
+    """
+    if not get_adapter().supports('fetchOHLCV'):
+        return None
+    closes_file = f'{DATA_DIR}{CONF.exchange}.closes.json'
+    if sma is None:
+        sma = MovingAverage(MAYER_DAYS, read_daily_closes(closes_file))
+    today = int(time.time() * 1000) // DAY_MS * DAY_MS
+    if not sma.closes or sma.next_day() < today - MAYER_DAYS * DAY_MS:
+        sma = MovingAverage(MAYER_DAYS)
+    since = sma.next_day() or today - MAYER_DAYS * DAY_MS
+    if since < today:
+        sma.update(fetch_daily_closes(since, today))
+        write_daily_closes(closes_file, list(sma.closes))
+    return sma
+
+
+def fetch_daily_closes(since: int, until: int):
+    """
+    :return: [timestamp in ms, close] of the daily candles of BTC/USD completed between since and until
+    """
+    pair = CONF.symbol if CONF.exchange == 'bitmex' else get_btc_usd_pair()
+    candles = execute('fetch_ohlcv', lambda: EXCHANGE.fetch_ohlcv(pair, '1d', since, MAYER_DAYS + 1), 3, [])
+    return [[candle[0], candle[4]] for candle in candles if since <= candle[0] < until and candle[4]]
+
+
+def read_daily_closes(closes_file: str):
+    if os.path.isfile(closes_file):
+        with open(closes_file, 'r') as file:
+            try:
+                return json.load(file)
+            except ValueError:
+                LOG.warning('Ignoring corrupt daily closes %s', closes_file)
+    return []
+
+
+def write_daily_closes(closes_file: str, closes: list):
+    temp_file = f'{closes_file}.{os.getpid()}.tmp'
+    with open(temp_file, 'w') as file:
+        json.dump(closes, file, separators=(',', ':'))
+    os.replace(temp_file, closes_file)
+
+
 def read_daily_average():
     if CONF.mayer_file and os.path.isfile(CONF.mayer_file):
         with open(CONF.mayer_file, "rt") as file:
@@ -272,21 +1444,42 @@ def read_daily_average():
 
 def daily_report(immediately: bool = False):
     """
-    Creates a daily report email around 12:02 UTC or immediately if told to do so
+    Creates the daily report, the email is sent if the report cadence is due or immediately if told to do so
+    """
+    content = create_mail_content(True)
+    filename_csv = f'{DATA_DIR}{INSTANCE}.csv'
+    update_csv(content, filename_csv)
+    if immediately or is_due_date(datetime.date.today()):
+        cadence = "Daily" if CONF.report in ['T', 'D'] else "Monthly" if CONF.report == 'M' else 'Annual'
+        subject = f"{cadence} BalanceR report {INSTANCE}"
+        send_mail(subject, content['text'], filename_csv)
+
+
+def run_daily_report():
     """
-    global EMAIL_SENT
+    Creates the daily report, the balance statistics of the day are taken with it
+    :return: time of the next report
+    """
+    try:
+        daily_report()
+    except RetriesExhausted as error:
+        LOG.error('%s, postponing the daily report', str(error))
+        return time.time() + CONF.period_in_seconds
+    return report_time(datetime.datetime.utcnow().date() + datetime.timedelta(days=1))
+
 
+def first_report_time():
+    """
+    :return: 12:02 UTC today, or tomorrow if today's report is more than 23 minutes overdue
+    """
     now = datetime.datetime.utcnow()
-    if immediately or datetime.datetime(2012, 1, 17, 12, 25).time() > now.time() \
-            > datetime.datetime(2012, 1, 17, 12, 1).time() and EMAIL_SENT != now.day:
-        content = create_mail_content(True)
-        filename_csv = f'{DATA_DIR}{INSTANCE}.csv'
-        update_csv(content, filename_csv)
-        if immediately or is_due_date(datetime.date.today()):
-            cadence = "Daily" if CONF.report in ['T', 'D'] else "Monthly" if CONF.report == 'M' else 'Annual'
-            subject = f"{cadence} BalanceR report {INSTANCE}"
-            send_mail(subject, content['text'], filename_csv)
-        EMAIL_SENT = now.day
+    if now.time() < REPORT_DEADLINE:
+        return report_time(now.date())
+    return report_time(now.date() + datetime.timedelta(days=1))
+
+
+def report_time(day: datetime.date):
+    return datetime.datetime.combine(day, REPORT_TIME, tzinfo=datetime.timezone.utc).timestamp()
 
 
 def is_due_date(today: datetime.date):
@@ -315,6 +1508,7 @@ def create_mail_content(daily: bool = False):
     Fetches and formats the data required for the daily report email
     :return: dict: text: str
     """
+    prefetch_account(*get_adapter().report_calls())
     if not daily:
         order = ORDER if ORDER else get_closed_order()
         trade = ["Trade", "-----", '\n'.join(create_report_part_trade(order)), '\n\n']
@@ -324,6 +1518,7 @@ def create_mail_content(daily: bool = False):
     performance_part = create_report_part_performance(daily)
     base_values_part = create_report_part_base_values()
     advice_part = create_report_part_advice()
+    execution_part = create_report_part_execution() if daily else []
     settings_part = create_report_part_settings()
     general_part = create_mail_part_general()
 
@@ -334,15 +1529,16 @@ def create_mail_content(daily: bool = False):
     else:
         start = []
     advice = ["Assessment / advice", "-------------------", '\n'.join(advice_part['mail']), '\n\n']
+    execution = ["Execution (last 24h)", "--------------------", '\n'.join(execution_part), '\n\n'] if daily else []
     settings = ["Your settings", "-------------", '\n'.join(settings_part['mail']), '\n\n']
     general = ["General", "-------", '\n'.join(general_part), '\n\n']
 
     if not CONF.info:
-        text += '\n'.join(performance) + '\n'.join(start) + '\n'.join(advice) + '\n'.join(settings) + '\n'.join(
-            general) + CONF.url + '\n'
+        text += '\n'.join(performance) + '\n'.join(start) + '\n'.join(advice) + '\n'.join(execution) + '\n'.join(
+            settings) + '\n'.join(general) + CONF.url + '\n'
     else:
-        text += '\n'.join(performance) + '\n'.join(start) + '\n'.join(advice) + '\n'.join(settings) + '\n'.join(
-            general) + CONF.info + '\n\n' + CONF.url + '\n'
+        text += '\n'.join(performance) + '\n'.join(start) + '\n'.join(advice) + '\n'.join(execution) + '\n'.join(
+            settings) + '\n'.join(general) + CONF.info + '\n\n' + CONF.url + '\n'
 
     csv = None if not daily else "{};{} UTC;{};{};{};{};{}\n".format(INSTANCE,
                                                                      datetime.datetime.utcnow().replace(microsecond=0),
@@ -451,13 +1647,22 @@ def create_report_part_advice():
     return part
 
 
+def create_report_part_execution():
+    quality = calculate_execution_quality(read_executions(time.time() - 86400))
+    return ["Fills: {:>28}".format(quality['fills']),
+            "Median slippage bps: {:>14}".format(format_quality(quality['median_slippage_bps'])),
+            "P95 time to fill s: {:>15}".format(format_quality(quality['p95_seconds_to_fill'])),
+            "Limit fill rate %: {:>16}".format(format_quality(quality['limit_fill_rate']))]
+
+
+def format_quality(value: float):
+    return NA if value is None else round(value, 1)
+
+
 def create_report_part_performance(daily: bool):
     part = {'mail': [], 'csv': [], 'labels': []}
-    margin_balance = get_margin_balance()
-    net_deposits = get_net_deposits()
-    sleep_for(0, 1)
+    margin_balance, net_deposits = gather(get_margin_balance, get_net_deposits)
     append_performance(part, margin_balance, net_deposits)
-    sleep_for(0, 1)
     append_balances(part, margin_balance, daily)
     return part
 
@@ -467,6 +1672,13 @@ def create_report_part_trade(last_order: Order):
 
 
 def send_mail(subject: str, text: str, attachment: str = None):
+    # imported on first use, mails are sent rarely
+    import smtplib
+    from email import encoders
+    from email.mime.base import MIMEBase
+    from email.mime.multipart import MIMEMultipart
+    from email.mime.text import MIMEText
+
     recipients = ", ".join(CONF.recipient_addresses)
     msg = MIMEMultipart()
     msg['Subject'] = subject
@@ -578,7 +1790,6 @@ def append_liquidation_price(part: dict):
     poi = None
     part['labels'].append("Liq. Price {}".format(CONF.quote))
     if CONF.exchange == 'bitmex':
-        sleep_for(1, 2)
         poi = get_position_info()
     padding = 15-len(CONF.quote)
     if poi is not None and 'liquidationPrice' in poi and poi['liquidationPrice'] is not None:
@@ -799,7 +2010,8 @@ def set_start_values(values: dict):
     config.set('config', 'start_crypto_price', str(values['crypto_price']))
     config.set('config', 'start_margin_balance', str(values['margin_balance']))
     config.set('config', 'start_mayer_multiple', str(values['mayer_multiple']))
-    config.set('config', 'reference_net_deposits', str(values['net_deposits']))
+    if values['net_deposits'] is not None:
+        config.set('config', 'reference_net_deposits', str(values['net_deposits']))
     sv_type = 'Initial'
     if 'date' in values and values['date']:
         config.set('config', 'start_date', str(values['date']))
@@ -837,21 +2049,7 @@ def get_margin_balance():
     Fetches the margin balance (of crypto) in fiat
     return: balance of crypto in fiat
     """
-    try:
-        if CONF.exchange == 'kraken':
-            bal = EXCHANGE.private_post_tradebalance({'asset': CONF.base})['result']
-            # bal['free'] = float(bal['mf'])
-            return float(bal['e'])
-            # bal['used'] = float(bal['m'])
-        if CONF.exchange in ['bitpanda', 'coinbase', 'coinbasepro']:
-            return get_crypto_balance()['total'] + get_fiat_balance()['total'] / get_current_price()
-        return get_crypto_balance()['total']
-
-    except (ccxt.ExchangeError, ccxt.NetworkError) as error:
-        handle_account_errors(str(error.args))
-        LOG.error(RETRY_MESSAGE, type(error).__name__, str(error.args))
-        sleep_for(4, 6)
-        return get_margin_balance()
+    return get_adapter().margin_balance()
 
 
 def get_margin_balance_of_fiat():
@@ -859,50 +2057,17 @@ def get_margin_balance_of_fiat():
     Fetches the margin balance (of fiat) in fiat
     return: balance of fiat in fiat
     """
-    try:
-        if CONF.exchange == 'bitmex':
-            pos = get_position_info()
-            if not pos or 'markPrice' not in pos or not pos['markPrice']:
-                return {'total': 0}
-            return {'total': float(pos['homeNotional']) * float(pos['markPrice'])}
-        LOG.warning(NOT_IMPLEMENTED_MESSAGE, 'get_margin_balance_of_fiat()', CONF.exchange)
-        return None
-
-    except (ccxt.ExchangeError, ccxt.NetworkError) as error:
-        handle_account_errors(str(error.args))
-        LOG.error(RETRY_MESSAGE, type(error).__name__, str(error.args))
-        sleep_for(4, 6)
-        return get_margin_balance_of_fiat()
+    return get_adapter().margin_balance_of_fiat()
 
 
 def get_margin_leverage():
     """
     Fetch the leverage
     """
-    try:
-        if CONF.exchange == 'bitmex':
-            asset = CONF.base if CONF.base != 'BTC' else 'XBt'
-            balances = EXCHANGE.fetch_balance()['info']
-            for bal in balances:
-                if bal['currency'] == asset:
-                    return float(bal['marginLeverage'])
-        if CONF.exchange == 'kraken':
-            result = EXCHANGE.private_post_tradebalance()['result']
-            if hasattr(result, 'ml'):
-                return float(result['ml'])
-            return 0
-        if CONF.exchange in ['bitpanda', 'coinbase']:
-            return 0  # Margin trading unavailable
-        LOG.warning(NOT_IMPLEMENTED_MESSAGE, 'get_margin_leverage()', CONF.exchange)
-        return None
-
-    except (ccxt.ExchangeError, ccxt.NetworkError) as error:
-        handle_account_errors(str(error.args))
-        LOG.error(RETRY_MESSAGE, type(error).__name__, str(error.args))
-        sleep_for(4, 6)
-        return get_margin_leverage()
+    return get_adapter().margin_leverage()
 
 
+@retrying
 def get_net_deposits(from_exchange: bool = False):
     """
     Get deposits and withdraws to calculate the net deposits in crypto.
@@ -910,187 +2075,173 @@ def get_net_deposits(from_exchange: bool = False):
     """
     if not from_exchange and CONF.net_deposits_in_base_currency:
         return CONF.net_deposits_in_base_currency
-    try:
-        currency = CONF.base if CONF.base != 'BTC' else 'XBt'
-        if CONF.exchange == 'bitmex':
-            result = EXCHANGE.private_get_user_wallet({'currency': currency})
-            return (int(result['deposited']) + int(result['transferIn']) - int(result['withdrawn']) - int(result['transferOut'])) * CONF.satoshi_factor
-        if CONF.exchange == 'kraken':
-            net_deposits = 0
-            deposits = EXCHANGE.fetch_deposits(CONF.base)
-            for deposit in deposits:
-                net_deposits += deposit['amount']
-            ledgers = EXCHANGE.private_post_ledgers({'asset': currency, 'type': 'withdrawal'})['result']['ledger']
-            for withdrawal_id in ledgers:
-                net_deposits += float(ledgers[withdrawal_id]['amount'])
-            return net_deposits
-        if CONF.exchange in ['bitpanda', 'coinbase', 'coinbasepro']:
-            net_deposits = 0
-            net_withdrawals = 0
-            deposits = EXCHANGE.fetch_deposits(CONF.base)
-            for deposit in deposits:
-                net_deposits += deposit['amount']
-            withdrawals = EXCHANGE.fetch_withdrawals(CONF.base)
-            for withdrawal in withdrawals:
-                net_withdrawals += withdrawal['amount']
-            if net_deposits > net_withdrawals:
-                return net_deposits - net_withdrawals
-            return 0
-        LOG.warning(NOT_IMPLEMENTED_MESSAGE, 'get_net_deposit()', CONF.exchange)
-        return None
-
-    except (ccxt.ExchangeError, ccxt.NetworkError) as error:
-        handle_account_errors(str(error.args))
-        LOG.error(RETRY_MESSAGE, type(error).__name__, str(error.args))
-        sleep_for(4, 6)
-        return get_net_deposits(from_exchange)
+    return get_adapter().net_deposits()
 
 
 def get_wallet_balance(price: float):
     """
     Fetch the wallet balance in crypto
     """
-    try:
-        if CONF.exchange == 'bitmex':
-            asset = CONF.base if CONF.base != 'BTC' else 'XBt'
-            balances = EXCHANGE.fetch_balance()['info']
-            for bal in balances:
-                if bal['currency'] == asset:
-                    return float(bal['walletBalance']) * CONF.satoshi_factor
-        if CONF.exchange == 'kraken':
-            return float(EXCHANGE.private_post_tradebalance({'asset': CONF.base})['result']['tb'])
-        if CONF.exchange in ['bitpanda', 'coinbase']:
-            balance = 0
-            balances = EXCHANGE.fetch_balance()
-            if balances:
-                if CONF.base in balances and 'total' in balances[CONF.base]:
-                    balance += balances[CONF.base]['total']
-                if CONF.quote in balances and 'total' in balances[CONF.quote]:
-                    fiat = balances[CONF.quote]['total']
-                    if fiat and fiat > 0:
-                        balance += fiat / price
-                return balance
-            LOG.warning('get_net_deposit() could not retrieve bitpanda/coinbase wallet balance')
-            return 0
-        LOG.warning(NOT_IMPLEMENTED_MESSAGE, 'get_wallet_balance()', CONF.exchange)
-        return None
-
-    except (ccxt.ExchangeError, ccxt.NetworkError) as error:
-        handle_account_errors(str(error.args))
-        LOG.error(RETRY_MESSAGE, type(error).__name__, str(error.args))
-        sleep_for(4, 6)
-        return get_wallet_balance(price)
+    return get_adapter().wallet_balance(price)
 
 
 def get_balances():
     """
     Fetch the margin and wallet balance in satoshi
     """
-    try:
-        if CONF.exchange == 'bitmex':
-            asset = CONF.base if CONF.base != 'BTC' else 'XBt'
-            balances = EXCHANGE.fetch_balance()['info']
-            for bal in balances:
-                if bal['currency'] == asset:
-                    return bal
-        LOG.warning(NOT_IMPLEMENTED_MESSAGE, 'get_balances()', CONF.exchange)
-        return None
+    return get_adapter().balances()
+
+
+def get_adapter():
+    """
+    Gets the adapter of the configured exchange, it is created once per exchange instance
+    :return: ExchangeAdapter
+    """
+    global ADAPTER
+    adapter_class = ADAPTERS.get(CONF.exchange, ExchangeAdapter)
+    if ADAPTER is None or ADAPTER.exchange is not EXCHANGE or type(ADAPTER) is not adapter_class:
+        ADAPTER = adapter_class(EXCHANGE)
+    return ADAPTER
+
+
+@retrying
+def fetch_balance():
+    """
+    Fetches the account balance, served from the cycle snapshot if available
+    """
+    if SNAPSHOT is None:
+        return get_adapter().fetch_balance()
+    if SNAPSHOT.balance is None:
+        SNAPSHOT.balance = get_adapter().fetch_balance()
+    return SNAPSHOT.balance
+
+
+@retrying
+def fetch_positions():
+    """
+    Fetches the open positions (bitmex only), served from the cycle snapshot if available
+    """
+    if SNAPSHOT is None:
+        return get_adapter().fetch_positions()
+    if SNAPSHOT.positions is None:
+        SNAPSHOT.positions = get_adapter().fetch_positions()
+    return SNAPSHOT.positions
+
+
+@retrying
+def fetch_trade_balance():
+    """
+    Fetches the trade balance of the base currency (kraken only), served from the cycle snapshot if available
+    :return: TradeBalance
+    """
+    if SNAPSHOT is None:
+        return get_adapter().fetch_trade_balance()
+    if SNAPSHOT.trade_balance is None:
+        SNAPSHOT.trade_balance = get_adapter().fetch_trade_balance()
+    return SNAPSHOT.trade_balance
+
+
+def gather(*calls):
+    """
+    Runs independent exchange reads concurrently, the request budget of the exchange paces them
+    :param calls: functions without arguments
+    :return: list of the results in the order of the calls
+    """
+    return asyncio.run(gather_async(calls))
+
+
+async def gather_async(calls: tuple):
+    loop = asyncio.get_running_loop()
+    return await asyncio.gather(*(loop.run_in_executor(None, call) for call in calls))
 
+
+def prefetch_account(*calls):
+    """
+    Warms the cycle snapshot and the ticker cache with concurrent requests
+    Failures are ignored, the individual getters retry on their own
+    :param calls: the fetch functions whose data the caller is going to read
+    """
+    if SNAPSHOT is None:
+        return
+    try:
+        gather(*calls)
     except (ccxt.ExchangeError, ccxt.NetworkError) as error:
-        handle_account_errors(str(error.args))
-        LOG.error(RETRY_MESSAGE, type(error).__name__, str(error.args))
-        sleep_for(4, 6)
-        return get_balances()
+        LOG.warning('Could not prefetch account data: %s %s', type(error).__name__, str(error.args))
+
+
+def invalidate_snapshot():
+    """
+    Discards the cycle snapshot, the next balance or position query hits the exchange again
+    """
+    if SNAPSHOT is not None:
+        SNAPSHOT.invalidate()
 
 
+@retrying
 def get_open_orders():
     """
     Gets open orders
     :return: [Order]
     """
-    try:
-        if CONF.exchange == 'paymium':
-            orders = EXCHANGE.private_get_user_orders({'active': True})
-        elif CONF.exchange == 'binance':
-            orders = EXCHANGE.fetch_open_orders(CONF.pair, limit=20)
-        elif CONF.exchange == 'bitmex':
-            orders = EXCHANGE.fetch_open_orders(CONF.symbol, limit=20, params={'reverse': True})
-        else:
-            orders = EXCHANGE.fetch_open_orders(CONF.pair, limit=20, params={'reverse': True})
-        if orders:
-            open_orders = []
-            for order in orders:
-                open_orders.append(Order(order))
-            return open_orders
-        return None
-
-    except (ccxt.ExchangeError, ccxt.NetworkError) as error:
-        handle_account_errors(str(error.args))
-        LOG.error(RETRY_MESSAGE, type(error).__name__, str(error.args))
-        sleep_for(4, 6)
-        return get_open_orders()
+    orders = get_adapter().fetch_open_orders(OPEN_ORDERS_PAGE)
+    if orders:
+        open_orders = []
+        for order in orders:
+            open_orders.append(Order(order))
+        return open_orders
+    return None
 
 
-def get_closed_order(orderLimit: int = 10, attempt: int = 0):
+@retrying
+def get_closed_order():
     """
-    Gets the last closed order
+    Gets the last closed order, looking further back while only canceled orders are found
     :return: Order
     """
-    try:
-        if CONF.exchange in ['kraken', 'coinbase']:
-            result = EXCHANGE.fetch_closed_orders(CONF.pair, limit=orderLimit)
-        elif CONF.exchange == 'bitmex':
-            result = EXCHANGE.fetch_closed_orders(CONF.symbol, limit=orderLimit, params={'reverse': True})
-        else:
-            result = EXCHANGE.fetch_closed_orders(CONF.pair, limit=orderLimit, params={'reverse': True})
-        if result:
-            closed = [r for r in result if r['status'] != 'canceled']
-            if not closed:
-                return get_closed_order(orderLimit+10, attempt+1) if attempt < 6 else None
-            orders = sorted(closed, key=lambda order: order['datetime'])
-            last_order = Order(orders[-1])
+    for order_limit in range(10, 80, 10):
+        result = get_adapter().fetch_closed_orders(order_limit)
+        if not result:
+            return None
+        closed = [r for r in result if r['status'] != 'canceled']
+        if closed:
+            last_order = Order(sorted(closed, key=lambda order: order['datetime'])[-1])
             LOG.info('Last %s', str(last_order))
             return last_order
-        return None
-
-    except (ccxt.ExchangeError, ccxt.NetworkError) as error:
-        handle_account_errors(str(error.args))
-        LOG.error(RETRY_MESSAGE, type(error).__name__, str(error.args))
-        sleep_for(4, 6)
-        return get_closed_order()
+    return None
 
 
-def get_current_price(pair: str = None, attempts: int = 0, limit: int = None):
+def get_current_price(pair: str = None, limit: int = None, fresh: bool = False):
     """
     Fetches the current BTC/USD exchange rate
-    In case of failure, the function calls itself again until success
-    :return: int current market price
+    Prices younger than the configured ticker_max_age_seconds are served from the ticker cache unless fresh is set,
+    a streamed price is served if it is younger than FRESH_PRICE_MAX_AGE_SECONDS respectively STREAM_MAX_AGE_SECONDS
+    In case of failure, the request is repeated until success or until the optional limit of attempts is reached
+    :return: int current market price, 0 if the limit was reached
     """
     pair = CONF.symbol if CONF.exchange == 'bitmex' else CONF.pair if not pair else pair
-    try:
-        price = EXCHANGE.fetch_ticker(pair)['bid']
-        if not price:
-            LOG.warning('Price was None')
-            sleep_for(1, 2)
-            return get_current_price(pair, attempts, limit)
-        return float(price)
+    max_age = FRESH_PRICE_MAX_AGE_SECONDS if fresh else STREAM_MAX_AGE_SECONDS
+    if FEED and pair == FEED.symbol and FEED.get_price(max_age):
+        return FEED.get_price(max_age)
+    if not fresh and pair in TICKERS and time.time() - TICKERS[pair]['timestamp'] <= CONF.ticker_max_age_seconds:
+        return TICKERS[pair]['price']
+    return execute('get_current_price', lambda: fetch_price(pair), limit, 0)
 
-    except (ccxt.ExchangeError, ccxt.NetworkError) as error:
-        LOG.info('Got an error %s %s, retrying in 5 seconds...', type(error).__name__, str(error.args))
-        attempts += 1
-        if not limit or attempts < limit:
-            sleep_for(4, 6)
-            return get_current_price(pair, attempts, limit)
-    return 0
+
+def fetch_price(pair: str):
+    price = EXCHANGE.fetch_ticker(pair)['bid']
+    if not price:
+        raise ccxt.ExchangeError('Price was None')
+    TICKERS[pair] = {'price': float(price), 'timestamp': time.time()}
+    if VOLATILITY and pair == (CONF.symbol if CONF.exchange == 'bitmex' else CONF.pair):
+        VOLATILITY.observe(float(price))
+    return float(price)
 
 
 def connect_to_exchange():
-    exchanges = {}
-    for ex in ccxt.exchanges:
-        exchange = getattr(ccxt, ex)
-        exchanges[ex] = exchange
+    if CONF.exchange not in ccxt.exchanges:
+        raise SystemExit(f'Exchange not supported: {CONF.exchange}')
 
-    exchange = exchanges[CONF.exchange]({
+    exchange = getattr(ccxt, CONF.exchange)({
         'enableRateLimit': True,
         'apiKey': CONF.api_key,
         'secret': CONF.api_secret,
@@ -1104,7 +2255,112 @@ def connect_to_exchange():
         else:
             raise SystemExit(f'Test not supported by {CONF.exchange}')
 
-    return exchange
+    # the request budget takes over ccxt's own throttling
+    return ThrottledExchange(exchange, RequestBudget(1000 / exchange.rateLimit, REQUEST_BURST),
+                             CONF.exchange in NONCE_EXCHANGES)
+
+
+def connect_to_stream():
+    """
+    Connects to the websocket api of the configured exchange (ccxt.pro)
+    :return: StreamFeed
+    """
+    import ccxt.pro
+
+    exchange = getattr(ccxt.pro, CONF.exchange)({
+        'apiKey': CONF.api_key,
+        'secret': CONF.api_secret,
+        'password': CONF.api_password
+    })
+    if CONF.test and 'test' in exchange.urls:
+        exchange.urls['api'] = exchange.urls['test']
+    symbol = CONF.symbol if CONF.exchange == 'bitmex' else CONF.pair
+    return StreamFeed(exchange, symbol, CONF.exchange == 'bitmex')
+
+
+def load_markets():
+    """
+    Loads the market definitions and the trading fee from the cache file shared by all instances of an exchange
+    or from the exchange if the cache is outdated, then applies the limits and the fee of the configured pair
+    """
+    cache_file = f'{DATA_DIR}{CONF.exchange}.markets.json'
+    cache = read_markets_cache(cache_file)
+    account = hashlib.sha256(CONF.api_key.encode()).hexdigest()[:12]
+    if cache:
+        EXCHANGE.set_markets(cache['markets'], cache['currencies'])
+    else:
+        execute('load_markets', EXCHANGE.load_markets)
+        cache = {'markets': EXCHANGE.markets, 'currencies': EXCHANGE.currencies, 'fees': {}, 'timestamp': time.time()}
+    if account not in cache['fees']:
+        # fee tiers are account specific
+        cache['fees'][account] = fetch_trading_fee()
+        write_markets_cache(cache_file, cache)
+    apply_market(EXCHANGE.markets.get(CONF.pair), cache['fees'][account])
+
+
+def read_markets_cache(cache_file: str):
+    cache = load_markets_cache(cache_file)
+    if cache and time.time() - cache['timestamp'] < MARKETS_TTL_SECONDS:
+        return cache
+    return None
+
+
+def load_markets_cache(cache_file: str):
+    if os.path.isfile(cache_file):
+        with open(cache_file, 'r') as file:
+            try:
+                return json.load(file)
+            except ValueError:
+                LOG.warning('Ignoring corrupt markets cache %s', cache_file)
+    return None
+
+
+def write_markets_cache(cache_file: str, cache: dict):
+    """
+    Writes the markets with the timestamp of their download, adding a fee does not extend their lifetime
+    The fees written by other instances since the cache was read are kept
+    """
+    cache.setdefault('timestamp', time.time())
+    current = load_markets_cache(cache_file)
+    if current and current['timestamp'] >= cache['timestamp']:
+        # the markets on disk are the same or newer, only our fees are added to them
+        current['fees'].update(cache['fees'])
+        cache = current
+    temp_file = f'{cache_file}.{os.getpid()}.tmp'
+    with open(temp_file, 'w') as file:
+        json.dump(cache, file)
+    os.replace(temp_file, cache_file)
+
+
+def fetch_trading_fee():
+    """
+    Fetches the taker fee of the configured pair
+    :return: the fee rate or None if not available
+    """
+    if EXCHANGE.has.get('fetchTradingFee') is True:
+        fee = execute('fetch_trading_fee', lambda: EXCHANGE.fetch_trading_fee(CONF.pair), 3)
+        if fee and fee.get('taker') is not None:
+            return float(fee['taker'])
+    market = EXCHANGE.markets.get(CONF.pair)
+    if market and market.get('taker') is not None:
+        return float(market['taker'])
+    return None
+
+
+def apply_market(market: dict, fee: float):
+    """
+    Replaces the default minimal order size and fee rate with the ones of the market
+    """
+    global MARKET, MIN_ORDER_SIZE, FEE_RATE
+
+    if fee is not None:
+        FEE_RATE = fee
+    if not market or CONF.exchange == 'bitmex':
+        return
+    MARKET = market
+    if market['limits']['amount']['min']:
+        MIN_ORDER_SIZE = float(market['limits']['amount']['min'])
+    LOG.info('Minimal order size %s %s, fee %.4f%%', MIN_ORDER_SIZE, CONF.base, FEE_RATE * 100)
 
 
 def write_control_file():
@@ -1122,7 +2378,7 @@ def do_buy(quote: float, amount: float, reference_price: float, attempt: int):
     order_size_crypto = None
     order_size_fiat = None
     if attempt <= CONF.trade_trials:
-        buy_price = calculate_buy_price(get_current_price())
+        buy_price = calculate_buy_price(get_current_price(fresh=True))
         max_price = last_price('BUY')
         if max_price and max_price < buy_price:
             LOG.info('Not buying @ %s', buy_price)
@@ -1136,7 +2392,10 @@ def do_buy(quote: float, amount: float, reference_price: float, attempt: int):
             LOG.info('Buy order size below minimum')
             sleep_for(CONF.period_in_seconds)
             return None
-        order = create_buy_order(buy_price, order_size_crypto, order_size_fiat)
+        if is_sliced(order_size_crypto, order_size_fiat, buy_price):
+            return execute_slices('BUY', order_size_fiat or order_size_crypto)
+        order = place_limit_order('buy', buy_price, order_size_crypto, order_size_fiat)
+        track_order(order)
         if order is None:
             order_failed = 'Could not create buy order over %s'
             if order_size_crypto:
@@ -1145,18 +2404,22 @@ def do_buy(quote: float, amount: float, reference_price: float, attempt: int):
                 LOG.warning(order_failed, order_size_fiat)
             sleep_for(CONF.period_in_seconds)
             return None
-        sleep(CONF.order_adjust_seconds)
-        order_status = fetch_order_status(order.id)
+        order_status = wait_for_fill(order)
         if order_status in ['open', 'active']:
-            return cancel_order(order)
+            return keep_or_cancel(order, attempt)
         return order
 
+    filled = settle_open_order('buy')
+    if filled:
+        return filled
     if quote:
-        order_size_crypto = calculate_buy_order_size(quote, reference_price, get_current_price())
+        order_size_crypto = calculate_buy_order_size(quote, reference_price, get_current_price(fresh=True))
     elif amount:
         order_size_fiat = to_bitmex_order_size(amount)
     if order_size_crypto is None and order_size_fiat is None:
         return None
+    if is_sliced(order_size_crypto, order_size_fiat, get_current_price()):
+        return execute_slices('BUY', order_size_fiat or order_size_crypto)
     return create_market_buy_order(order_size_crypto, order_size_fiat)
 
 
@@ -1171,20 +2434,29 @@ def calculate_buy_price(price: float):
 
 def calculate_buy_order_size(reference_quote: float, reference_price: float, actual_price: float):
     """
-    Calculates the buy order size. Minus 1% for fees.
+    Calculates the buy order size. Minus the fee.
     :param reference_quote
     :param reference_price
     :param actual_price:
     :return: the calculated buy_order_size in crypto or None
     """
     quote = reference_quote * (reference_price / actual_price)
-    size = BAL['totalBalanceInCrypto'] / (100 / quote) / 1.01
+    size = BAL['totalBalanceInCrypto'] / (100 / quote) / (1 + FEE_RATE)
     if size > MIN_ORDER_SIZE:
-        return round(size - 0.000000006, 8)
+        return to_order_size(size)
     LOG.info('Order size %f < %f', size, MIN_ORDER_SIZE)
     return None
 
 
+def to_order_size(size: float):
+    """
+    Truncates the order size to the precision of the market, or to 8 decimals if unknown
+    """
+    if MARKET:
+        return float(EXCHANGE.amount_to_precision(CONF.pair, size))
+    return round(size - 0.000000006, 8)
+
+
 def to_bitmex_order_size(amount_fiat: float):
     if CONF.exchange != 'bitmex':
         LOG.warning('to_bitmex_order_size is intended for bitmex only')
@@ -1207,7 +2479,7 @@ def do_sell(quote: float, amount: float, reference_price: float, attempt: int):
     order_size_crypto = None
     order_size_fiat = None
     if attempt <= CONF.trade_trials:
-        sell_price = calculate_sell_price(get_current_price())
+        sell_price = calculate_sell_price(get_current_price(fresh=True))
         min_price = last_price('SELL')
         if min_price and min_price > sell_price:
             LOG.info('Not selling @ %s', sell_price)
@@ -1221,7 +2493,10 @@ def do_sell(quote: float, amount: float, reference_price: float, attempt: int):
             LOG.info('Sell order size below minimum')
             sleep_for(CONF.period_in_seconds)
             return None
-        order = create_sell_order(sell_price, order_size_crypto, order_size_fiat)
+        if is_sliced(order_size_crypto, order_size_fiat, sell_price):
+            return execute_slices('SELL', order_size_fiat or order_size_crypto)
+        order = place_limit_order('sell', sell_price, order_size_crypto, order_size_fiat)
+        track_order(order)
         if order is None:
             order_failed = 'Could not create sell order over %s'
             if order_size_crypto:
@@ -1230,18 +2505,22 @@ def do_sell(quote: float, amount: float, reference_price: float, attempt: int):
                 LOG.warning(order_failed, order_size_fiat)
             sleep_for(CONF.period_in_seconds)
             return None
-        sleep(CONF.order_adjust_seconds)
-        order_status = fetch_order_status(order.id)
+        order_status = wait_for_fill(order)
         if order_status in ['open', 'active']:
-            return cancel_order(order)
+            return keep_or_cancel(order, attempt)
         return order
 
+    filled = settle_open_order('sell')
+    if filled:
+        return filled
     if quote:
-        order_size_crypto = calculate_sell_order_size(quote, reference_price, get_current_price())
+        order_size_crypto = calculate_sell_order_size(quote, reference_price, get_current_price(fresh=True))
     elif amount:
         order_size_fiat = to_bitmex_order_size(amount)
     if order_size_crypto is None and order_size_fiat is None:
         return None
+    if is_sliced(order_size_crypto, order_size_fiat, get_current_price()):
+        return execute_slices('SELL', order_size_fiat or order_size_crypto)
     return create_market_sell_order(order_size_crypto, order_size_fiat)
 
 
@@ -1256,80 +2535,387 @@ def calculate_sell_price(price: float):
 
 def calculate_sell_order_size(reference_quote: float, reference_price: float, actual_price: float):
     """
-    Calculates the sell order size. Minus 1% for fees.
+    Calculates the sell order size. Minus the fee.
     :param reference_quote
     :param reference_price
     :param actual_price:
     :return: the calculated sell_order_size or None
     """
     quote = reference_quote / (reference_price / actual_price)
-    size = BAL['totalBalanceInCrypto'] / (100 / quote) / 1.01
-    return round(size - 0.000000006, 8) if size > MIN_ORDER_SIZE else None
+    size = BAL['totalBalanceInCrypto'] / (100 / quote) / (1 + FEE_RATE)
+    return to_order_size(size) if size > MIN_ORDER_SIZE else None
 
 
+@retrying
 def fetch_order_status(order_id: str):
     """
     Fetches the status of an order
     input: id of an order
     output: status of the order (open, closed)
     """
+    if FEED and FEED.get_order_status(order_id):
+        return FEED.get_order_status(order_id)
+    return get_adapter().fetch_order_status(order_id)
+
+
+def place_limit_order(side: str, price: float, amount_crypto: float, amount_fiat: float):
+    """
+    Moves the order kept open by the previous trade trial to the new price if possible, else creates a new order
+    :return: Order
+    """
+    if OPEN_ORDER and OPEN_ORDER.side == side:
+        order = reprice_order(OPEN_ORDER, price, amount_crypto, amount_fiat)
+        if order:
+            forget_open_order()
+            return order
+    filled = settle_open_order(side)
+    if filled:
+        return filled
+    if side == 'buy':
+        return create_buy_order(price, amount_crypto, amount_fiat)
+    return create_sell_order(price, amount_crypto, amount_fiat)
+
+
+def keep_or_cancel(order: Order, attempt: int):
+    """
+    Keeps the open order for repricing in the next trade trial if enabled and supported, else cancels it
+    :return: the order if it has been filled since, else None
+    """
+    global OPEN_ORDER
+    if CONF.reprice_orders and attempt < CONF.trade_trials and get_adapter().can_edit:
+        OPEN_ORDER = order
+        return None
+    filled = cancel_order(order)
+    track_order(None)
+    return filled
+
+
+def cancel_open_order():
+    """
+    Cancels the order kept open for repricing
+    :return: the order if it has been filled since, else None
+    """
+    order = forget_open_order()
+    return cancel_order(order) if order else None
+
+
+def settle_open_order(side: str):
+    """
+    Cancels the order kept open for repricing, a fill of the other side is recorded on its own
+    :return: the order if it has been filled on the given side since, else None
+    """
+    filled = cancel_open_order()
+    if filled and filled.side != side:
+        record_fill(filled)
+        return None
+    return filled
+
+
+def forget_open_order():
+    global OPEN_ORDER
+    order, OPEN_ORDER = OPEN_ORDER, None
+    return order
+
+
+@retrying
+def reprice_order(order: Order, price: float, amount_crypto: float, amount_fiat: float):
+    """
+    Amends the price and amount of an open limit order
+    :return: the amended Order or None if the order could not be amended
+    """
+    adapter = get_adapter()
+    price = adapter.round_price(price)
+    amount_crypto, amount_fiat, amount = adapter.order_amounts(amount_crypto, amount_fiat, price)
+    if not amount:
+        return None
     try:
-        if CONF.exchange == 'paymium':
-            order = EXCHANGE.private_get_user_orders_uuid({'uuid': order_id})
-            if order:
-                return order['state']
-            LOG.warning('Order with id %s not found', order_id)
-            return 'unknown'
-        if CONF.exchange == 'binance':
-            order = EXCHANGE.fetch_order(order_id, symbol=CONF.pair)
-            if order:
-                return order['status']
-            LOG.warning('Order with id %s not found', order_id)
-            return 'unknown'
-        return EXCHANGE.fetch_order_status(order_id)
+        edited = adapter.edit_order(order.id, order.side, amount, price)
+        invalidate_snapshot()
+        known = {'id': order.id, 'side': order.side, 'amount': None, 'datetime': order.datetime}
+        known.update({key: value for key, value in edited.items() if value is not None})
+        norder = Order(known, amount_fiat, amount_crypto, price)
+        LOG.info('Repriced %s', str(norder))
+        note_order(price)
+        return norder
+
+    except ccxt.InvalidOrder as error:
+        LOG.warning('Could not reprice %s %s', str(order), str(error.args))
+        return None
+
+
+def is_sliced(amount_crypto: float, amount_fiat: float, price: float):
+    """
+    :return: True if the notional of the order exceeds the configured slice_notional
+    """
+    if not CONF.slice_notional:
+        return False
+    notional = amount_fiat if amount_fiat else amount_crypto * price
+    return notional > CONF.slice_notional
+
+
+def execute_slices(direction: str, amount: float):
+    """
+    Executes a large order as child orders of at most slice_notional
+    TWAP spreads the child orders evenly over slice_window_minutes,
+    ICEBERG places the next one as soon as the previous one is done
+    :param direction: BUY or SELL
+    :param amount: total amount, in fiat for bitmex, else in crypto
+    :return: Order over the executed amount or None
+    """
+    progress = {'direction': direction, 'amount': amount, 'done': 0, 'cost': 0, 'id': None, 'child': None,
+                'price': get_current_price(), 'timestamp': time.time()}
+    write_slice_progress(progress)
+    return run_slices(progress)
+
+
+def resume_slices():
+    """
+    Resumes the remaining amount of a sliced order interrupted by a restart
+    The child order placed before the restart is reconciled first, the remainder is dropped if the plan
+    is older than slice_window_minutes or the price has moved by more than the tolerance since
+    :return: Order over the executed amount or None
+    """
+    progress = read_slice_progress()
+    if not progress:
+        return None
+    if not reconcile_slice_child(progress) or is_slice_plan_outdated(progress):
+        LOG.info('Dropping %s of %s remaining', progress['direction'].lower(), progress['amount'] - progress['done'])
+        remove_slice_progress()
+        return slices_order(progress)
+    LOG.info('Resuming %s of %s remaining', progress['direction'].lower(), progress['amount'] - progress['done'])
+    return run_slices(progress)
+
+
+def reconcile_slice_child(progress: dict):
+    """
+    Adds the fill of the child order placed before a restart to the progress, the order is canceled if still open
+    :return: False if the child order is unknown because the restart happened while it was being placed
+    """
+    child = progress.get('child')
+    if not child:
+        return True
+    done = child['filled']
+    if child['id']:
+        amount_crypto, amount_fiat = (None, child['amount']) if get_adapter().fiat_amounts else (child['amount'], None)
+        order = Order({'id': child['id'], 'side': progress['direction'].lower(), 'amount': None,
+                       'price': child['price'], 'datetime': None}, amount_fiat, amount_crypto)
+        filled = cancel_order(order)
+        if filled:
+            done += filled.filled if filled.is_partially_filled() else child['amount']
+            progress['id'] = child['id']
+    else:
+        LOG.warning('Child order of the sliced %s was placed without being recorded', progress['direction'].lower())
+    progress['done'] += done
+    progress['cost'] += done * child['price']
+    progress['child'] = None
+    write_slice_progress(progress)
+    return bool(child['id'])
+
+
+def is_slice_plan_outdated(progress: dict):
+    if time.time() - progress.get('timestamp', 0) > CONF.slice_window_minutes * 60:
+        return True
+    price = get_current_price()
+    return bool(progress.get('price')) and abs(price / progress['price'] - 1) * 100 > CONF.tolerance_in_percent
+
+
+def run_slices(progress: dict):
+    slice_amount = get_adapter().notional_amount(CONF.slice_notional, get_current_price(fresh=True))
+    minimum = get_adapter().min_amount
+    count = math.ceil((progress['amount'] - progress['done']) / slice_amount)
+    interval = CONF.slice_window_minutes * 60 / count if CONF.slice_mode == 'TWAP' and count else 0
+    while progress['amount'] - progress['done'] >= minimum:
+        started = time.time()
+        remaining = progress['amount'] - progress['done']
+        child = remaining if remaining - slice_amount < minimum else slice_amount
+        order = execute_slice(progress['direction'], child, progress)
+        if order is None:
+            break
+        progress['done'] += child
+        progress['cost'] += child * (order.price or get_current_price())
+        progress['id'] = order.id
+        progress['child'] = None
+        write_slice_progress(progress)
+        LOG.info('Executed slice %s of %s', progress['done'], progress['amount'])
+        if progress['amount'] - progress['done'] >= minimum:
+            sleep_for(max(interval - (time.time() - started), 0))
+    remove_slice_progress()
+    return slices_order(progress)
 
-    except (ccxt.ExchangeError, ccxt.NetworkError) as error:
-        handle_account_errors(str(error.args))
-        LOG.error(RETRY_MESSAGE, type(error).__name__, str(error.args))
-        sleep_for(4, 6)
-        return fetch_order_status(order_id)
+
+def slices_order(progress: dict):
+    """
+    :return: Order over the executed amount at the average price or None if nothing was executed
+    """
+    if not progress['done']:
+        return None
+    amount_crypto, amount_fiat = (None, progress['done']) if get_adapter().fiat_amounts else (progress['done'], None)
+    return Order({'id': progress['id'], 'side': progress['direction'].lower(), 'amount': None,
+                  'price': progress['cost'] / progress['done'],
+                  'datetime': datetime.datetime.utcnow().isoformat()}, amount_fiat, amount_crypto)
+
+
+def execute_slice(direction: str, amount: float, progress: dict = None):
+    """
+    Places one child order as limit order and completes it at market price if it is not filled in time
+    Each child order is recorded in the progress, as pending before it is placed and with its id right after
+    :return: Order or None
+    """
+    amount_crypto, amount_fiat = get_adapter().split_amount(amount)
+    price = get_current_price(fresh=True)
+    record_slice_child(progress, None, amount, price)
+    if direction == 'BUY':
+        order = create_buy_order(calculate_buy_price(price), amount_crypto, amount_fiat)
+    else:
+        order = create_sell_order(calculate_sell_price(price), amount_crypto, amount_fiat)
+    if order is None:
+        record_slice_child(progress, None, 0, price)
+        return None
+    record_slice_child(progress, order.id, amount, order.price)
+    if wait_for_fill(order) not in ['open', 'active']:
+        return order
+    filled = cancel_order(order)
+    if filled and not filled.is_partially_filled():
+        return filled
+    remaining = amount
+    if filled:
+        amount_crypto, amount_fiat = get_adapter().split_amount(filled.remaining)
+        remaining = filled.remaining
+    record_slice_child(progress, None, remaining, price, amount - remaining)
+    if direction == 'BUY':
+        order = create_market_buy_order(amount_crypto, amount_fiat)
+    else:
+        order = create_market_sell_order(amount_crypto, amount_fiat)
+    if order:
+        record_slice_child(progress, order.id, remaining, price, amount - remaining)
+    return order
+
+
+def record_slice_child(progress: dict, order_id: str, amount: float, price: float, filled: float = 0):
+    """
+    Records the child order in flight, amount is the part of the slice it covers and filled the part done before
+    """
+    if progress is None:
+        return
+    progress['child'] = {'id': order_id, 'amount': amount, 'price': price, 'filled': filled} if amount else None
+    write_slice_progress(progress)
+
+
+def read_slice_progress():
+    progress_file = f'{DATA_DIR}{INSTANCE}.slices'
+    if os.path.isfile(progress_file):
+        with open(progress_file, 'r') as file:
+            try:
+                return json.load(file)
+            except ValueError:
+                LOG.warning('Ignoring corrupt slice progress %s', progress_file)
+    return None
+
+
+def write_slice_progress(progress: dict):
+    progress_file = f'{DATA_DIR}{INSTANCE}.slices'
+    temp_file = f'{progress_file}.{os.getpid()}.tmp'
+    with open(temp_file, 'w') as file:
+        json.dump(progress, file)
+    os.replace(temp_file, progress_file)
+
+
+def remove_slice_progress():
+    progress_file = f'{DATA_DIR}{INSTANCE}.slices'
+    if os.path.isfile(progress_file):
+        os.remove(progress_file)
+
+
+def wait_for_fill(order: Order, deadline: float = None):
+    """
+    Waits until the order is no longer open or until order_adjust_seconds or the given deadline have passed
+    The order status is polled with a growing interval, streamed order updates are checked every second
+    :return: the last known status of the order
+    """
+    deadline = deadline or time.time() + CONF.order_adjust_seconds
+    interval = FILL_POLL_SECONDS
+    while True:
+        sleep(max(min(1 if FEED else interval, deadline - time.time()), 0))
+        if FEED and time.time() < deadline:
+            status = FEED.get_order_status(order.id)
+        else:
+            status = fetch_order_status(order.id)
+            interval = min(interval * 2, MAX_FILL_POLL_SECONDS)
+        if (status and status not in ['open', 'active']) or time.time() >= deadline:
+            return status
 
 
-def cancel_all_open_orders():
-    if not KEEP_ORDERS:
-        orders = get_open_orders()
-        if orders:
-            for order in orders:
-                cancel_order(order)
+def fetch_order(order_id: str):
+    """
+    Fetches an order with its filled amount where the exchange or the stream provides it
+    :return: dict with at least the status of the order
+    """
+    if FEED and FEED.get_order_status(order_id):
+        return {'id': order_id, 'status': FEED.get_order_status(order_id), 'filled': FEED.fills.get(order_id)}
+    order = get_adapter().fetch_order(order_id)
+    if order is None:
+        return {'id': order_id, 'status': get_adapter().fetch_order_status(order_id), 'filled': None}
+    return order
 
 
+def cancel_all_open_orders(keep: str = None):
+    """
+    Cancels all open orders of the pair, with one request where the exchange supports it,
+    else page by page with the cancellations of a page running concurrently
+    :param keep: id of an order to be left open
+    """
+    if KEEP_ORDERS:
+        return
+    if get_adapter().can_cancel_all and not keep:
+        execute('cancel_all_orders', lambda: get_adapter().cancel_all_orders())
+        invalidate_snapshot()
+        LOG.info('Canceled all open orders')
+        return
+    seen = set()
+    while True:
+        orders = [order for order in get_open_orders() or [] if order.id not in seen]
+        if not orders:
+            return
+        seen.update(order.id for order in orders)
+        gather(*[functools.partial(cancel_order, order) for order in orders if order.id != keep])
+        if len(orders) < OPEN_ORDERS_PAGE:
+            return
+
+
+@retrying
 def cancel_order(order: Order):
     """
     Cancels an order
-    :return the order if it has been filled since, else None
+    :return the order if it has been filled or partially filled since, else None
     """
     try:
         if order:
-            status = fetch_order_status(order.id)
+            current = fetch_order(order.id)
+            status = current['status']
             if status in ['open', 'active']:
-                EXCHANGE.cancel_order(order.id)
+                canceled = get_adapter().cancel_order(order.id)
+                invalidate_snapshot()
+                order.update_fill(current)
+                if isinstance(canceled, dict):
+                    order.update_fill(canceled)
                 LOG.info('Canceled %s', str(order))
-                return None
+                return order if order.is_partially_filled() else None
             if status and str(status).lower() in ['filled', 'closed']:
+                invalidate_snapshot()
+                return order
+            order.update_fill(current)
+            if order.is_partially_filled():
+                invalidate_snapshot()
                 return order
             LOG.warning('Order to be canceled %s was in state %s', str(order), status)
         return None
 
     except ccxt.OrderNotFound as error:
         if any(e in str(error.args).lower() for e in ['filled', 'cancelorder']):
+            invalidate_snapshot()
             return order
         LOG.error('Order to be canceled not found %s %s', str(order), str(error.args))
         return None
-    except (ccxt.ExchangeError, ccxt.NetworkError) as error:
-        handle_account_errors(str(error.args))
-        LOG.error(RETRY_MESSAGE, type(error).__name__, str(error.args))
-        sleep_for(4, 6)
-        cancel_order(order)
 
 
 def create_sell_order(price: float, amount_crypto: float, amount_fiat: float):
@@ -1340,37 +2926,7 @@ def create_sell_order(price: float, amount_crypto: float, amount_fiat: float):
     :param amount_fiat: float amount in fiat
     :return: Order
     """
-    if amount_crypto is None and amount_fiat is None:
-        return None
-    try:
-        if CONF.exchange == 'bitmex':
-            price = round(price * 2) / 2
-            if not amount_fiat:
-                amount_fiat = amount_crypto * price
-            amount_fiat = to_bitmex_order_size(amount_fiat)
-            if not amount_fiat:
-                return None
-            new_order = EXCHANGE.create_limit_sell_order(CONF.symbol, amount_fiat, price)
-        else:
-            new_order = EXCHANGE.create_limit_sell_order(CONF.pair, amount_crypto, price)
-        norder = Order(new_order, amount_fiat, amount_crypto, price)
-        LOG.info('Created %s', str(norder))
-        return norder
-
-    except (ccxt.ExchangeError, ccxt.NetworkError, ccxt.InvalidOrder) as error:
-        if any(e in str(error.args) for e in STOP_ERRORS):
-            not_selling = 'Order submission not possible - not selling %s'
-            if CONF.exchange == 'bitmex':
-                LOG.warning(not_selling, amount_fiat)
-            else:
-                LOG.warning(not_selling, amount_crypto)
-            LOG.error(error)
-            sleep_for(CONF.period_in_seconds * 10)
-            return None
-        handle_account_errors(str(error.args))
-        LOG.error(RETRY_MESSAGE, type(error).__name__, str(error.args))
-        sleep_for(4, 6)
-        return create_sell_order(price, amount_crypto, amount_fiat)
+    return create_limit_order('sell', price, amount_crypto, amount_fiat)
 
 
 def create_buy_order(price: float, amount_crypto: float, amount_fiat: float):
@@ -1380,40 +2936,22 @@ def create_buy_order(price: float, amount_crypto: float, amount_fiat: float):
     :param amount_crypto: float the order volume
     :param amount_fiat: float the order volume
     """
-    if amount_crypto is None and amount_fiat is None:
-        return None
-    try:
-        if CONF.exchange == 'bitmex':
-            price = round(price * 2) / 2
-            if not amount_fiat:
-                amount_fiat = amount_crypto * price
-            amount_fiat = to_bitmex_order_size(amount_fiat)
-            if not amount_fiat:
-                return None
-            new_order = EXCHANGE.create_limit_buy_order(CONF.symbol, amount_fiat, price)
-        elif CONF.exchange == 'kraken':
-            new_order = EXCHANGE.create_limit_buy_order(CONF.pair, amount_crypto, price, {'oflags': 'fcib'})
-        else:
-            new_order = EXCHANGE.create_limit_buy_order(CONF.pair, amount_crypto, price)
+    return create_limit_order('buy', price, amount_crypto, amount_fiat)
 
-        norder = Order(new_order, amount_fiat, amount_crypto, price)
-        LOG.info('Created %s', str(norder))
-        return norder
 
-    except (ccxt.ExchangeError, ccxt.NetworkError, ccxt.InvalidOrder) as error:
-        if any(e in str(error.args) for e in STOP_ERRORS):
-            not_buying = 'Order submission not possible - not buying %s'
-            if CONF.exchange == 'bitmex':
-                LOG.warning(not_buying, amount_fiat)
-            else:
-                LOG.warning(not_buying, amount_crypto)
-            LOG.error(error)
-            sleep_for(CONF.period_in_seconds * 10)
-            return None
-        handle_account_errors(str(error.args))
-        LOG.error(RETRY_MESSAGE, type(error).__name__, str(error.args))
-        sleep_for(4, 6)
-        return create_buy_order(price, amount_crypto, amount_fiat)
+def create_limit_order(side: str, price: float, amount_crypto: float, amount_fiat: float):
+    if amount_crypto is None and amount_fiat is None:
+        return None
+    adapter = get_adapter()
+    price = adapter.round_price(price)
+    amount_crypto, amount_fiat, amount = adapter.order_amounts(amount_crypto, amount_fiat, price)
+    if not amount:
+        return None
+    submission = {'id': client_order_id(side, amount, price), 'sent': False}
+    order = execute(f'create_{side}_order', lambda: submit_order(submission, side, price, amount_crypto, amount_fiat))
+    if order:
+        note_order(price)
+    return order
 
 
 def create_market_sell_order(amount_crypto: float, amount_fiat: float):
@@ -1422,34 +2960,9 @@ def create_market_sell_order(amount_crypto: float, amount_fiat: float):
     input: amount_crypto to be sold
     input: amount_fiat to be sold
     """
-    try:
-        if CONF.exchange == 'bitmex':
-            if not amount_fiat:
-                amount_fiat = amount_crypto * get_current_price()
-            amount_fiat = to_bitmex_order_size(amount_fiat)
-            if not amount_fiat:
-                return None
-            new_order = EXCHANGE.create_market_sell_order(CONF.symbol, amount_fiat)
-        else:
-            new_order = EXCHANGE.create_market_sell_order(CONF.pair, amount_crypto)
-        norder = Order(new_order, amount_fiat, amount_crypto)
-        LOG.info('Created market %s', str(norder))
-        return norder
-
-    except (ccxt.ExchangeError, ccxt.NetworkError, ccxt.InvalidOrder) as error:
-        if any(e in str(error.args) for e in STOP_ERRORS):
-            not_selling = 'Order submission not possible - not selling %s'
-            if amount_crypto:
-                LOG.warning(not_selling, amount_crypto)
-            elif amount_fiat:
-                LOG.warning(not_selling, amount_fiat)
-            LOG.error(error)
-            sleep_for(CONF.period_in_seconds * 10)
-            return None
-        handle_account_errors(str(error.args))
-        LOG.error(RETRY_MESSAGE, type(error).__name__, str(error.args))
-        sleep_for(4, 6)
-        return create_market_sell_order(amount_crypto, amount_fiat)
+    if get_adapter().fiat_amounts and not amount_fiat:
+        amount_fiat = amount_crypto * get_current_price()
+    return create_market_order('sell', amount_crypto, amount_fiat)
 
 
 def create_market_buy_order(amount_crypto: float, amount_fiat: float = None):
@@ -1458,36 +2971,68 @@ def create_market_buy_order(amount_crypto: float, amount_fiat: float = None):
     input: amount_crypto to be bought
     input: amount_fiat to be bought
     """
+    if get_adapter().fiat_amounts and not amount_fiat:
+        amount_fiat = amount_crypto * get_current_price()
+    return create_market_order('buy', amount_crypto, amount_fiat)
+
+
+def create_market_order(side: str, amount_crypto: float, amount_fiat: float):
+    amount_crypto, amount_fiat, amount = get_adapter().order_amounts(amount_crypto, amount_fiat, None)
+    if not amount:
+        return None
+    submission = {'id': client_order_id(side, amount), 'sent': False}
+    order = execute('create_market_order', lambda: submit_order(submission, side, None, amount_crypto, amount_fiat))
+    if order:
+        note_order(None)
+    return order
+
+
+def client_order_id(side: str, amount: float, price: float = None):
+    """
+    Derives the client order id of an intended order from the instance, the order and its sequence number,
+    every retry of the same order is sent with the same id
+    """
+    global ORDER_SEQUENCE
+    ORDER_SEQUENCE += 1
+    intent = f'{INSTANCE}|{STARTED}|{ORDER_SEQUENCE}|{side}|{amount}|{price}'
+    return hashlib.sha256(intent.encode()).hexdigest()[:24]
+
+
+def submit_order(submission: dict, side: str, price: float, amount_crypto: float, amount_fiat: float):
+    """
+    Sends a limit order, or a market order if no price is given
+    If the order has been sent before, it is looked up by its client order id first, so that a request whose
+    response got lost is not placed twice
+    :param submission: dict with the client order id and whether the order has been sent already
+    :return: Order
+    """
+    adapter = get_adapter()
+    amount = amount_fiat if adapter.fiat_amounts else amount_crypto
     try:
-        if CONF.exchange == 'bitmex':
-            if not amount_fiat:
-                amount_fiat = amount_crypto * get_current_price()
-            amount_fiat = to_bitmex_order_size(amount_fiat)
-            if not amount_fiat:
-                return None
-            new_order = EXCHANGE.create_market_buy_order(CONF.symbol, amount_fiat)
-        elif CONF.exchange == 'kraken':
-            new_order = EXCHANGE.create_market_buy_order(CONF.pair, amount_crypto, {'oflags': 'fcib'})
-        else:
-            new_order = EXCHANGE.create_market_buy_order(CONF.pair, amount_crypto)
-        norder = Order(new_order, amount_fiat, amount_crypto)
-        LOG.info('Created market %s', str(norder))
+        new_order = None
+        if submission['sent']:
+            new_order = adapter.fetch_order_by_client_id(submission['id'])
+            if new_order:
+                LOG.info('Found order %s sent before the error', submission['id'])
+        if not new_order:
+            submission['sent'] = True
+            if price is None:
+                new_order = adapter.create_market_order(side, amount, submission['id'])
+            else:
+                new_order = adapter.create_limit_order(side, amount, price, submission['id'])
+        invalidate_snapshot()
+        norder = Order(new_order, amount_fiat, amount_crypto, price)
+        LOG.info('Created market %s' if price is None else 'Created %s', str(norder))
         return norder
 
     except (ccxt.ExchangeError, ccxt.NetworkError, ccxt.InvalidOrder) as error:
         if any(e in str(error.args) for e in STOP_ERRORS):
-            not_buying = 'Order submission not possible - not buying %s'
-            if amount_crypto:
-                LOG.warning(not_buying, amount_crypto)
-            elif amount_fiat:
-                LOG.warning(not_buying, amount_fiat)
+            not_trading = 'Order submission not possible - not {}ing %s'.format(side)
+            LOG.warning(not_trading, amount)
             LOG.error(error)
             sleep_for(CONF.period_in_seconds * 10)
             return None
-        handle_account_errors(str(error.args))
-        LOG.error(RETRY_MESSAGE, type(error).__name__, str(error.args))
-        sleep_for(4, 6)
-        return create_market_buy_order(amount_crypto, amount_fiat)
+        raise
 
 
 def get_used_balance():
@@ -1495,24 +3040,7 @@ def get_used_balance():
     Fetch the used balance in fiat.
     output: float
     """
-    try:
-        if CONF.exchange == 'bitmex':
-            position = EXCHANGE.private_get_position()
-            if position:
-                for po in position:
-                    if po['symbol'] == CONF.symbol:
-                        return float(po['currentQty'])
-            return None
-        if CONF.exchange == 'kraken':
-            result = EXCHANGE.private_post_tradebalance()['result']
-            return float(result['e']) - float(result['mf'])
-        return float(get_crypto_balance()['used'] * get_current_price())
-
-    except (ccxt.ExchangeError, ccxt.NetworkError) as error:
-        handle_account_errors(str(error.args))
-        LOG.error(RETRY_MESSAGE, type(error).__name__, str(error.args))
-        sleep_for(4, 6)
-        return get_used_balance()
+    return get_adapter().used_balance()
 
 
 def get_crypto_balance():
@@ -1532,61 +3060,31 @@ def get_fiat_balance():
 
 
 def get_balance(currency: str):
-    try:
-        alt_currency = ''
-        if CONF.exchange == 'kraken':
-            if currency == 'BTC':
-                alt_currency = 'XBT.F'
-            else:
-                alt_currency = currency + '.F'
-        balance_result = {'free': 0, 'used': 0, 'total': 0}
-        bal = EXCHANGE.fetch_balance()
-        if currency in bal or alt_currency in bal:
-            if alt_currency in bal and bal[alt_currency]['total'] > 0:
-                currency = alt_currency
-            if 'free' in bal[currency]:
-                balance_result['free'] = bal[currency]['free'] or 0
-            if 'used' in bal[currency]:
-                balance_result['used'] = bal[currency]['used'] or 0
-            if 'total' in bal[currency]:
-                balance_result['total'] = bal[currency]['total'] or 0
-        else:
-            LOG.warning('No %s balance found', currency)
-        return balance_result
-
-    except (ccxt.ExchangeError, ccxt.NetworkError) as error:
-        handle_account_errors(str(error.args))
-        LOG.error(RETRY_MESSAGE, type(error).__name__, str(error.args))
-        sleep_for(4, 6)
-        return get_balance(currency)
+    balance_result = {'free': 0, 'used': 0, 'total': 0}
+    bal = fetch_balance()
+    currency = get_adapter().balance_key(currency, bal)
+    if currency in bal:
+        if 'free' in bal[currency]:
+            balance_result['free'] = bal[currency]['free'] or 0
+        if 'used' in bal[currency]:
+            balance_result['used'] = bal[currency]['used'] or 0
+        if 'total' in bal[currency]:
+            balance_result['total'] = bal[currency]['total'] or 0
+    else:
+        LOG.warning('No %s balance found', currency)
+    return balance_result
 
 
 def get_position_info():
-    try:
-        if CONF.exchange == 'bitmex':
-            position = EXCHANGE.private_get_position()
-            if position:
-                for po in position:
-                    if po['symbol'] == CONF.symbol:
-                        return po
-            return None
-        LOG.warning(NOT_IMPLEMENTED_MESSAGE, 'get_postion_info()', CONF.exchange)
-        return None
-
-    except (ccxt.ExchangeError, ccxt.NetworkError) as error:
-        handle_account_errors(str(error.args))
-        LOG.error(RETRY_MESSAGE, type(error).__name__, str(error.args))
-        sleep_for(4, 6)
-        return get_position_info()
+    if FEED and FEED.get_position() is not None:
+        return FEED.get_position()
+    return get_adapter().position()
 
 
+@retrying
 def set_leverage(new_leverage: float):
     try:
-        if CONF.exchange == 'bitmex':
-            EXCHANGE.private_post_position_leverage({'symbol': CONF.symbol, 'leverage': new_leverage})
-            LOG.info('Setting leverage to %s', new_leverage)
-        else:
-            LOG.error('set_leverage() not yet implemented for %s', CONF.exchange)
+        get_adapter().set_leverage(new_leverage)
         return None
 
     except (ccxt.ExchangeError, ccxt.NetworkError) as error:
@@ -1599,10 +3097,31 @@ def set_leverage(new_leverage: float):
         if any(e in str(error.args) for e in STOP_ERRORS):
             LOG.warning('Insufficient available balance - not setting leverage to %s', new_leverage)
             return None
-        handle_account_errors(str(error.args))
-        LOG.error(RETRY_MESSAGE, type(error).__name__, str(error.args))
-        sleep_for(4, 6)
-        return set_leverage(new_leverage)
+        raise
+
+
+def calculate_period():
+    """
+    Shortens the time until the next cycle when the realised volatility makes it likely that the price leaves
+    the trigger band before, and stretches it when that is unlikely, within min_period_in_minutes and
+    max_period_in_minutes
+    Without a trigger band the tolerance is taken as the distance to the next trade
+    :return: seconds until the next cycle
+    """
+    if VOLATILITY is None or CONF.min_period_in_seconds >= CONF.max_period_in_seconds:
+        return CONF.period_in_seconds
+    if FEED:
+        VOLATILITY.observe(FEED.get_price())
+    variance = VOLATILITY.variance_per_second()
+    if not variance:
+        return CONF.period_in_seconds
+    price = VOLATILITY.last_price()
+    if BAND:
+        distance = min(math.log(BAND['high'] / price), math.log(price / BAND['low']) if BAND['low'] else math.inf)
+    else:
+        distance = CONF.tolerance_in_percent / 100
+    period = (max(distance, 0) / CROSSING_DEVIATIONS) ** 2 / variance
+    return round(min(max(period, CONF.min_period_in_seconds), CONF.max_period_in_seconds))
 
 
 def sleep_for(minimal: int, maximal: int = None):
@@ -1612,6 +3131,196 @@ def sleep_for(minimal: int, maximal: int = None):
         time.sleep(minimal)
 
 
+def record_fill(order: Order):
+    """
+    Takes a fill outside of the regular trade path into account, it becomes the last order and is reported
+    """
+    global ORDER, LAST_ORDER, BAL
+    ORDER = order
+    if CONF.backtrade_only_on_profit:
+        LAST_ORDER = order
+    invalidate_snapshot()
+    BAL = apply_fill(BAL, order)
+    record_execution(order)
+    do_post_trade_action()
+
+
+def begin_execution(action: dict):
+    """
+    Starts tracking the execution of an action, its decision price is the reference for the slippage
+    """
+    global EXECUTION
+    if EXECUTION and EXECUTION['direction'] == action['direction']:
+        return
+    EXECUTION = {'direction': action['direction'], 'decision': action['price'], 'started': time.time(),
+                 'limit': None, 'trials': 0, 'market': False}
+
+
+def end_execution():
+    global EXECUTION, ORDER_STATE
+    EXECUTION = None
+    ORDER_STATE = None
+    remove_order_state()
+
+
+def first_attempt(action: dict):
+    """
+    :return: the trade trial to start the action with, the trial interrupted by a restart is continued
+    """
+    if ORDER_STATE and action and ORDER_STATE['direction'] == action['direction'] and ORDER_STATE['init'] == INIT:
+        return ORDER_STATE['attempt']
+    return 1 if not INIT else CONF.trade_trials + 1
+
+
+def track_intent(action: dict, attempt: int):
+    """
+    Records the trade trial about to run, an order kept open for repricing stays recorded
+    """
+    global ORDER_STATE
+    order = ORDER_STATE['order'] if ORDER_STATE and OPEN_ORDER else None
+    ORDER_STATE = {'direction': action['direction'], 'attempt': attempt, 'init': INIT, 'order': order,
+                   'deadline': ORDER_STATE['deadline'] if order else None, 'execution': EXECUTION}
+    write_order_state(ORDER_STATE)
+
+
+def track_order(order: Order):
+    """
+    Records the order of the running trade trial with the deadline until it is waited for
+    """
+    if ORDER_STATE is None:
+        return
+    if order:
+        ORDER_STATE['order'] = {'id': order.id, 'side': order.side, 'price': order.price, 'amount': order.amount,
+                                'datetime': order.datetime}
+        ORDER_STATE['deadline'] = time.time() + CONF.order_adjust_seconds
+    else:
+        ORDER_STATE['order'] = None
+        ORDER_STATE['deadline'] = None
+    ORDER_STATE['execution'] = EXECUTION
+    write_order_state(ORDER_STATE)
+
+
+def resume_order():
+    """
+    Takes over the trade trial interrupted by a restart instead of starting over: its order is watched until
+    its deadline and then kept for repricing or canceled like in the regular trade path, all other open orders
+    are canceled
+    :return: the order if it has been filled, else None
+    """
+    global ORDER_STATE, EXECUTION, OPEN_ORDER
+    state = read_order_state()
+    tracked = state['order'] if state else None
+    cancel_all_open_orders(tracked['id'] if tracked else None)
+    if not state:
+        return None
+    LOG.info('Resuming %s trial %s', state['direction'].lower(), state['attempt'])
+    ORDER_STATE = state
+    EXECUTION = state['execution']
+    if not tracked:
+        return None
+    amount_crypto, amount_fiat = (None, tracked['amount']) if get_adapter().fiat_amounts else (tracked['amount'], None)
+    order = Order(dict(tracked, amount=None), amount_fiat, amount_crypto)
+    if state['deadline'] > time.time():
+        wait_for_fill(order, state['deadline'])
+    state['attempt'] += 1
+    if CONF.reprice_orders and get_adapter().can_edit and fetch_order_status(order.id) in ['open', 'active']:
+        OPEN_ORDER = order
+        return None
+    state['order'] = None
+    return cancel_order(order)
+
+
+def read_order_state():
+    state_file = f'{DATA_DIR}{INSTANCE}.order'
+    if os.path.isfile(state_file):
+        with open(state_file, 'r') as file:
+            try:
+                return json.load(file)
+            except ValueError:
+                LOG.warning('Ignoring corrupt order state %s', state_file)
+    return None
+
+
+def write_order_state(state: dict):
+    state_file = f'{DATA_DIR}{INSTANCE}.order'
+    temp_file = f'{state_file}.{os.getpid()}.tmp'
+    with open(temp_file, 'w') as file:
+        json.dump(state, file)
+    os.replace(temp_file, state_file)
+
+
+def remove_order_state():
+    state_file = f'{DATA_DIR}{INSTANCE}.order'
+    if os.path.isfile(state_file):
+        os.remove(state_file)
+
+
+def note_order(price: float = None):
+    """
+    Counts a limit order placed or repriced for the tracked execution, an order without price is the market fallback
+    """
+    if EXECUTION is None:
+        return
+    if price is None:
+        EXECUTION['market'] = True
+    else:
+        EXECUTION['limit'] = price
+        EXECUTION['trials'] += 1
+
+
+def record_execution(order: Order):
+    """
+    Appends the execution quality of a fill to the ledger, a fill outside of a tracked execution (ladder rung)
+    is its own decision
+    The slippage in bps is positive if the fill is worse than the decision price
+    """
+    execution = EXECUTION or {'decision': order.price, 'started': None, 'limit': order.price, 'trials': 1,
+                              'market': False}
+    now = time.time()
+    price = order.average or order.price
+    decision = execution['decision']
+    slippage = None
+    if price and decision:
+        slippage = (price - decision) / decision * 10000 * (1 if order.side == 'buy' else -1)
+    entry = {'time': now, 'side': order.side, 'amount': order.filled if order.is_partially_filled() else order.amount,
+             'decision': decision, 'limit': execution['limit'], 'fill': price, 'slippage_bps': slippage,
+             'seconds_to_fill': now - execution['started'] if execution['started'] else None,
+             'trials': execution['trials'], 'market': execution['market']}
+    with open(f'{DATA_DIR}{INSTANCE}.executions', 'a') as file:
+        file.write(json.dumps(entry) + '\n')
+
+
+def read_executions(since: float):
+    """
+    :return: the ledger entries recorded since the given timestamp
+    """
+    ledger_file = f'{DATA_DIR}{INSTANCE}.executions'
+    entries = []
+    if os.path.isfile(ledger_file):
+        with open(ledger_file, 'r') as file:
+            for line in file:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                if entry['time'] >= since:
+                    entries.append(entry)
+    return entries
+
+
+def calculate_execution_quality(entries: list):
+    """
+    :return: dict with the median slippage in bps, the 95th percentile of the time to fill in seconds and the
+    share of fills in percent that did not need the market fallback, None where there is no data
+    """
+    slippages = [e['slippage_bps'] for e in entries if e['slippage_bps'] is not None]
+    durations = sorted(e['seconds_to_fill'] for e in entries if e['seconds_to_fill'] is not None)
+    return {'fills': len(entries),
+            'median_slippage_bps': statistics.median(slippages) if slippages else None,
+            'p95_seconds_to_fill': durations[math.ceil(len(durations) * 0.95) - 1] if durations else None,
+            'limit_fill_rate': sum(not e['market'] for e in entries) / len(entries) * 100 if entries else None}
+
+
 def do_post_trade_action():
     if ORDER:
         LOG.info('Filled %s', str(ORDER))
@@ -1668,22 +3377,19 @@ def meditate_bitmex(price: float):
     return None
 
 
+def reduce_action(action: dict, order: Order):
+    """
+    Reduces the action by the filled part of a partially filled order
+    :return: the action over the remainder or None if the remainder is below the minimal order size
+    """
+    return get_adapter().reduce_action(action, order)
+
+
 def calculate_target_quote():
     if CONF.auto_quote == 'OFF':
         return CONF.crypto_quote_in_percent
     mayer = get_mayer()
-    if CONF.auto_quote == 'MM':
-        if CONF.exchange == 'bitmex':
-            target_quote = 100 * (CONF.start_mayer_multiple / mayer['current']) * \
-                           (CONF.crypto_quote_in_percent / 100 / CONF.start_mayer_multiple)
-        else:
-            target_quote = CONF.crypto_quote_in_percent / mayer['current']
-    elif CONF.auto_quote == 'MMRange':
-        target_quote = 100 * (mayer['current'] - CONF.mm_quote_0) / (CONF.mm_quote_100 - CONF.mm_quote_0)
-    if target_quote < 0:
-        target_quote = 0
-    elif target_quote > 100:
-        target_quote = 100
+    target_quote = auto_quote(mayer['current'])
     LOG.info('Auto quote %.2f @ %.2f', target_quote, mayer['current'])
     if target_quote > CONF.max_crypto_quote_in_percent:
         LOG.info('Auto quote limited by configuration to %.2f', CONF.max_crypto_quote_in_percent)
@@ -1691,49 +3397,241 @@ def calculate_target_quote():
     return target_quote
 
 
+def auto_quote(mayer_multiple: float):
+    """
+    :return: the target quote in % for the given Mayer multiple, between 0 and 100
+    """
+    if CONF.auto_quote == 'MM':
+        if CONF.exchange == 'bitmex':
+            target_quote = 100 * (CONF.start_mayer_multiple / mayer_multiple) * \
+                           (CONF.crypto_quote_in_percent / 100 / CONF.start_mayer_multiple)
+        else:
+            target_quote = CONF.crypto_quote_in_percent / mayer_multiple
+    else:
+        target_quote = 100 * (mayer_multiple - CONF.mm_quote_0) / (CONF.mm_quote_100 - CONF.mm_quote_0)
+    return min(max(target_quote, 0), 100)
+
+
 def calculate_target_position(target_quote_in_percent: float, price: float):
     return CONF.start_margin_balance * CONF.start_crypto_price * target_quote_in_percent / 100 / price * CONF.start_crypto_price
 
 
+def calculate_ladder(price: float, target_quote: float = None):
+    """
+    Calculates resting orders at the prices where the crypto quote leaves the tolerance band,
+    each further step lies another tolerance beyond the previous one
+    Orders which would be executed immediately at the current price are left out
+    :param price: current market price
+    :param target_quote: optional, calculated if not given
+    :return: list of (direction, price, amount_crypto, amount_fiat)
+    """
+    if target_quote is None:
+        target_quote = calculate_target_quote()
+    tolerance = CONF.tolerance_in_percent
+    ladder = []
+    for step in range(1, CONF.ladder_steps + 1):
+        if not CONF.stop_buy:
+            ladder.append(calculate_rung('BUY', target_quote, step * tolerance))
+        if not CONF.stop_sell:
+            ladder.append(calculate_rung('SELL', target_quote, step * tolerance))
+    return [rung for rung in ladder if rung and (rung[1] < price if rung[0] == 'BUY' else rung[1] > price)]
+
+
+def calculate_rung(direction: str, target_quote: float, distance: float):
+    """
+    Calculates the price at which the quote drifts the given distance away from the target quote
+    and the order size which brings it back by one tolerance
+    :return: (direction, price, amount_crypto, amount_fiat) or None
+    """
+    return get_adapter().calculate_rung(direction, target_quote, distance)
+
+
+def place_ladder():
+    """
+    Places the resting orders of the ladder
+    """
+    global LADDER, LADDER_TARGET
+    LADDER = []
+    LADDER_TARGET = calculate_target_quote()
+    for direction, price, amount_crypto, amount_fiat in calculate_ladder(get_current_price(), LADDER_TARGET):
+        if direction == 'BUY':
+            order = create_buy_order(price, amount_crypto, amount_fiat)
+        else:
+            order = create_sell_order(price, amount_crypto, amount_fiat)
+        if order:
+            LADDER.append(order)
+
+
+def is_ladder_resting():
+    """
+    :return: True if there is a ladder and all its orders are still open
+    """
+    if not LADDER:
+        return False
+    open_orders = get_open_orders() or []
+    open_ids = [order.id for order in open_orders]
+    resting = True
+    for order in LADDER:
+        # orders beyond a full page are looked up one by one
+        if order.id not in open_ids and (len(open_orders) < OPEN_ORDERS_PAGE or
+                                         fetch_order_status(order.id) not in ['open', 'active']):
+            LOG.info('Ladder order %s is no longer open', str(order))
+            resting = False
+    return resting
+
+
+def is_ladder_outdated():
+    """
+    :return: True if the target quote moved by half a tolerance or more since the ladder was placed
+    """
+    if CONF.auto_quote == 'OFF' or LADDER_TARGET is None:
+        return False
+    target_quote = calculate_target_quote()
+    if abs(target_quote - LADDER_TARGET) >= CONF.tolerance_in_percent / 2:
+        LOG.info('Target quote moved from %.2f to %.2f, replacing the ladder', LADDER_TARGET, target_quote)
+        return True
+    return False
+
+
+def cancel_ladder():
+    """
+    Cancels the remaining orders of the ladder, the ones filled in the meantime are recorded
+    """
+    global LADDER
+    for order in LADDER:
+        filled = cancel_order(order)
+        if filled:
+            record_fill(filled)
+    LADDER = []
+
+
 def calculate_actual_quote(price: float = None):
     """
     :param price: optional, but required for bitmex
     :return: actual_qoute in %
     """
-    if CONF.exchange == 'bitmex':
-        actual_position = int(get_position_info()['currentQty'])
-        crypto_quote = 100 * actual_position / CONF.start_crypto_price / CONF.start_margin_balance * price / CONF.start_crypto_price
-        return crypto_quote
-    crypto_quote = (BAL['cryptoBalance'] / BAL['totalBalanceInCrypto']) * 100 if BAL['cryptoBalance'] > 0 else 0
-    LOG.info('%s total/crypto quote %.2f/%.2f %.2f @ %d', CONF.base, BAL['totalBalanceInCrypto'], BAL['cryptoBalance'],
-             crypto_quote, BAL['price'])
-    return crypto_quote
+    return get_adapter().actual_quote(price)
 
 
 def calculate_balances():
-    balance = {'cryptoBalance': 0, 'totalBalanceInCrypto': 0, 'price': 0}
-    if CONF.exchange == 'bitmex':
-        pos = get_position_info()
-        if pos and pos['homeNotional'] and float(pos['homeNotional']) < 0:
-            LOG.warning('Position short by %f', abs(float(pos['homeNotional'])))
-            create_market_buy_order(abs(float(pos['homeNotional'])))
-            sleep_for(2, 4)
-            pos = get_position_info()
-        # aka margin balance
-        balance['totalBalanceInCrypto'] = get_crypto_balance()['total']
-        if 'markPrice' in pos:
-            balance['price'] = float(pos['markPrice'])
-        if not balance['price']:
-            balance['price'] = get_current_price()
-        if pos['avgEntryPrice'] and float(pos['avgEntryPrice']) > 0:
-            balance['cryptoBalance'] = (abs(int(pos['foreignNotional'])) / float(pos['avgEntryPrice']) * balance['price']) / float(pos['avgEntryPrice'])
-        return balance
-    balance['cryptoBalance'] = get_crypto_balance()['total']
-    sleep_for(3, 5)
-    fiat_balance = get_fiat_balance()['total']
-    balance['price'] = get_current_price()
-    balance['totalBalanceInCrypto'] = balance['cryptoBalance'] + (fiat_balance / balance['price'])
-    return balance
+    return get_adapter().calculate_balances()
+
+
+def apply_fill(balance: dict, order: Order):
+    """
+    Updates the balances locally from the data of a fill instead of fetching them again,
+    the trigger band of the balances before the fill is dropped
+    """
+    global BAND
+    BAND = None
+    return get_adapter().apply_fill(balance, order)
+
+
+def calculate_action():
+    """
+    Meditates on the locally updated balances at the current price, they are reconciled with the exchange
+    once reconcile_minutes have passed and before any trade, so that a drift never leads to a wrong order
+    While the price stays inside the trigger band of the last evaluation, there is nothing to do
+    :return: action or None
+    """
+    global BAL
+    price = get_current_price()
+    if is_inside_band(price):
+        return None
+    if price and CONF.reconcile_minutes and time.time() - RECONCILED < CONF.reconcile_minutes * 60:
+        BAL = reprice_balances(BAL, price)
+        if not evaluate_balances():
+            return None
+        LOG.info('Reconciling the balances before trading')
+    return reconcile_balances()
+
+
+def reconcile_balances():
+    global BAL, RECONCILED
+    BAL = calculate_balances()
+    RECONCILED = time.time()
+    return evaluate_balances()
+
+
+def evaluate_balances():
+    """
+    Meditates on the balances, the trigger band around their price is kept if there is nothing to do
+    :return: action or None
+    """
+    global BAND
+    action = meditate(calculate_actual_quote(), BAL['price'])
+    BAND = calculate_trigger_band(BAL) if CONF.trigger_band_minutes and not action else None
+    return action
+
+
+def is_inside_band(price: float):
+    return bool(BAND) and time.time() - BAND['timestamp'] < CONF.trigger_band_minutes * 60 and \
+        BAND['low'] < price < BAND['high']
+
+
+def calculate_trigger_band(balance: dict):
+    """
+    Calculates the prices at which meditate would buy or sell with the given balances, in closed form
+    for a fixed quote and by bisection where the target quote follows the Mayer multiple
+    :return: dict with the lower and the upper price or None if the balances have no band
+    """
+    price = balance['price']
+    crypto = balance['cryptoBalance']
+    fiat = (balance['totalBalanceInCrypto'] - crypto) * price
+    if crypto <= 0 or fiat <= 0:
+        return None
+    if CONF.auto_quote == 'OFF':
+        low = quote_price(crypto, fiat, CONF.crypto_quote_in_percent - CONF.tolerance_in_percent)
+        high = quote_price(crypto, fiat, CONF.crypto_quote_in_percent + CONF.tolerance_in_percent)
+    else:
+        mayer = get_mayer()
+        if not mayer:
+            return None
+
+        def target_quote(at: float):
+            return min(auto_quote(mayer['current'] * at / price), CONF.max_crypto_quote_in_percent)
+
+        def quote(at: float):
+            return 100 * crypto * at / (crypto * at + fiat)
+
+        low = bisect_price(price, price / 2, lambda at: quote(at) < min(target_quote(at) - CONF.tolerance_in_percent,
+                                                                        CONF.max_crypto_quote_in_percent))
+        high = bisect_price(price, price * 2, lambda at: quote(at) > target_quote(at) + CONF.tolerance_in_percent)
+    return {'low': 0 if CONF.stop_buy else low, 'high': math.inf if CONF.stop_sell else high,
+            'timestamp': time.time()}
+
+
+def quote_price(crypto: float, fiat: float, quote: float):
+    """
+    :return: the price at which the crypto quote of the balances is the given quote in %
+    """
+    if quote <= 0:
+        return 0
+    if quote >= 100:
+        return math.inf
+    return quote * fiat / (crypto * (100 - quote))
+
+
+def bisect_price(inside: float, outside: float, triggers):
+    """
+    Narrows the price at which an action triggers down to the last price before it,
+    the search does not go beyond outside
+    """
+    if not triggers(outside):
+        return outside
+    for _ in range(BAND_BISECTIONS):
+        middle = (inside + outside) / 2
+        if triggers(middle):
+            outside = middle
+        else:
+            inside = middle
+    return inside
+
+
+def reprice_balances(balance: dict, price: float):
+    fiat = (balance['totalBalanceInCrypto'] - balance['cryptoBalance']) * balance['price']
+    return {'cryptoBalance': balance['cryptoBalance'], 'totalBalanceInCrypto': balance['cryptoBalance'] + fiat / price,
+            'price': price}
 
 
 def calculate_used_margin_percentage():
@@ -1815,6 +3713,9 @@ def finit_bitmex():
 
 def check_deposits():
     net_deposits = get_net_deposits(True)
+    if net_deposits is None:
+        LOG.warning('Could not fetch the net deposits, keeping the reference deposits')
+        return CONF
     if CONF.reference_net_deposits:
         diff = net_deposits - CONF.reference_net_deposits
         if diff != 0:
@@ -1826,7 +3727,128 @@ def check_deposits():
     return CONF
 
 
+def run_deposit_check():
+    """
+    Reloads the configuration if the deposits changed, a ladder placed with the old values is replaced right away
+    :return: time of the next check
+    """
+    global CONF
+    try:
+        conf = check_deposits()
+        if conf is not CONF:
+            CONF = conf
+            cancel_ladder()
+            SCHEDULER.reschedule('rebalance')
+    except RetriesExhausted as error:
+        abandon_cycle(error)
+    return time.time() + DEPOSIT_CHECK_SECONDS
+
+
+def rebalance():
+    """
+    Runs one cycle: trades until the quote is within the tolerance again, then places the ladder if configured
+    A resting ladder is left alone until a rung is filled or it is outdated
+    :return: time of the next cycle or None to stop
+    """
+    global CONF, ORDER, LAST_ORDER, INIT, BAL
+    try:
+        invalidate_snapshot()
+        if is_ladder_resting() and not is_ladder_outdated():
+            return time.time() + calculate_period()
+        cancel_ladder()
+        if CONF.exchange == 'bitmex':
+            action = meditate_bitmex(get_current_price())
+        else:
+            action = calculate_action()
+        if SIMULATE:
+            print(action)
+            return None
+        if action:
+            begin_execution(action)
+        attempt: int = first_attempt(action)
+        while action:
+            if is_nonprofit_trade(LAST_ORDER, action):
+                LOG.info('Not %sing @ %s (nonprofit)', action['direction'].lower(), action['price'])
+                break
+            if is_price_difference_smaller_than_tolerance(LAST_ORDER, action):
+                LOG.info('Not %sing @ %s (tolerance)', action['direction'].lower(), action['price'])
+                break
+            track_intent(action, attempt)
+            if action['direction'] == 'BUY':
+                ORDER = do_buy(action['percentage'], action['amount'], action['price'], attempt)
+            else:
+                ORDER = do_sell(action['percentage'], action['amount'], action['price'], attempt)
+            if ORDER and ORDER.is_partially_filled():
+                remainder = reduce_action(action, ORDER)
+                if remainder:
+                    LOG.info('Partially filled %s', str(ORDER))
+                    record_fill(ORDER)
+                    ORDER = None
+                    action = remainder
+                    attempt += 1
+                    continue
+            if ORDER:
+                if INIT:
+                    start_position = finit_bitmex()
+                    if start_position:
+                        set_start_values(start_position)
+                        CONF = ExchangeConfig()
+                        INIT = False
+                        attempt = 1
+                if CONF.backtrade_only_on_profit:
+                    LAST_ORDER = ORDER
+                invalidate_snapshot()
+                BAL = apply_fill(BAL, ORDER)
+                record_execution(ORDER)
+                end_execution()
+                do_post_trade_action()
+                action = None
+            else:
+                if INIT:
+                    sleep_for(CONF.period_in_seconds)
+                attempt += 1
+                invalidate_snapshot()
+                if CONF.exchange == 'bitmex':
+                    action = meditate_bitmex(get_current_price())
+                else:
+                    action = calculate_action()
+        filled = cancel_open_order()
+        if filled:
+            record_fill(filled)
+        end_execution()
+        if CONF.ladder_steps and not INIT:
+            place_ladder()
+        return time.time() + calculate_period()
+    except RetriesExhausted as error:
+        abandon_cycle(error)
+        return time.time() + CONF.period_in_seconds
+
+
+def abandon_cycle(error: RetriesExhausted):
+    """
+    Gives up the current cycle after the exchange kept failing,
+    the open orders are canceled so that none is left behind untracked
+    """
+    global OPEN_ORDER, LADDER
+    LOG.error('%s, abandoning this cycle', str(error))
+    end_execution()
+    if KEEP_ORDERS:
+        return
+    try:
+        cancel_all_open_orders()
+        OPEN_ORDER = None
+        LADDER = []
+    except RetriesExhausted as again:
+        LOG.error('Could not cancel the open orders: %s', str(again))
+
+
+def log_startup_times(times: dict):
+    LOG.info('Startup took %.2fs (%s)', sum(times.values()),
+             ', '.join('{} {:.2f}s'.format(phase, duration) for phase, duration in times.items()))
+
+
 if __name__ == '__main__':
+    STARTUP_TIMES = {'imports': time.perf_counter() - IMPORT_STARTED}
     print('Starting BalanceR Bot')
     print('ccxt version:', ccxt.__version__)
 
@@ -1858,10 +3880,26 @@ if __name__ == '__main__':
         LOG = function_logger(logging.DEBUG, LOG_FILENAME, logging.INFO)
 
     LOG.info('-----------------------')
+    PHASE_STARTED = time.perf_counter()
     CONF = ExchangeConfig()
     LOG.info('BalanceR version: %s', CONF.bot_version)
+    STARTUP_TIMES['config'] = time.perf_counter() - PHASE_STARTED
+    PHASE_STARTED = time.perf_counter()
 
     EXCHANGE = connect_to_exchange()
+    STARTUP_TIMES['connect'] = time.perf_counter() - PHASE_STARTED
+    ADAPTER = get_adapter()
+    SNAPSHOT = AccountSnapshot()
+    BREAKER = CircuitBreaker(BREAKER_THRESHOLD, BREAKER_PAUSE_SECONDS)
+    VOLATILITY = VolatilityEstimator(VOLATILITY_WINDOW_SECONDS)
+
+    if CONF.stream:
+        FEED = connect_to_stream()
+        FEED.start()
+
+    if CONF.auto_quote != 'OFF' and not EMAIL_ONLY:
+        MAYER = MayerProvider(MAYER_REFRESH_SECONDS)
+        MAYER.start()
 
     if EMAIL_ONLY:
         BAL = calculate_balances()
@@ -1876,6 +3914,13 @@ if __name__ == '__main__':
 
     if CONF.exchange == 'bitmex':
         MIN_ORDER_SIZE = 0.0001
+
+    PHASE_STARTED = time.perf_counter()
+    load_markets()
+    STARTUP_TIMES['markets'] = time.perf_counter() - PHASE_STARTED
+    PHASE_STARTED = time.perf_counter()
+
+    if CONF.exchange == 'bitmex':
         set_leverage(0)
         if not CONF.start_date:
             if not CONF.start_margin_balance:
@@ -1884,58 +3929,24 @@ if __name__ == '__main__':
                 CONF = ExchangeConfig()
             INIT = True
 
-    if not KEEP_ORDERS:
+    if SIMULATE:
         cancel_all_open_orders()
+    else:
+        FILLED = resume_order()
+        if FILLED:
+            record_fill(FILLED)
+        ORDER = resume_slices()
+        do_post_trade_action()
 
     if not INIT and CONF.backtrade_only_on_profit:
         LAST_ORDER = get_closed_order()
 
-    while 1:
-        if CONF.exchange == 'bitmex':
-            CONF = check_deposits()
-            ACTION = meditate_bitmex(get_current_price())
-        else:
-            BAL = calculate_balances()
-            ACTION = meditate(calculate_actual_quote(), BAL['price'])
-        if SIMULATE:
-            print(ACTION)
-            break
-        ATTEMPT: int = 1 if not INIT else CONF.trade_trials + 1
-        while ACTION:
-            if is_nonprofit_trade(LAST_ORDER, ACTION):
-                LOG.info('Not %sing @ %s (nonprofit)', ACTION['direction'].lower(), ACTION['price'])
-                break
-            if is_price_difference_smaller_than_tolerance(LAST_ORDER, ACTION):
-                LOG.info('Not %sing @ %s (tolerance)', ACTION['direction'].lower(), ACTION['price'])
-                break
-            if ACTION['direction'] == 'BUY':
-                ORDER = do_buy(ACTION['percentage'], ACTION['amount'], ACTION['price'], ATTEMPT)
-            else:
-                ORDER = do_sell(ACTION['percentage'], ACTION['amount'], ACTION['price'], ATTEMPT)
-            if ORDER:
-                if INIT:
-                    start_position = finit_bitmex()
-                    if start_position:
-                        set_start_values(start_position)
-                        CONF = ExchangeConfig()
-                        INIT = False
-                        ATTEMPT = 1
-                if CONF.backtrade_only_on_profit:
-                    LAST_ORDER = ORDER
-                # we need the values after the trade
-                BAL = calculate_balances()
-                do_post_trade_action()
-                ACTION = None
-            else:
-                daily_report()
-                if INIT:
-                    sleep_for(CONF.period_in_seconds)
-                ATTEMPT += 1
-                if CONF.exchange == 'bitmex':
-                    CONF = check_deposits()
-                    ACTION = meditate_bitmex(get_current_price())
-                else:
-                    BAL = calculate_balances()
-                    ACTION = meditate(calculate_actual_quote(), BAL['price'])
-        daily_report()
-        sleep_for(CONF.period_in_seconds)
+    STARTUP_TIMES['reconciliation'] = time.perf_counter() - PHASE_STARTED
+    log_startup_times(STARTUP_TIMES)
+
+    SCHEDULER = Scheduler()
+    if CONF.exchange == 'bitmex':
+        SCHEDULER.schedule('deposits', run_deposit_check)
+    SCHEDULER.schedule('rebalance', rebalance)
+    SCHEDULER.schedule('report', run_daily_report, first_report_time())
+    SCHEDULER.run()
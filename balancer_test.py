@@ -1,4 +1,9 @@
+import asyncio
 import datetime
+import math
+import os
+import tempfile
+import threading
 import time
 import unittest
 from math import isclose
@@ -12,6 +17,30 @@ import balancer
 
 class BalancerTest(unittest.TestCase):
 
+    def setUp(self):
+        balancer.INSTANCE = 'test'
+        balancer.LOG = mock.MagicMock()
+        balancer.EXCHANGE = mock.MagicMock()
+        balancer.CONF = self.create_default_conf()
+        balancer.ADAPTER = None
+        balancer.SNAPSHOT = None
+        balancer.FEED = None
+        balancer.BREAKER = None
+        balancer.TICKERS = {}
+        balancer.ORDER = None
+        balancer.OPEN_ORDER = None
+        balancer.LADDER = []
+        balancer.LADDER_TARGET = None
+        balancer.RECONCILED = 0
+        balancer.EXECUTION = None
+        balancer.ORDER_STATE = None
+        balancer.BAND = None
+        balancer.VOLATILITY = None
+        balancer.SCHEDULER = None
+        balancer.MAYER = None
+        balancer.MAYER_REMOTE = {'session': None, 'etag': None, 'modified': None, 'mayer': None}
+        balancer.KEEP_ORDERS = False
+
     def test_calculate_buy_order_size_no_change(self):
         balancer.BAL['totalBalanceInCrypto'] = 1
         order_size = balancer.calculate_buy_order_size(10, 10000, 10000)
@@ -48,6 +77,393 @@ class BalancerTest(unittest.TestCase):
 
         self.assertAlmostEqual(0.098, order_size, 3)
 
+    def test_calculate_buy_order_size_with_market_fee(self):
+        balancer.BAL['totalBalanceInCrypto'] = 1
+        balancer.FEE_RATE = 0.0026
+
+        order_size = balancer.calculate_buy_order_size(10, 10000, 10000)
+
+        self.assertAlmostEqual(0.09974, order_size, 5)
+        balancer.FEE_RATE = 0.01
+
+    @patch('balancer.logging')
+    @patch('ccxt.kraken')
+    def test_load_markets_from_shared_cache(self, mock_kraken, mock_logging):
+        balancer.CONF = self.create_default_conf()
+        balancer.EXCHANGE = mock_kraken
+        balancer.LOG = mock_logging
+        market = {'symbol': 'BTC/EUR', 'taker': 0.0026, 'limits': {'amount': {'min': 0.0001}}}
+        mock_kraken.markets = {'BTC/EUR': market}
+        with tempfile.TemporaryDirectory() as data_dir:
+            balancer.DATA_DIR = data_dir + os.path.sep
+            balancer.write_markets_cache(f'{balancer.DATA_DIR}kraken.markets.json',
+                                         {'markets': {'BTC/EUR': market}, 'currencies': {},
+                                          'fees': {balancer.hashlib.sha256(b'1234').hexdigest()[:12]: 0.0016}})
+
+            balancer.load_markets()
+
+        mock_kraken.set_markets.assert_called_with({'BTC/EUR': market}, {})
+        mock_kraken.load_markets.assert_not_called()
+        self.assertEqual(0.0001, balancer.MIN_ORDER_SIZE)
+        self.assertEqual(0.0016, balancer.FEE_RATE)
+        balancer.DATA_DIR = ''
+        balancer.MIN_ORDER_SIZE = 0.001
+        balancer.FEE_RATE = 0.01
+        balancer.MARKET = None
+
+    @patch('balancer.logging')
+    def test_read_markets_cache_outdated(self, mock_logging):
+        balancer.LOG = mock_logging
+        with tempfile.TemporaryDirectory() as data_dir:
+            cache_file = os.path.join(data_dir, 'kraken.markets.json')
+            balancer.write_markets_cache(cache_file, {'markets': {}, 'currencies': {}, 'fees': {}})
+            with patch('time.time', return_value=time.time() + balancer.MARKETS_TTL_SECONDS + 1):
+                cache = balancer.read_markets_cache(cache_file)
+
+        self.assertIsNone(cache)
+
+    def test_write_markets_cache_keeps_timestamp_and_fees_of_other_instances(self):
+        with tempfile.TemporaryDirectory() as data_dir:
+            cache_file = os.path.join(data_dir, 'kraken.markets.json')
+            balancer.write_markets_cache(cache_file, {'markets': {}, 'currencies': {}, 'fees': {'a': 0.001},
+                                                      'timestamp': 1000})
+            cache = balancer.load_markets_cache(cache_file)
+            balancer.write_markets_cache(cache_file, {'markets': {}, 'currencies': {}, 'fees': {'c': 0.003},
+                                                      'timestamp': 1000})
+            cache['fees']['b'] = 0.002
+            balancer.write_markets_cache(cache_file, cache)
+            written = balancer.load_markets_cache(cache_file)
+
+        self.assertEqual(1000, written['timestamp'])
+        self.assertEqual({'a': 0.001, 'b': 0.002, 'c': 0.003}, written['fees'])
+
+    def test_write_markets_cache_replaces_outdated_markets(self):
+        with tempfile.TemporaryDirectory() as data_dir:
+            cache_file = os.path.join(data_dir, 'kraken.markets.json')
+            balancer.write_markets_cache(cache_file, {'markets': {'old': {}}, 'currencies': {}, 'fees': {'a': 0.001},
+                                                      'timestamp': 1000})
+            balancer.write_markets_cache(cache_file, {'markets': {'new': {}}, 'currencies': {}, 'fees': {'b': 0.002},
+                                                      'timestamp': 2000})
+            written = balancer.load_markets_cache(cache_file)
+
+        self.assertEqual({'new': {}}, written['markets'])
+        self.assertEqual({'b': 0.002}, written['fees'])
+
+    def test_is_sliced(self):
+        balancer.CONF = self.create_default_conf()
+
+        self.assertFalse(balancer.is_sliced(10, None, 10000))
+        balancer.CONF.slice_notional = 50000
+        self.assertFalse(balancer.is_sliced(5, None, 10000))
+        self.assertTrue(balancer.is_sliced(6, None, 10000))
+        self.assertTrue(balancer.is_sliced(None, 60000, 10000))
+
+    @patch('balancer.sleep_for')
+    @patch('balancer.get_current_price', return_value=10000)
+    @patch('balancer.execute_slice')
+    def test_execute_slices_twap(self, mock_execute_slice, mock_get_current_price, mock_sleep_for):
+        balancer.CONF = self.create_default_conf()
+        balancer.CONF.slice_notional = 10000
+        balancer.INSTANCE = 'test'
+        balancer.LOG = mock.MagicMock()
+        mock_execute_slice.side_effect = [balancer.Order({'id': i, 'side': 'buy', 'price': p, 'amount': 1})
+                                          for i, p in [(1, 10000), (2, 10100), (3, 10200)]]
+        with tempfile.TemporaryDirectory() as data_dir:
+            balancer.DATA_DIR = data_dir + os.path.sep
+
+            order = balancer.execute_slices('BUY', 2.5)
+
+            self.assertFalse(os.listdir(data_dir))
+        balancer.DATA_DIR = ''
+
+        self.assertEqual([1, 1, 0.5], [c.args[1] for c in mock_execute_slice.call_args_list])
+        self.assertEqual(2, mock_sleep_for.call_count)
+        self.assertAlmostEqual(600, mock_sleep_for.call_args.args[0], 0)
+        self.assertEqual(2.5, order.amount)
+        self.assertEqual(10080, order.price)
+        self.assertEqual('buy', order.side)
+
+    @patch('balancer.sleep_for')
+    @patch('balancer.get_current_price', return_value=10000)
+    @patch('balancer.execute_slice')
+    def test_resume_slices_executes_remaining_amount(self, mock_execute_slice, mock_get_current_price, mock_sleep_for):
+        balancer.CONF = self.create_default_conf()
+        balancer.CONF.slice_notional = 10000
+        balancer.CONF.slice_mode = 'ICEBERG'
+        balancer.INSTANCE = 'test'
+        balancer.LOG = mock.MagicMock()
+        mock_execute_slice.return_value = balancer.Order({'id': 4, 'side': 'sell', 'price': 10000, 'amount': 1})
+        with tempfile.TemporaryDirectory() as data_dir:
+            balancer.DATA_DIR = data_dir + os.path.sep
+            balancer.write_slice_progress({'direction': 'SELL', 'amount': 3, 'done': 2, 'cost': 20000, 'id': 2,
+                                           'child': None, 'price': 10000, 'timestamp': time.time()})
+
+            order = balancer.resume_slices()
+
+            self.assertIsNone(balancer.read_slice_progress())
+        balancer.DATA_DIR = ''
+
+        mock_execute_slice.assert_called_once_with('SELL', 1, mock.ANY)
+        mock_sleep_for.assert_not_called()
+        self.assertEqual(3, order.amount)
+
+    @patch('balancer.cancel_order')
+    @patch('balancer.get_current_price', return_value=10000)
+    @patch('balancer.execute_slice')
+    def test_resume_slices_reconciles_child_and_drops_outdated_plan(self, mock_execute_slice, mock_get_current_price,
+                                                                    mock_cancel_order):
+        balancer.CONF.slice_notional = 10000
+        balancer.INSTANCE = 'test'
+        child = balancer.Order({'id': 'c3', 'side': 'sell', 'price': 10000, 'amount': 1, 'filled': 0.4})
+        mock_cancel_order.return_value = child
+        with tempfile.TemporaryDirectory() as data_dir:
+            balancer.DATA_DIR = data_dir + os.path.sep
+            balancer.write_slice_progress({'direction': 'SELL', 'amount': 4, 'done': 2, 'cost': 20000, 'id': 2,
+                                           'child': {'id': 'c3', 'amount': 1, 'price': 10000, 'filled': 0},
+                                           'price': 10000, 'timestamp': time.time() - 3600})
+
+            order = balancer.resume_slices()
+
+            self.assertIsNone(balancer.read_slice_progress())
+        balancer.DATA_DIR = ''
+
+        self.assertEqual('c3', mock_cancel_order.call_args.args[0].id)
+        mock_execute_slice.assert_not_called()
+        self.assertEqual(2.4, order.amount)
+        self.assertEqual('c3', order.id)
+
+    @patch('balancer.get_current_price', return_value=10000)
+    @patch('balancer.execute_slice')
+    def test_resume_slices_drops_plan_with_unrecorded_child(self, mock_execute_slice, mock_get_current_price):
+        balancer.INSTANCE = 'test'
+        with tempfile.TemporaryDirectory() as data_dir:
+            balancer.DATA_DIR = data_dir + os.path.sep
+            balancer.write_slice_progress({'direction': 'BUY', 'amount': 3, 'done': 0, 'cost': 0, 'id': None,
+                                           'child': {'id': None, 'amount': 1, 'price': 10000, 'filled': 0},
+                                           'price': 10000, 'timestamp': time.time()})
+
+            order = balancer.resume_slices()
+
+            self.assertIsNone(balancer.read_slice_progress())
+        balancer.DATA_DIR = ''
+
+        mock_execute_slice.assert_not_called()
+        self.assertIsNone(order)
+
+    def test_track_order_persists_the_running_trial(self):
+        balancer.CONF.order_adjust_seconds = 60
+        action = {'direction': 'SELL', 'price': 10000, 'percentage': 40, 'amount': None}
+        balancer.begin_execution(action)
+        order = balancer.Order({'id': 'o1', 'side': 'sell', 'price': 10010, 'amount': 0.2, 'datetime': None})
+        with tempfile.TemporaryDirectory() as data_dir:
+            balancer.DATA_DIR = data_dir + os.path.sep
+
+            balancer.track_intent(action, 2)
+            balancer.track_order(order)
+            state = balancer.read_order_state()
+            balancer.end_execution()
+
+            self.assertIsNone(balancer.read_order_state())
+        balancer.DATA_DIR = ''
+
+        self.assertEqual('SELL', state['direction'])
+        self.assertEqual(2, state['attempt'])
+        self.assertFalse(state['init'])
+        self.assertEqual('o1', state['order']['id'])
+        self.assertEqual(0.2, state['order']['amount'])
+        self.assertAlmostEqual(time.time() + 60, state['deadline'], 0)
+        self.assertEqual(10000, state['execution']['decision'])
+
+    @patch('balancer.cancel_order')
+    @patch('balancer.fetch_order_status', return_value='open')
+    @patch('balancer.wait_for_fill')
+    @patch('balancer.cancel_all_open_orders')
+    @patch('balancer.get_adapter')
+    def test_resume_order_keeps_open_order_for_repricing(self, mock_get_adapter, mock_cancel_all_open_orders,
+                                                         mock_wait_for_fill, mock_fetch_order_status,
+                                                         mock_cancel_order):
+        mock_get_adapter.return_value = mock.MagicMock(fiat_amounts=False, can_edit=True)
+        balancer.CONF.reprice_orders = True
+        with tempfile.TemporaryDirectory() as data_dir:
+            balancer.DATA_DIR = data_dir + os.path.sep
+            balancer.write_order_state({'direction': 'BUY', 'attempt': 1, 'init': False, 'deadline': time.time() + 30,
+                                        'order': {'id': 'o1', 'side': 'buy', 'price': 9990, 'amount': 0.1,
+                                                  'datetime': None},
+                                        'execution': {'direction': 'BUY', 'decision': 10000, 'started': time.time(),
+                                                      'limit': 9990, 'trials': 1, 'market': False}})
+
+            self.assertIsNone(balancer.resume_order())
+        balancer.DATA_DIR = ''
+
+        mock_cancel_all_open_orders.assert_called_once_with('o1')
+        mock_wait_for_fill.assert_called_once()
+        mock_cancel_order.assert_not_called()
+        self.assertEqual('o1', balancer.OPEN_ORDER.id)
+        self.assertEqual(0.1, balancer.OPEN_ORDER.amount)
+        self.assertEqual(2, balancer.first_attempt({'direction': 'BUY'}))
+        self.assertEqual(1, balancer.first_attempt({'direction': 'SELL'}))
+        self.assertEqual(1, balancer.EXECUTION['trials'])
+
+    @patch('balancer.cancel_order')
+    @patch('balancer.fetch_order_status', return_value='closed')
+    @patch('balancer.wait_for_fill')
+    @patch('balancer.cancel_all_open_orders')
+    @patch('balancer.get_adapter')
+    def test_resume_order_returns_order_filled_after_deadline(self, mock_get_adapter, mock_cancel_all_open_orders,
+                                                              mock_wait_for_fill, mock_fetch_order_status,
+                                                              mock_cancel_order):
+        mock_get_adapter.return_value = mock.MagicMock(fiat_amounts=True, can_edit=True)
+        balancer.CONF.reprice_orders = True
+        mock_cancel_order.side_effect = lambda order: order
+        with tempfile.TemporaryDirectory() as data_dir:
+            balancer.DATA_DIR = data_dir + os.path.sep
+            balancer.write_order_state({'direction': 'SELL', 'attempt': 3, 'init': False, 'deadline': time.time() - 5,
+                                        'order': {'id': 'o2', 'side': 'sell', 'price': 10010, 'amount': 500,
+                                                  'datetime': None},
+                                        'execution': None})
+
+            order = balancer.resume_order()
+        balancer.DATA_DIR = ''
+
+        mock_wait_for_fill.assert_not_called()
+        self.assertEqual('o2', order.id)
+        self.assertIsNone(balancer.OPEN_ORDER)
+        self.assertEqual(4, balancer.first_attempt({'direction': 'SELL'}))
+
+    @patch('balancer.cancel_all_open_orders')
+    def test_resume_order_without_state_cancels_all_open_orders(self, mock_cancel_all_open_orders):
+        with tempfile.TemporaryDirectory() as data_dir:
+            balancer.DATA_DIR = data_dir + os.path.sep
+
+            self.assertIsNone(balancer.resume_order())
+        balancer.DATA_DIR = ''
+
+        mock_cancel_all_open_orders.assert_called_once_with(None)
+        self.assertIsNone(balancer.ORDER_STATE)
+        self.assertEqual(1, balancer.first_attempt({'direction': 'BUY'}))
+
+    @patch('balancer.wait_for_fill', return_value='closed')
+    @patch('balancer.create_buy_order')
+    @patch('balancer.get_current_price', return_value=10000)
+    def test_execute_slice_records_child_before_waiting(self, mock_get_current_price, mock_create_buy_order,
+                                                        mock_wait_for_fill):
+        balancer.MARKET = None
+        balancer.INSTANCE = 'test'
+        mock_create_buy_order.return_value = balancer.Order({'id': 'c1', 'side': 'buy', 'price': 9998, 'amount': 0.5})
+        recorded = []
+        mock_wait_for_fill.side_effect = lambda order: recorded.append(balancer.read_slice_progress()) or 'closed'
+        progress = {'direction': 'BUY', 'amount': 1, 'done': 0, 'cost': 0, 'id': None, 'child': None}
+        with tempfile.TemporaryDirectory() as data_dir:
+            balancer.DATA_DIR = data_dir + os.path.sep
+
+            balancer.execute_slice('BUY', 0.5, progress)
+        balancer.DATA_DIR = ''
+
+        self.assertEqual({'id': 'c1', 'amount': 0.5, 'price': 9998, 'filled': 0}, recorded[0]['child'])
+
+    def test_order_update_fill(self):
+        balancer.CONF = self.create_default_conf()
+        order = balancer.Order({'id': 'o1', 'side': 'buy', 'price': 9000, 'amount': 0.5, 'datetime': '2021-08-16'})
+        self.assertIsNone(order.filled)
+        self.assertFalse(order.is_partially_filled())
+
+        order.update_fill({'status': 'canceled', 'filled': 0.2, 'average': 8990, 'remaining': None})
+
+        self.assertEqual('canceled', order.status)
+        self.assertEqual(0.2, order.filled)
+        self.assertAlmostEqual(0.3, order.remaining)
+        self.assertEqual(8990, order.average)
+        self.assertTrue(order.is_partially_filled())
+        self.assertIn('filled: 0.2', str(order))
+
+    def test_order_is_not_partially_filled_when_complete_or_empty(self):
+        balancer.CONF = self.create_default_conf()
+        order = balancer.Order({'id': 'o1', 'side': 'buy', 'price': 9000, 'amount': 0.5, 'filled': 0.5})
+        self.assertFalse(order.is_partially_filled())
+        order = balancer.Order({'id': 'o2', 'side': 'buy', 'price': 9000, 'amount': 0.5, 'filled': 0})
+        self.assertFalse(order.is_partially_filled())
+
+    @patch('balancer.fetch_order')
+    def test_cancel_order_returns_partially_filled_order(self, mock_fetch_order):
+        balancer.CONF = self.create_default_conf()
+        balancer.LOG = mock.MagicMock()
+        balancer.EXCHANGE = mock.MagicMock()
+        mock_fetch_order.return_value = {'id': 'o1', 'status': 'open', 'filled': 0.1}
+        balancer.EXCHANGE.cancel_order.return_value = {'id': 'o1', 'status': 'canceled', 'filled': 0.2}
+        order = balancer.Order({'id': 'o1', 'side': 'buy', 'price': 9000, 'amount': 0.5, 'datetime': '2021-08-16'})
+
+        canceled = balancer.cancel_order(order)
+
+        self.assertEqual(order, canceled)
+        self.assertEqual(0.2, canceled.filled)
+        self.assertAlmostEqual(0.3, canceled.remaining)
+
+    @patch('balancer.fetch_order')
+    def test_cancel_order_returns_already_canceled_partial_fill(self, mock_fetch_order):
+        balancer.CONF = self.create_default_conf()
+        balancer.LOG = mock.MagicMock()
+        balancer.EXCHANGE = mock.MagicMock()
+        mock_fetch_order.return_value = {'id': 'o1', 'status': 'canceled', 'filled': 0.1}
+        order = balancer.Order({'id': 'o1', 'side': 'buy', 'price': 9000, 'amount': 0.5, 'datetime': '2021-08-16'})
+
+        canceled = balancer.cancel_order(order)
+
+        self.assertEqual(0.1, canceled.filled)
+        balancer.EXCHANGE.cancel_order.assert_not_called()
+
+    def test_reduce_action_buy(self):
+        balancer.CONF = self.create_default_conf()
+        balancer.FEE_RATE = 0.01
+        balancer.BAL = {'cryptoBalance': 1, 'totalBalanceInCrypto': 2, 'price': 10000}
+        order = balancer.Order({'id': 'o1', 'side': 'buy', 'price': 9800, 'amount': 0.1, 'filled': 0.05})
+
+        action = balancer.reduce_action({'direction': 'BUY', 'percentage': 5, 'amount': None, 'price': 10000}, order)
+
+        self.assertAlmostEqual(5 - 0.05 * 1.01 * 100 / 2 * 9800 / 10000, action['percentage'])
+        self.assertEqual(10000, action['price'])
+
+    def test_reduce_action_sell(self):
+        balancer.CONF = self.create_default_conf()
+        balancer.FEE_RATE = 0.01
+        balancer.BAL = {'cryptoBalance': 1, 'totalBalanceInCrypto': 2, 'price': 10000}
+        order = balancer.Order({'id': 'o1', 'side': 'sell', 'price': 10200, 'amount': 0.1, 'filled': 0.05})
+
+        action = balancer.reduce_action({'direction': 'SELL', 'percentage': 5, 'amount': None, 'price': 10000}, order)
+
+        self.assertAlmostEqual(5 - 0.05 * 1.01 * 100 / 2 * 10000 / 10200, action['percentage'])
+        self.assertIsNone(balancer.reduce_action({'direction': 'SELL', 'percentage': 0.1, 'amount': None,
+                                                  'price': 10000}, order))
+
+    def test_reduce_action_bitmex(self):
+        balancer.CONF = self.create_default_conf()
+        balancer.CONF.exchange = 'bitmex'
+        order = balancer.Order({'id': 'o1', 'side': 'buy', 'price': 10000, 'amount': 1000, 'filled': 400})
+
+        action = balancer.reduce_action({'direction': 'BUY', 'percentage': None, 'amount': 1000, 'price': 10000}, order)
+
+        self.assertEqual(600, action['amount'])
+        order.update_fill({'filled': 950})
+        self.assertIsNone(balancer.reduce_action({'direction': 'BUY', 'percentage': None, 'amount': 1000,
+                                                  'price': 10000}, order))
+
+    @patch('balancer.create_market_buy_order')
+    @patch('balancer.cancel_order')
+    @patch('balancer.wait_for_fill', return_value='open')
+    @patch('balancer.create_buy_order')
+    @patch('balancer.get_current_price', return_value=10000)
+    def test_execute_slice_completes_only_the_remainder_at_market(self, mock_get_current_price, mock_create_buy_order,
+                                                                  mock_wait_for_fill, mock_cancel_order,
+                                                                  mock_create_market_buy_order):
+        balancer.CONF = self.create_default_conf()
+        balancer.MARKET = None
+        partial = balancer.Order({'id': 'o1', 'side': 'buy', 'price': 9998, 'amount': 0.5, 'filled': 0.2})
+        mock_create_buy_order.return_value = partial
+        mock_cancel_order.return_value = partial
+
+        balancer.execute_slice('BUY', 0.5)
+
+        mock_create_market_buy_order.assert_called_with(balancer.to_order_size(0.3), None)
+
     def test_calculate_buy_price(self):
         balancer.CONF = self.create_default_conf()
 
@@ -178,10 +594,65 @@ class BalancerTest(unittest.TestCase):
 
     @patch('balancer.get_open_orders')
     def test_cancel_all_open_orders(self, mock_get_open_orders):
+        balancer.CONF = self.create_default_conf()
+        balancer.EXCHANGE = mock.MagicMock()
+        balancer.KEEP_ORDERS = False
+
         balancer.cancel_all_open_orders()
 
         mock_get_open_orders.assert_called()
 
+    @patch('balancer.cancel_order')
+    @patch('balancer.get_open_orders')
+    def test_cancel_all_open_orders_pages_past_first_page(self, mock_get_open_orders, mock_cancel_order):
+        balancer.CONF = self.create_default_conf()
+        balancer.EXCHANGE = mock.MagicMock()
+        balancer.KEEP_ORDERS = False
+        orders = [balancer.Order({'id': i, 'side': 'buy', 'price': 9000, 'amount': 0.1}) for i in range(25)]
+        mock_get_open_orders.side_effect = [orders[:20], orders[20:]]
+
+        balancer.cancel_all_open_orders()
+
+        self.assertEqual(2, mock_get_open_orders.call_count)
+        self.assertEqual(sorted(range(25)), sorted(c.args[0].id for c in mock_cancel_order.call_args_list))
+
+    @patch('balancer.get_open_orders')
+    def test_cancel_all_open_orders_in_one_request_bitmex(self, mock_get_open_orders):
+        balancer.CONF = self.create_default_conf()
+        balancer.CONF.exchange = 'bitmex'
+        balancer.LOG = mock.MagicMock()
+        balancer.EXCHANGE = mock.MagicMock()
+        balancer.EXCHANGE.has = {'cancelAllOrders': True}
+        balancer.KEEP_ORDERS = False
+
+        balancer.cancel_all_open_orders()
+
+        balancer.EXCHANGE.cancel_all_orders.assert_called_once_with('XBTEUR')
+        mock_get_open_orders.assert_not_called()
+
+    @patch('balancer.cancel_order')
+    @patch('balancer.get_open_orders')
+    def test_cancel_all_open_orders_leaves_kept_order_open(self, mock_get_open_orders, mock_cancel_order):
+        balancer.CONF = self.create_default_conf()
+        balancer.CONF.exchange = 'bitmex'
+        balancer.EXCHANGE = mock.MagicMock()
+        balancer.EXCHANGE.has = {'cancelAllOrders': True}
+        balancer.KEEP_ORDERS = False
+        mock_get_open_orders.return_value = [balancer.Order({'id': i, 'side': 'buy', 'price': 9000, 'amount': 100})
+                                             for i in ['o1', 'o2']]
+
+        balancer.cancel_all_open_orders('o1')
+
+        balancer.EXCHANGE.cancel_all_orders.assert_not_called()
+        self.assertEqual(['o2'], [c.args[0].id for c in mock_cancel_order.call_args_list])
+
+    def test_kraken_adapter_does_not_cancel_orders_of_other_pairs(self):
+        exchange = mock.MagicMock()
+        exchange.has = {'cancelAllOrders': True}
+
+        self.assertFalse(balancer.KrakenAdapter(exchange).can_cancel_all)
+        self.assertIsNone(balancer.KrakenAdapter(exchange).cancel_all_orders())
+
     @patch('balancer.get_open_orders')
     def test_cancel_all_open_orders_with_keep_orders_enabled(self, mock_get_open_orders):
         balancer.KEEP_ORDERS = True
@@ -190,6 +661,257 @@ class BalancerTest(unittest.TestCase):
 
         mock_get_open_orders.assert_not_called()
 
+    @patch('balancer.logging')
+    def test_calculate_ladder_at_band_edges(self, mock_logger):
+        balancer.LOG = mock_logger
+        balancer.CONF = self.create_default_conf()
+        balancer.CONF.ladder_steps = 2
+        balancer.MARKET = None
+        # 1 BTC and 10000 EUR @ 10000: quote 50%
+        balancer.BAL = {'cryptoBalance': 1, 'totalBalanceInCrypto': 2, 'price': 10000}
+
+        ladder = balancer.calculate_ladder(10000)
+
+        self.assertEqual(['BUY', 'SELL', 'BUY', 'SELL'], [rung[0] for rung in ladder])
+        for direction, price, amount_crypto, amount_fiat in ladder[:2]:
+            quote = 100 * price / (price + 10000)
+            self.assertAlmostEqual(48 if direction == 'BUY' else 52, quote)
+            self.assertIsNone(amount_fiat)
+        self.assertAlmostEqual(10000 * 48 / 52, ladder[0][1])
+        self.assertAlmostEqual((1 + 10000 / ladder[0][1]) * 0.02 / 1.01, ladder[0][2], 6)
+
+    @patch('balancer.logging')
+    def test_calculate_ladder_skips_orders_on_the_wrong_side_of_the_price(self, mock_logger):
+        balancer.LOG = mock_logger
+        balancer.CONF = self.create_default_conf()
+        balancer.CONF.ladder_steps = 1
+        balancer.BAL = {'cryptoBalance': 1, 'totalBalanceInCrypto': 2, 'price': 10000}
+
+        ladder = balancer.calculate_ladder(12000)
+
+        self.assertEqual(['BUY'], [rung[0] for rung in ladder])
+
+    @patch('balancer.logging')
+    @patch('balancer.get_margin_leverage', return_value=1.2)
+    @patch('balancer.get_position_info', return_value={'currentQty': 4000})
+    def test_calculate_ladder_bitmex_matches_meditate(self, mock_get_position_info, mock_get_margin_leverage, mock_logger):
+        balancer.LOG = mock_logger
+        balancer.CONF = self.create_default_conf()
+        balancer.CONF.exchange = 'bitmex'
+        balancer.CONF.start_crypto_price = 30000
+        balancer.CONF.ladder_steps = 1
+        balancer.CONF.tolerance_in_percent = 5
+
+        ladder = balancer.calculate_ladder(45000)
+
+        buy, sell = ladder
+        self.assertEqual(('BUY', 200), (buy[0], buy[3]))
+        self.assertEqual(('SELL', 200), (sell[0], sell[3]))
+        self.assertIsNone(balancer.meditate_bitmex(buy[1] * 1.001))
+        self.assertEqual('BUY', balancer.meditate_bitmex(buy[1] * 0.999)['direction'])
+        self.assertIsNone(balancer.meditate_bitmex(sell[1] * 0.999))
+        self.assertEqual('SELL', balancer.meditate_bitmex(sell[1] * 1.001)['direction'])
+
+    @patch('balancer.get_open_orders')
+    def test_is_ladder_resting(self, mock_get_open_orders):
+        balancer.LOG = mock.MagicMock()
+        order1 = balancer.Order({'id': 'b1', 'side': 'buy', 'price': 9000, 'amount': 0.1, 'datetime': '2021-08-16'})
+        order2 = balancer.Order({'id': 's1', 'side': 'sell', 'price': 11000, 'amount': 0.1, 'datetime': '2021-08-16'})
+        balancer.LADDER = [order1, order2]
+
+        mock_get_open_orders.return_value = [order2, order1]
+        self.assertTrue(balancer.is_ladder_resting())
+        mock_get_open_orders.return_value = [order2]
+        self.assertFalse(balancer.is_ladder_resting())
+        balancer.LADDER = []
+        self.assertFalse(balancer.is_ladder_resting())
+
+    @patch('balancer.fetch_order_status', return_value='open')
+    @patch('balancer.get_open_orders')
+    def test_is_ladder_resting_looks_up_orders_beyond_a_full_page(self, mock_get_open_orders, mock_fetch_order_status):
+        order1 = balancer.Order({'id': 'b1', 'side': 'buy', 'price': 9000, 'amount': 0.1, 'datetime': '2021-08-16'})
+        order2 = balancer.Order({'id': 's1', 'side': 'sell', 'price': 11000, 'amount': 0.1, 'datetime': '2021-08-16'})
+        balancer.LADDER = [order1, order2]
+        mock_get_open_orders.return_value = [order2]
+
+        with patch('balancer.OPEN_ORDERS_PAGE', 1):
+            self.assertTrue(balancer.is_ladder_resting())
+            mock_fetch_order_status.assert_called_once_with('b1')
+            mock_fetch_order_status.return_value = 'closed'
+            self.assertFalse(balancer.is_ladder_resting())
+
+    @patch('balancer.calculate_target_quote', return_value=51)
+    def test_is_ladder_outdated(self, mock_calculate_target_quote):
+        balancer.CONF.auto_quote = 'MM'
+        balancer.LADDER_TARGET = 50
+
+        self.assertTrue(balancer.is_ladder_outdated())
+        mock_calculate_target_quote.return_value = 50.5
+        self.assertFalse(balancer.is_ladder_outdated())
+        balancer.CONF.auto_quote = 'OFF'
+        mock_calculate_target_quote.return_value = 60
+        self.assertFalse(balancer.is_ladder_outdated())
+
+    @patch('balancer.record_fill')
+    @patch('balancer.cancel_order')
+    def test_cancel_ladder_records_fills(self, mock_cancel_order, mock_record_fill):
+        order1 = balancer.Order({'id': 'b1', 'side': 'buy', 'price': 9000, 'amount': 0.1, 'datetime': '2021-08-16'})
+        order2 = balancer.Order({'id': 's1', 'side': 'sell', 'price': 11000, 'amount': 0.1, 'datetime': '2021-08-16'})
+        balancer.LADDER = [order1, order2]
+        mock_cancel_order.side_effect = [order1, None]
+
+        balancer.cancel_ladder()
+
+        mock_record_fill.assert_called_once_with(order1)
+        self.assertEqual([], balancer.LADDER)
+
+    @patch('balancer.get_position_info', return_value=None)
+    def test_calculate_rung_bitmex_without_position(self, mock_get_position_info):
+        balancer.CONF.exchange = 'bitmex'
+
+        self.assertIsNone(balancer.calculate_rung('BUY', 50, 2))
+
+    def test_apply_fill_buy(self):
+        balancer.ADAPTER = balancer.ExchangeAdapter(mock.MagicMock())
+        balance = {'cryptoBalance': 1, 'totalBalanceInCrypto': 2, 'price': 10000}
+        order = balancer.Order({'id': 1, 'side': 'buy', 'price': 10000, 'amount': 0.5})
+
+        balance = balancer.apply_fill(balance, order)
+
+        self.assertEqual(1.5, balance['cryptoBalance'])
+        self.assertAlmostEqual(1.5 + (10000 - 5000 * (1 + balancer.FEE_RATE)) / 10000, balance['totalBalanceInCrypto'])
+
+    def test_apply_fill_partial_sell(self):
+        balancer.ADAPTER = balancer.ExchangeAdapter(mock.MagicMock())
+        balance = {'cryptoBalance': 1, 'totalBalanceInCrypto': 2, 'price': 10000}
+        order = balancer.Order({'id': 1, 'side': 'sell', 'price': 11000, 'amount': 0.5, 'filled': 0.2})
+
+        balance = balancer.apply_fill(balance, order)
+
+        self.assertAlmostEqual(0.8, balance['cryptoBalance'])
+        self.assertEqual(11000, balance['price'])
+        self.assertAlmostEqual(0.8 + (10000 + 2200 * (1 - balancer.FEE_RATE)) / 11000, balance['totalBalanceInCrypto'])
+
+    @patch('balancer.meditate', return_value=None)
+    @patch('balancer.calculate_actual_quote', return_value=50)
+    @patch('balancer.get_current_price', return_value=11000)
+    @patch('balancer.calculate_balances')
+    def test_calculate_action_uses_local_balances_until_due(self, mock_calculate_balances, mock_get_current_price,
+                                                            mock_calculate_actual_quote, mock_meditate):
+        balancer.CONF.reconcile_minutes = 10
+        balancer.RECONCILED = time.time()
+        balancer.BAL = {'cryptoBalance': 1, 'totalBalanceInCrypto': 2, 'price': 10000}
+
+        self.assertIsNone(balancer.calculate_action())
+
+        mock_calculate_balances.assert_not_called()
+        self.assertEqual(11000, balancer.BAL['price'])
+        self.assertAlmostEqual(1 + 10000 / 11000, balancer.BAL['totalBalanceInCrypto'])
+
+    @patch('balancer.meditate', return_value=('BUY', 0.1))
+    @patch('balancer.calculate_actual_quote', return_value=40)
+    @patch('balancer.get_current_price', return_value=11000)
+    @patch('balancer.calculate_balances')
+    def test_calculate_action_reconciles_before_trading(self, mock_calculate_balances, mock_get_current_price,
+                                                         mock_calculate_actual_quote, mock_meditate):
+        balancer.CONF.reconcile_minutes = 10
+        balancer.RECONCILED = time.time()
+        balancer.BAL = {'cryptoBalance': 1, 'totalBalanceInCrypto': 2, 'price': 10000}
+        reconciled = {'cryptoBalance': 0.9, 'totalBalanceInCrypto': 1.9, 'price': 11000}
+        mock_calculate_balances.return_value = reconciled
+
+        self.assertEqual(('BUY', 0.1), balancer.calculate_action())
+
+        mock_calculate_balances.assert_called_once()
+        self.assertEqual(reconciled, balancer.BAL)
+        self.assertEqual(2, mock_meditate.call_count)
+
+    @patch('balancer.meditate', return_value=None)
+    @patch('balancer.calculate_actual_quote', return_value=50)
+    @patch('balancer.calculate_balances')
+    def test_calculate_action_reconciles_every_cycle_by_default(self, mock_calculate_balances,
+                                                                 mock_calculate_actual_quote, mock_meditate):
+        mock_calculate_balances.return_value = {'cryptoBalance': 1, 'totalBalanceInCrypto': 2, 'price': 10000}
+        balancer.RECONCILED = time.time()
+
+        balancer.calculate_action()
+
+        mock_calculate_balances.assert_called_once()
+
+    def test_calculate_trigger_band_with_fixed_quote(self):
+        balancer.CONF.auto_quote = 'OFF'
+        balancer.CONF.crypto_quote_in_percent = 50
+        balancer.CONF.tolerance_in_percent = 5
+        balance = {'cryptoBalance': 1, 'totalBalanceInCrypto': 2, 'price': 10000}
+
+        band = balancer.calculate_trigger_band(balance)
+
+        self.assertAlmostEqual(45, 100 * band['low'] / (band['low'] + 10000))
+        self.assertAlmostEqual(55, 100 * band['high'] / (band['high'] + 10000))
+
+    @patch('balancer.get_mayer', return_value={'current': 1.25})
+    def test_calculate_trigger_band_following_mayer_multiple(self, mock_get_mayer):
+        balancer.CONF.auto_quote = 'MM'
+        balancer.CONF.crypto_quote_in_percent = 62.5
+        balancer.CONF.max_crypto_quote_in_percent = 80
+        balancer.CONF.tolerance_in_percent = 5
+        balance = {'cryptoBalance': 1, 'totalBalanceInCrypto': 2, 'price': 10000}
+
+        band = balancer.calculate_trigger_band(balance)
+
+        for price, bound in [(band['low'], 45), (band['high'], 55)]:
+            quote = 100 * price / (price + 10000)
+            target_quote = 62.5 / (1.25 * price / 10000)
+            self.assertAlmostEqual(0, quote - target_quote + (50 - bound), 3)
+        self.assertLess(band['low'], 10000)
+        self.assertGreater(band['high'], 10000)
+
+    def test_calculate_trigger_band_without_crypto(self):
+        balance = {'cryptoBalance': 0, 'totalBalanceInCrypto': 2, 'price': 10000}
+
+        self.assertIsNone(balancer.calculate_trigger_band(balance))
+
+    @patch('balancer.meditate', return_value=None)
+    @patch('balancer.calculate_actual_quote', return_value=50)
+    @patch('balancer.get_current_price')
+    @patch('balancer.calculate_balances')
+    def test_calculate_action_only_checks_price_inside_band(self, mock_calculate_balances, mock_get_current_price,
+                                                            mock_calculate_actual_quote, mock_meditate):
+        balancer.CONF.auto_quote = 'OFF'
+        balancer.CONF.crypto_quote_in_percent = 50
+        balancer.CONF.trigger_band_minutes = 10
+        mock_calculate_balances.return_value = {'cryptoBalance': 1, 'totalBalanceInCrypto': 2, 'price': 10000}
+        mock_get_current_price.side_effect = [10000, 10100, 20000]
+
+        balancer.calculate_action()
+        balancer.calculate_action()
+
+        self.assertEqual(1, mock_calculate_balances.call_count)
+        self.assertEqual(1, mock_meditate.call_count)
+
+        balancer.calculate_action()
+
+        self.assertEqual(2, mock_calculate_balances.call_count)
+
+    @patch('balancer.meditate', return_value=None)
+    @patch('balancer.calculate_actual_quote', return_value=50)
+    @patch('balancer.get_current_price', return_value=10000)
+    @patch('balancer.calculate_balances')
+    def test_calculate_action_evaluates_after_fill(self, mock_calculate_balances, mock_get_current_price,
+                                                   mock_calculate_actual_quote, mock_meditate):
+        balancer.ADAPTER = balancer.ExchangeAdapter(mock.MagicMock())
+        balancer.EXCHANGE = balancer.ADAPTER.exchange
+        balancer.CONF.auto_quote = 'OFF'
+        balancer.CONF.trigger_band_minutes = 10
+        mock_calculate_balances.return_value = {'cryptoBalance': 1, 'totalBalanceInCrypto': 2, 'price': 10000}
+        balancer.calculate_action()
+
+        balancer.BAL = balancer.apply_fill(balancer.BAL, balancer.Order({'id': 1, 'side': 'buy', 'price': 10000,
+                                                                         'amount': 0.1}))
+        balancer.calculate_action()
+
+        self.assertEqual(2, mock_calculate_balances.call_count)
+
     def test_meditate_quote_too_low(self):
         balancer.CONF = self.create_default_conf()
 
@@ -475,6 +1197,155 @@ class BalancerTest(unittest.TestCase):
 
         self.assertIsNone(action)
 
+    def test_fetch_mayer_sends_conditional_request(self):
+        session = mock.MagicMock()
+        balancer.MAYER_REMOTE = {'session': session, 'etag': None, 'modified': None, 'mayer': None}
+        session.get.side_effect = [
+            mock.MagicMock(status_code=200, text='{}', headers={'ETag': '"v1"', 'Last-Modified': 'Mon, 01 Jan 2024'},
+                           json=lambda: {'data': {'current_mayer_multiple': '1.2', 'average_mayer_multiple': '1.4'}}),
+            mock.MagicMock(status_code=304, text='')]
+
+        first = balancer.fetch_mayer()
+        first['current'] = 0
+        second = balancer.fetch_mayer()
+
+        self.assertEqual({'current': 1.2, 'average': 1.4}, second)
+        self.assertEqual({}, session.get.call_args_list[0].kwargs['headers'])
+        self.assertEqual({'If-None-Match': '"v1"', 'If-Modified-Since': 'Mon, 01 Jan 2024'},
+                         session.get.call_args_list[1].kwargs['headers'])
+
+    @patch('balancer.sleep_for')
+    def test_fetch_mayer_gives_up_without_retrying(self, mock_sleep_for):
+        import requests
+        session = mock.MagicMock()
+        session.get.side_effect = requests.exceptions.ConnectionError('unreachable')
+        balancer.MAYER_REMOTE = {'session': session, 'etag': None, 'modified': None, 'mayer': None}
+
+        self.assertIsNone(balancer.fetch_mayer())
+
+        session.get.assert_called_once()
+        mock_sleep_for.assert_not_called()
+
+    @patch('balancer.fetch_mayer')
+    @patch('balancer.get_current_price', return_value=30000)
+    @patch('balancer.read_daily_average', return_value=20000)
+    def test_mayer_provider_reads_mayer_file_only_when_modified(self, mock_read_daily_average, mock_get_current_price,
+                                                                mock_fetch_mayer):
+        provider = balancer.MayerProvider(60)
+        with tempfile.TemporaryDirectory() as data_dir:
+            balancer.CONF.mayer_file = os.path.join(data_dir, 'mayer.avg')
+            with open(balancer.CONF.mayer_file, 'w') as file:
+                file.write('20000')
+
+            provider.refresh()
+            provider.refresh()
+            os.utime(balancer.CONF.mayer_file, (time.time() + 10, time.time() + 10))
+            provider.refresh()
+        balancer.CONF.mayer_file = ''
+
+        self.assertEqual(2, mock_read_daily_average.call_count)
+        mock_fetch_mayer.assert_not_called()
+        self.assertEqual(1.5, provider.get()['current'])
+
+    @patch('balancer.fetch_mayer', return_value={'current': 0.9, 'average': 1.4})
+    def test_mayer_provider_falls_back_to_remote_without_mayer_file(self, mock_fetch_mayer):
+        provider = balancer.MayerProvider(60)
+
+        self.assertIsNone(provider.get())
+        provider.refresh()
+
+        self.assertEqual(0.9, provider.get()['current'])
+
+    @patch.object(balancer.MayerProvider, 'refresh')
+    def test_mayer_provider_refreshes_in_background_until_stopped(self, mock_refresh):
+        provider = balancer.MayerProvider(0.01)
+
+        provider.start()
+        time.sleep(0.1)
+        provider.stop()
+        provider.thread.join(1)
+
+        self.assertFalse(provider.thread.is_alive())
+        self.assertGreater(mock_refresh.call_count, 1)
+
+    def test_moving_average_keeps_rolling_sum(self):
+        sma = balancer.MovingAverage(3, [[1, 10], [2, 20]])
+
+        self.assertIsNone(sma.average())
+
+        sma.update([[2, 99], [3, 30], [4, 40], [5, 50]])
+
+        self.assertEqual(40, sma.average())
+        self.assertEqual(120, sma.total)
+        self.assertEqual(5 + balancer.DAY_MS, sma.next_day())
+
+    @patch('balancer.get_adapter')
+    def test_update_moving_average_bootstraps_once_a_day(self, mock_get_adapter):
+        mock_get_adapter.return_value.supports.return_value = True
+        today = int(time.time() * 1000) // balancer.DAY_MS * balancer.DAY_MS
+        candles = [[today - day * balancer.DAY_MS, 0, 0, 0, 1000 + day, 0] for day in range(200, -1, -1)]
+        balancer.EXCHANGE.fetch_ohlcv.return_value = candles
+        with tempfile.TemporaryDirectory() as data_dir:
+            balancer.DATA_DIR = data_dir + os.path.sep
+
+            sma = balancer.update_moving_average()
+            same = balancer.update_moving_average(sma)
+            loaded = balancer.update_moving_average()
+        balancer.DATA_DIR = ''
+
+        balancer.EXCHANGE.fetch_ohlcv.assert_called_once_with('BTC/USD', '1d', today - 200 * balancer.DAY_MS, 201)
+        self.assertIs(sma, same)
+        self.assertEqual(1000 + 100.5, sma.average())
+        self.assertEqual(sma.average(), loaded.average())
+
+    @patch('balancer.get_adapter')
+    def test_update_moving_average_adds_new_day(self, mock_get_adapter):
+        mock_get_adapter.return_value.supports.return_value = True
+        today = int(time.time() * 1000) // balancer.DAY_MS * balancer.DAY_MS
+        sma = balancer.MovingAverage(200, [[today - day * balancer.DAY_MS, 1000] for day in range(201, 1, -1)])
+        balancer.EXCHANGE.fetch_ohlcv.return_value = [[today - balancer.DAY_MS, 0, 0, 0, 3000, 0],
+                                                      [today, 0, 0, 0, 5000, 0]]
+        with tempfile.TemporaryDirectory() as data_dir:
+            balancer.DATA_DIR = data_dir + os.path.sep
+
+            sma = balancer.update_moving_average(sma)
+        balancer.DATA_DIR = ''
+
+        self.assertEqual(1000 + 2000 / 200, sma.average())
+        self.assertEqual(today, sma.next_day())
+
+    @patch('balancer.get_adapter')
+    def test_update_moving_average_without_candles(self, mock_get_adapter):
+        mock_get_adapter.return_value.supports.return_value = False
+
+        self.assertIsNone(balancer.update_moving_average())
+
+    @patch('balancer.read_daily_average')
+    @patch('balancer.get_current_price', return_value=30000)
+    @patch('balancer.update_moving_average')
+    def test_mayer_provider_prefers_local_average(self, mock_update_moving_average, mock_get_current_price,
+                                                  mock_read_daily_average):
+        mock_update_moving_average.return_value = balancer.MovingAverage(2, [[1, 15000], [2, 25000]])
+        provider = balancer.MayerProvider(60)
+
+        provider.refresh()
+
+        mock_read_daily_average.assert_not_called()
+        self.assertEqual(1.5, provider.get()['current'])
+
+    @patch('balancer.get_current_price')
+    def test_get_mayer_serves_cached_value_of_provider(self, mock_get_current_price):
+        balancer.MAYER = balancer.MayerProvider(60)
+        balancer.MAYER.mayer = {'current': 1.1}
+        balancer.MAYER.timestamp = time.time() - 1000
+
+        mayer = balancer.get_mayer()
+
+        self.assertEqual(1.1, mayer['current'])
+        self.assertAlmostEqual(1000, mayer['age'], 0)
+        mock_get_current_price.assert_not_called()
+        balancer.LOG.warning.assert_called_once()
+
     @patch('balancer.read_daily_average', return_value=1000)
     @patch('balancer.get_current_price', return_value=10000)
     def test_calculate_mayer_high(self, mock_current_price, mock_read_daily_average):
@@ -907,6 +1778,60 @@ class BalancerTest(unittest.TestCase):
         mock_create_report_part_settings.assert_called()
         mock_create_mail_part_general.assert_called()
 
+    def test_record_execution_with_market_fallback(self):
+        balancer.begin_execution({'direction': 'BUY', 'price': 10000, 'percentage': 10, 'amount': None})
+        balancer.note_order(9990)
+        balancer.note_order(9995)
+        balancer.note_order(None)
+        order = balancer.Order({'id': 1, 'side': 'buy', 'price': None, 'amount': 0.1, 'average': 10010})
+        with tempfile.TemporaryDirectory() as data_dir:
+            balancer.DATA_DIR = data_dir + os.path.sep
+
+            balancer.record_execution(order)
+            entries = balancer.read_executions(time.time() - 60)
+        balancer.DATA_DIR = ''
+
+        self.assertEqual(1, len(entries))
+        self.assertEqual(10000, entries[0]['decision'])
+        self.assertEqual(9995, entries[0]['limit'])
+        self.assertEqual(10010, entries[0]['fill'])
+        self.assertAlmostEqual(10, entries[0]['slippage_bps'])
+        self.assertEqual(2, entries[0]['trials'])
+        self.assertTrue(entries[0]['market'])
+        self.assertIsNotNone(entries[0]['seconds_to_fill'])
+
+    def test_record_execution_of_ladder_fill(self):
+        order = balancer.Order({'id': 1, 'side': 'sell', 'price': 11000, 'amount': 0.1})
+        with tempfile.TemporaryDirectory() as data_dir:
+            balancer.DATA_DIR = data_dir + os.path.sep
+
+            balancer.record_execution(order)
+            entries = balancer.read_executions(0)
+        balancer.DATA_DIR = ''
+
+        self.assertEqual(0, entries[0]['slippage_bps'])
+        self.assertIsNone(entries[0]['seconds_to_fill'])
+        self.assertFalse(entries[0]['market'])
+
+    def test_calculate_execution_quality(self):
+        entries = [{'slippage_bps': s, 'seconds_to_fill': t, 'market': m}
+                   for s, t, m in [(-5, 10, False), (2, 30, False), (20, 300, True), (1, None, False)]]
+
+        quality = balancer.calculate_execution_quality(entries)
+
+        self.assertEqual(4, quality['fills'])
+        self.assertEqual(1.5, quality['median_slippage_bps'])
+        self.assertEqual(300, quality['p95_seconds_to_fill'])
+        self.assertEqual(75, quality['limit_fill_rate'])
+
+    def test_calculate_execution_quality_without_fills(self):
+        quality = balancer.calculate_execution_quality([])
+
+        self.assertEqual(0, quality['fills'])
+        self.assertIsNone(quality['median_slippage_bps'])
+        self.assertIsNone(quality['p95_seconds_to_fill'])
+        self.assertIsNone(quality['limit_fill_rate'])
+
     def test_exchange_configuration(self):
         balancer.INSTANCE = 'test'
         balancer.CONF = balancer.ExchangeConfig()
@@ -950,6 +1875,374 @@ class BalancerTest(unittest.TestCase):
         self.assertEqual(0, balance['free'])
         self.assertEqual(0.9, balance['total'])
 
+    @patch('balancer.logging')
+    @patch('ccxt.bitmex')
+    def test_snapshot_serves_balances_and_positions_once_per_cycle(self, mock_bitmex, mock_logging):
+        balancer.CONF = self.create_default_conf()
+        balancer.CONF.exchange = 'bitmex'
+        balancer.CONF.symbol = 'XBTUSD'
+        balancer.EXCHANGE = mock_bitmex
+        balancer.LOG = mock_logging
+        balancer.SNAPSHOT = balancer.AccountSnapshot()
+        mock_bitmex.fetch_balance.return_value = {'BTC': {'free': 0.5, 'used': 0.1, 'total': 0.6},
+                                                  'info': [{'currency': 'XBt', 'marginLeverage': 0.8,
+                                                            'walletBalance': 60000000}]}
+        mock_bitmex.private_get_position.return_value = [{'symbol': 'XBTUSD', 'currentQty': 100}]
+
+        balancer.get_crypto_balance()
+        balancer.get_margin_leverage()
+        balancer.get_wallet_balance(10000)
+        balancer.get_position_info()
+        balancer.get_used_balance()
+
+        mock_bitmex.fetch_balance.assert_called_once()
+        mock_bitmex.private_get_position.assert_called_once()
+        balancer.SNAPSHOT = None
+
+    @patch('balancer.logging')
+    @patch('ccxt.kraken')
+    def test_snapshot_invalidated_after_order_creation(self, mock_kraken, mock_logging):
+        balancer.CONF = self.create_default_conf()
+        balancer.EXCHANGE = mock_kraken
+        balancer.LOG = mock_logging
+        balancer.SNAPSHOT = balancer.AccountSnapshot()
+        mock_kraken.fetch_balance.return_value = {'BTC': {'free': 0.5, 'used': 0, 'total': 0.5}}
+        mock_kraken.create_limit_buy_order.return_value = {'id': 1, 'price': 9900, 'amount': 0.01, 'side': 'buy',
+                                                           'datetime': str(datetime.datetime.utcnow())}
+
+        balancer.get_crypto_balance()
+        balancer.create_buy_order(9900, 0.01, None)
+        balancer.get_crypto_balance()
+
+        self.assertEqual(2, mock_kraken.fetch_balance.call_count)
+        balancer.SNAPSHOT = None
+
+    @patch('ccxt.kraken')
+    def test_get_current_price_served_from_ticker_cache(self, mock_kraken):
+        balancer.CONF = self.create_default_conf()
+        balancer.EXCHANGE = mock_kraken
+        balancer.TICKERS = {}
+        mock_kraken.fetch_ticker.return_value = {'bid': 10000}
+
+        self.assertEqual(10000, balancer.get_current_price())
+        self.assertEqual(10000, balancer.get_current_price())
+
+        mock_kraken.fetch_ticker.assert_called_once_with('BTC/EUR')
+
+    @patch('ccxt.kraken')
+    def test_get_current_price_fresh_bypasses_ticker_cache(self, mock_kraken):
+        balancer.CONF = self.create_default_conf()
+        balancer.EXCHANGE = mock_kraken
+        balancer.TICKERS = {'BTC/EUR': {'price': 9000, 'timestamp': time.time()}}
+        mock_kraken.fetch_ticker.return_value = {'bid': 10000}
+
+        self.assertEqual(10000, balancer.get_current_price(fresh=True))
+
+        mock_kraken.fetch_ticker.assert_called_once()
+
+    @patch('ccxt.kraken')
+    def test_get_current_price_stale_ticker_is_refetched(self, mock_kraken):
+        balancer.CONF = self.create_default_conf()
+        balancer.EXCHANGE = mock_kraken
+        balancer.TICKERS = {'BTC/EUR': {'price': 9000, 'timestamp': time.time() - 11}}
+        mock_kraken.fetch_ticker.return_value = {'bid': 10000}
+
+        self.assertEqual(10000, balancer.get_current_price())
+
+    @patch('balancer.logging')
+    @patch('ccxt.bitmex')
+    def test_stream_feed_serves_price_order_status_and_position(self, mock_bitmex, mock_logging):
+        balancer.CONF = self.create_default_conf()
+        balancer.CONF.exchange = 'bitmex'
+        balancer.CONF.symbol = 'XBTUSD'
+        balancer.EXCHANGE = mock_bitmex
+        balancer.LOG = mock_logging
+        balancer.FEED = balancer.StreamFeed(StreamStandIn(), 'XBTUSD', True)
+        balancer.FEED.start()
+        for _ in range(100):
+            if balancer.FEED.price and balancer.FEED.orders and balancer.FEED.position:
+                break
+            time.sleep(0.01)
+
+        self.assertEqual(30000, balancer.get_current_price())
+        self.assertEqual('closed', balancer.fetch_order_status('o1'))
+        self.assertEqual(500, balancer.get_position_info()['currentQty'])
+        mock_bitmex.fetch_ticker.assert_not_called()
+        mock_bitmex.fetch_order_status.assert_not_called()
+        mock_bitmex.private_get_position.assert_not_called()
+        balancer.FEED.stop()
+        balancer.FEED.thread.join(1)
+        balancer.FEED = None
+
+    def test_stream_feed_ignores_outdated_price(self):
+        feed = balancer.StreamFeed(StreamStandIn(), 'BTC/EUR')
+        feed.price = 30000
+        feed.price_timestamp = time.time() - balancer.STREAM_MAX_AGE_SECONDS - 1
+
+        self.assertIsNone(feed.get_price())
+
+    def test_stream_feed_ignores_outdated_position_and_open_order_status(self):
+        feed = balancer.StreamFeed(StreamStandIn(), 'XBTUSD', True)
+        outdated = time.time() - balancer.STREAM_MAX_AGE_SECONDS - 1
+        feed.position = {'symbol': 'XBTUSD', 'currentQty': 500}
+        feed.position_timestamp = outdated
+        feed.orders = {'o1': 'open', 'o2': 'closed'}
+        feed.order_timestamps = {'o1': outdated, 'o2': outdated}
+
+        self.assertIsNone(feed.get_position())
+        self.assertIsNone(feed.get_order_status('o1'))
+        self.assertEqual('closed', feed.get_order_status('o2'))
+
+    def test_stream_feed_serves_only_recent_price_for_fresh_requests(self):
+        balancer.CONF = self.create_default_conf()
+        balancer.FEED = balancer.StreamFeed(StreamStandIn(), 'BTC/EUR')
+        balancer.FEED.price = 30000
+        balancer.FEED.price_timestamp = time.time() - balancer.FRESH_PRICE_MAX_AGE_SECONDS - 1
+        balancer.TICKERS = {}
+        balancer.EXCHANGE = mock.MagicMock()
+        balancer.EXCHANGE.fetch_ticker.return_value = {'bid': 31000}
+
+        self.assertEqual(30000, balancer.get_current_price())
+        self.assertEqual(31000, balancer.get_current_price(fresh=True))
+        balancer.FEED = None
+        balancer.TICKERS = {}
+
+    def test_stream_feed_drops_data_when_the_stream_ends(self):
+        balancer.LOG = mock.MagicMock()
+        feed = balancer.StreamFeed(StreamStandIn(), 'XBTUSD', True)
+        feed.price = 30000
+        feed.position = {'currentQty': 500}
+        feed.orders = {'o1': 'open'}
+        feed.running = True
+        with patch.object(feed, 'watch', side_effect=RuntimeError('stream failed')):
+            with self.assertRaises(RuntimeError):
+                feed.run()
+
+        self.assertFalse(feed.running)
+        self.assertIsNone(feed.price)
+        self.assertIsNone(feed.position)
+        self.assertEqual({}, feed.orders)
+        balancer.LOG.error.assert_called()
+
+    def test_gather_runs_calls_concurrently_and_keeps_order(self):
+        before = time.time()
+
+        results = balancer.gather(lambda: time.sleep(0.3) or 1, lambda: time.sleep(0.3) or 2)
+
+        self.assertEqual([1, 2], results)
+        self.assertLess(time.time() - before, 0.55)
+
+    @patch('balancer.logging')
+    @patch('ccxt.kraken')
+    def test_prefetch_account_warms_snapshot(self, mock_kraken, mock_logging):
+        balancer.CONF = self.create_default_conf()
+        balancer.EXCHANGE = mock_kraken
+        balancer.LOG = mock_logging
+        balancer.TICKERS = {}
+        balancer.SNAPSHOT = balancer.AccountSnapshot()
+        mock_kraken.fetch_balance.return_value = {'BTC': {'free': 0.5, 'used': 0, 'total': 0.5},
+                                                  'EUR': {'free': 5000, 'used': 0, 'total': 5000}}
+        mock_kraken.fetch_ticker.return_value = {'bid': 10000}
+        mock_kraken.private_post_tradebalance.return_value = {'result': {'e': '1', 'mf': '1', 'tb': '1'}}
+
+        balance = balancer.calculate_balances()
+
+        self.assertEqual(0.5, balance['cryptoBalance'])
+        self.assertEqual(1, balance['totalBalanceInCrypto'])
+        mock_kraken.fetch_balance.assert_called_once()
+        mock_kraken.fetch_ticker.assert_called_once()
+        mock_kraken.private_post_tradebalance.assert_not_called()
+        balancer.SNAPSHOT = None
+
+    def test_connect_to_exchange_unsupported_exchange(self):
+        balancer.CONF = self.create_default_conf()
+        balancer.CONF.exchange = 'nonexistent'
+
+        with self.assertRaises(SystemExit):
+            balancer.connect_to_exchange()
+
+        balancer.CONF.exchange = 'kraken'
+
+    @patch('balancer.logging')
+    def test_log_startup_times(self, mock_logging):
+        balancer.LOG = mock_logging
+
+        balancer.log_startup_times({'imports': 1.5, 'config': 0.01, 'connect': 0.2})
+
+        mock_logging.info.assert_called_with('Startup took %.2fs (%s)', 1.71,
+                                             'imports 1.50s, config 0.01s, connect 0.20s')
+
+    @patch('balancer.logging')
+    @patch('balancer.sleep_for')
+    def test_execute_retries_with_exponential_backoff(self, mock_sleep_for, mock_logging):
+        balancer.LOG = mock_logging
+        call = mock.MagicMock(side_effect=[ccxt.ExchangeError('error'), ccxt.ExchangeError('error'), 42])
+
+        result = balancer.execute('test', call)
+
+        self.assertEqual(42, result)
+        self.assertEqual(3, call.call_count)
+        mock_sleep_for.assert_has_calls([mock.call(4, 6), mock.call(8, 12)])
+
+    @patch('balancer.logging')
+    @patch('balancer.sleep_for')
+    def test_execute_gives_up_after_endpoint_limit(self, mock_sleep_for, mock_logging):
+        balancer.LOG = mock_logging
+        call = mock.MagicMock(side_effect=ccxt.ExchangeError('error'))
+
+        result = balancer.execute('get_net_deposits', call, default='n/a')
+
+        self.assertEqual('n/a', result)
+        self.assertEqual(balancer.RETRY_LIMITS['get_net_deposits'], call.call_count)
+
+    @patch('balancer.sleep_for')
+    def test_execute_raises_after_default_limit(self, mock_sleep_for):
+        call = mock.MagicMock(side_effect=ccxt.NetworkError('down'))
+
+        with self.assertRaises(balancer.RetriesExhausted):
+            balancer.execute('fetch_balance', call)
+
+        self.assertEqual(balancer.DEFAULT_RETRY_LIMIT, call.call_count)
+
+    @patch('balancer.sleep_for')
+    def test_retrying_wrappers_do_not_nest(self, mock_sleep_for):
+        balancer.CONF.exchange = 'binance'
+        balancer.EXCHANGE.fetch_balance.side_effect = ccxt.NetworkError('down')
+
+        with self.assertRaises(balancer.RetriesExhausted):
+            balancer.get_used_balance()
+
+        self.assertEqual(balancer.DEFAULT_RETRY_LIMIT, balancer.EXCHANGE.fetch_balance.call_count)
+
+    def test_set_start_values_keeps_reference_deposits_if_unavailable(self):
+        balancer.INSTANCE = 'test'
+        with tempfile.TemporaryDirectory() as data_dir:
+            balancer.DATA_DIR = data_dir + os.path.sep
+            with open(f'{balancer.DATA_DIR}test.txt', 'w') as file:
+                file.write('[config]\nreference_net_deposits = 0.5\n')
+
+            balancer.set_start_values({'crypto_price': 8000, 'margin_balance': 1.2, 'mayer_multiple': 1.1,
+                                       'net_deposits': None})
+
+            with open(f'{balancer.DATA_DIR}test.txt') as file:
+                content = file.read()
+            balancer.DATA_DIR = ''
+        self.assertIn('reference_net_deposits = 0.5', content)
+        self.assertIn('start_margin_balance = 1.2', content)
+
+    def test_calculate_backoff_is_capped(self):
+        self.assertEqual(5, balancer.calculate_backoff(1))
+        self.assertEqual(40, balancer.calculate_backoff(4))
+        self.assertEqual(balancer.MAX_BACKOFF_SECONDS, balancer.calculate_backoff(20))
+
+    @patch('balancer.logging')
+    @patch('balancer.sleep_for')
+    def test_circuit_breaker_pauses_after_consecutive_network_errors(self, mock_sleep_for, mock_logging):
+        balancer.LOG = mock_logging
+        balancer.BREAKER = balancer.CircuitBreaker(3, 900)
+        call = mock.MagicMock(side_effect=[ccxt.NetworkError('down'), ccxt.NetworkError('down'),
+                                           ccxt.NetworkError('down'), 42])
+
+        result = balancer.execute('test', call)
+
+        self.assertEqual(42, result)
+        mock_sleep_for.assert_called_with(900)
+        self.assertEqual(0, balancer.BREAKER.failures)
+        balancer.BREAKER = None
+
+    def test_circuit_breaker_resets_on_exchange_error(self):
+        breaker = balancer.CircuitBreaker(3, 900)
+        breaker.record(ccxt.NetworkError('down'))
+        breaker.record(ccxt.NetworkError('down'))
+
+        breaker.record(ccxt.ExchangeError('insufficient funds'))
+
+        self.assertFalse(breaker.is_open())
+        self.assertEqual(0, breaker.failures)
+
+    def test_request_budget_paces_requests(self):
+        budget = balancer.RequestBudget(20, 1)
+        before = time.time()
+
+        for _ in range(3):
+            budget.acquire()
+
+        self.assertGreaterEqual(time.time() - before, 0.09)
+
+    def test_request_budget_serves_orders_first(self):
+        budget = balancer.RequestBudget(10, 1)
+        budget.acquire()
+        served = []
+        query = threading.Thread(target=lambda: budget.acquire() or served.append('query'))
+        order = threading.Thread(target=lambda: budget.acquire(priority=True) or served.append('order'))
+        order.start()
+        time.sleep(0.01)
+        query.start()
+        query.join(1)
+        order.join(1)
+
+        self.assertEqual(['order', 'query'], served)
+
+    def test_throttled_exchange_serializes_private_calls(self):
+        active = []
+        overlaps = []
+
+        def private_call():
+            active.append(1)
+            overlaps.append(len(active))
+            time.sleep(0.05)
+            active.pop()
+
+        exchange = mock.MagicMock()
+        exchange.private_post_balance.side_effect = private_call
+        exchange.fetch_balance.side_effect = private_call
+        throttled = balancer.ThrottledExchange(exchange, balancer.RequestBudget(1000, 10), True)
+
+        balancer.gather(throttled.private_post_balance, throttled.fetch_balance, throttled.private_post_balance)
+
+        self.assertEqual([1, 1, 1], overlaps)
+
+    def test_connect_to_exchange_serializes_private_calls_of_nonce_exchanges(self):
+        balancer.CONF = self.create_default_conf()
+        balancer.CONF.test = False
+        self.assertTrue(balancer.connect_to_exchange().serialize_private)
+        balancer.CONF.exchange = 'bitmex'
+        self.assertFalse(balancer.connect_to_exchange().serialize_private)
+
+    @mock.patch.object(ccxt.kraken, 'fetch', return_value={'error': [], 'result': {}})
+    def test_connect_to_exchange_throttles_requests_with_endpoint_cost(self, mock_fetch):
+        balancer.CONF = self.create_default_conf()
+        balancer.CONF.test = False
+        balancer.CONF.api_secret = 'c2VjcmV0'
+        exchange = balancer.connect_to_exchange()
+        exchange.budget = mock.MagicMock()
+
+        exchange.public_get_time()
+        exchange.private_post_ledgers()
+
+        self.assertEqual([mock.call(1, False), mock.call(6, False)], exchange.budget.acquire.call_args_list)
+        self.assertTrue(exchange.enableRateLimit)
+
+    def test_throttled_exchange_sends_order_requests_in_priority_lane(self):
+        exchange = mock.MagicMock()
+        exchange.create_order.side_effect = lambda: exchange.throttle(3)
+        exchange.fetch_ticker.side_effect = lambda: exchange.throttle(2)
+        throttled = balancer.ThrottledExchange(exchange, mock.MagicMock())
+
+        throttled.create_order()
+        throttled.fetch_ticker()
+
+        self.assertEqual([mock.call(3, True), mock.call(2, False)], throttled.budget.acquire.call_args_list)
+
+    def test_request_budget_charges_costs_above_capacity(self):
+        budget = balancer.RequestBudget(20, 1)
+        budget.acquire(3)
+        before = time.time()
+
+        budget.acquire()
+
+        self.assertGreaterEqual(time.time() - before, 0.14)
+
     @patch('balancer.logging')
     @patch('ccxt.kraken')
     def test_get_margin_balance_kraken(self, mock_kraken, mock_logging):
@@ -964,6 +2257,29 @@ class BalancerTest(unittest.TestCase):
         mock_kraken.private_post_tradebalance.assert_called()
         self.assertEqual(150, balance)
 
+    @patch('balancer.logging')
+    @patch('ccxt.kraken')
+    def test_kraken_trade_balance_fetched_once_per_cycle(self, mock_kraken, mock_logging):
+        balancer.CONF = self.create_default_conf()
+        balancer.EXCHANGE = mock_kraken
+        balancer.LOG = mock_logging
+        balancer.SNAPSHOT = balancer.AccountSnapshot()
+        mock_kraken.private_post_tradebalance.return_value = {'result': {'e': '1.5', 'mf': '1.2', 'm': '0.3',
+                                                                         'ml': '2.5', 'tb': '1.4'}}
+
+        self.assertEqual(1.5, balancer.get_margin_balance())
+        self.assertEqual(2.5, balancer.get_margin_leverage())
+        self.assertEqual(1.4, balancer.get_wallet_balance(10000))
+
+        mock_kraken.private_post_tradebalance.assert_called_once_with({'asset': 'BTC'})
+        balancer.SNAPSHOT = None
+
+    def test_kraken_trade_balance_without_open_positions(self):
+        trade_balance = balancer.TradeBalance({'e': '1.5', 'mf': '1.5', 'tb': '1.5'})
+
+        self.assertEqual(0, trade_balance.margin_level)
+        self.assertEqual(0, trade_balance.used_margin)
+
     @patch('balancer.logging')
     @patch('ccxt.bitmex')
     def test_get_margin_balance_bitmex(self, mock_bitmex, mock_logging):
@@ -977,10 +2293,138 @@ class BalancerTest(unittest.TestCase):
 
         mock_bitmex.fetch_balance.assert_called()
 
+    @patch('balancer.fetch_order_status')
+    @patch('balancer.sleep')
+    def test_wait_for_fill_returns_as_soon_as_the_order_is_closed(self, mock_sleep, mock_fetch_order_status):
+        balancer.CONF = self.create_default_conf()
+        balancer.FEED = None
+        mock_fetch_order_status.side_effect = ['open', 'open', 'closed']
+        clock = [1000.0]
+        mock_sleep.side_effect = lambda seconds: clock.__setitem__(0, clock[0] + seconds)
+
+        with patch('balancer.time.time', side_effect=lambda: clock[0]):
+            status = balancer.wait_for_fill(balancer.Order({'id': 'o1', 'side': 'buy', 'price': 1, 'amount': 1}))
+
+        self.assertEqual('closed', status)
+        self.assertEqual([2, 4, 8], [c.args[0] for c in mock_sleep.call_args_list])
+
+    @patch('balancer.fetch_order_status')
+    @patch('balancer.sleep')
+    def test_wait_for_fill_gives_up_at_order_adjust_seconds(self, mock_sleep, mock_fetch_order_status):
+        balancer.CONF = self.create_default_conf()
+        balancer.CONF.order_adjust_seconds = 30
+        balancer.FEED = None
+        mock_fetch_order_status.return_value = 'open'
+        clock = [1000.0]
+        mock_sleep.side_effect = lambda seconds: clock.__setitem__(0, clock[0] + seconds)
+
+        with patch('balancer.time.time', side_effect=lambda: clock[0]):
+            status = balancer.wait_for_fill(balancer.Order({'id': 'o1', 'side': 'buy', 'price': 1, 'amount': 1}))
+
+        self.assertEqual('open', status)
+        self.assertEqual(1030.0, clock[0])
+        self.assertEqual(4, mock_fetch_order_status.call_count)
+
+    @patch('balancer.fetch_order_status')
+    @patch('balancer.sleep')
+    def test_wait_for_fill_uses_streamed_order_updates(self, mock_sleep, mock_fetch_order_status):
+        balancer.CONF = self.create_default_conf()
+        balancer.FEED = mock.MagicMock()
+        balancer.FEED.get_order_status.side_effect = [None, 'open', 'closed']
+        clock = [1000.0]
+        mock_sleep.side_effect = lambda seconds: clock.__setitem__(0, clock[0] + seconds)
+
+        with patch('balancer.time.time', side_effect=lambda: clock[0]):
+            status = balancer.wait_for_fill(balancer.Order({'id': 'o1', 'side': 'buy', 'price': 1, 'amount': 1}))
+        balancer.FEED = None
+
+        self.assertEqual('closed', status)
+        self.assertEqual(1003.0, clock[0])
+        mock_fetch_order_status.assert_not_called()
+
+    @patch('balancer.cancel_order')
+    def test_keep_or_cancel_keeps_order_for_repricing(self, mock_cancel_order):
+        balancer.CONF = self.create_default_conf()
+        balancer.CONF.reprice_orders = True
+        balancer.EXCHANGE = mock.MagicMock()
+        balancer.EXCHANGE.has = {'editOrder': True}
+        order = balancer.Order({'id': 'o1', 'side': 'buy', 'price': 9000, 'amount': 0.1, 'datetime': '2021-08-16'})
+
+        self.assertIsNone(balancer.keep_or_cancel(order, 1))
+        self.assertEqual(order, balancer.OPEN_ORDER)
+        mock_cancel_order.assert_not_called()
+
+        balancer.keep_or_cancel(order, balancer.CONF.trade_trials)
+        mock_cancel_order.assert_called_with(order)
+        balancer.OPEN_ORDER = None
+
+    @patch('balancer.create_buy_order')
+    def test_place_limit_order_reprices_open_order(self, mock_create_buy_order):
+        balancer.CONF = self.create_default_conf()
+        balancer.LOG = mock.MagicMock()
+        balancer.EXCHANGE = mock.MagicMock()
+        balancer.EXCHANGE.edit_order.return_value = {'id': 'o2', 'price': 9100, 'amount': 0.1, 'side': None}
+        balancer.OPEN_ORDER = balancer.Order({'id': 'o1', 'side': 'buy', 'price': 9000, 'amount': 0.1,
+                                              'datetime': '2021-08-16'})
+
+        order = balancer.place_limit_order('buy', 9100, 0.1, None)
+
+        balancer.EXCHANGE.edit_order.assert_called_with('o1', 'BTC/EUR', 'limit', 'buy', 0.1, 9100)
+        mock_create_buy_order.assert_not_called()
+        self.assertEqual('o2', order.id)
+        self.assertEqual('buy', order.side)
+        self.assertIsNone(balancer.OPEN_ORDER)
+
+    @patch('balancer.create_sell_order')
+    @patch('balancer.cancel_order', return_value=None)
+    def test_place_limit_order_cancels_open_order_of_other_side(self, mock_cancel_order, mock_create_sell_order):
+        balancer.CONF = self.create_default_conf()
+        balancer.EXCHANGE = mock.MagicMock()
+        open_order = balancer.Order({'id': 'o1', 'side': 'buy', 'price': 9000, 'amount': 0.1, 'datetime': '2021-08-16'})
+        balancer.OPEN_ORDER = open_order
+
+        balancer.place_limit_order('sell', 9100, 0.1, None)
+
+        mock_cancel_order.assert_called_with(open_order)
+        mock_create_sell_order.assert_called_with(9100, 0.1, None)
+        balancer.EXCHANGE.edit_order.assert_not_called()
+        self.assertIsNone(balancer.OPEN_ORDER)
+
+    @patch('balancer.record_fill')
+    @patch('balancer.create_sell_order')
+    @patch('balancer.cancel_order')
+    def test_place_limit_order_records_fill_of_other_side(self, mock_cancel_order, mock_create_sell_order,
+                                                         mock_record_fill):
+        open_order = balancer.Order({'id': 'o1', 'side': 'buy', 'price': 9000, 'amount': 0.1, 'datetime': '2021-08-16'})
+        mock_cancel_order.return_value = open_order
+        balancer.OPEN_ORDER = open_order
+
+        order = balancer.place_limit_order('sell', 9100, 0.1, None)
+
+        mock_record_fill.assert_called_with(open_order)
+        mock_create_sell_order.assert_called_with(9100, 0.1, None)
+        self.assertIs(mock_create_sell_order.return_value, order)
+
+    @patch('balancer.record_fill')
+    @patch('balancer.create_buy_order')
+    @patch('balancer.cancel_order')
+    @patch('balancer.reprice_order', return_value=None)
+    def test_place_limit_order_returns_fill_of_same_side(self, mock_reprice_order, mock_cancel_order,
+                                                        mock_create_buy_order, mock_record_fill):
+        open_order = balancer.Order({'id': 'o1', 'side': 'buy', 'price': 9000, 'amount': 0.1, 'datetime': '2021-08-16'})
+        mock_cancel_order.return_value = open_order
+        balancer.OPEN_ORDER = open_order
+
+        order = balancer.place_limit_order('buy', 9100, 0.1, None)
+
+        self.assertIs(open_order, order)
+        mock_record_fill.assert_not_called()
+        mock_create_buy_order.assert_not_called()
+
     @patch('balancer.logging')
     @mock.patch.object(ccxt.kraken, 'cancel_order')
-    @mock.patch.object(ccxt.kraken, 'fetch_order_status')
-    def test_cancel_order_success(self, mock_fetch_order_status, mock_cancel_order, mock_logging):
+    @mock.patch.object(ccxt.kraken, 'fetch_order')
+    def test_cancel_order_success(self, mock_fetch_order, mock_cancel_order, mock_logging):
         balancer.CONF = self.create_default_conf()
         balancer.CONF.test = False
         balancer.LOG = mock_logging
@@ -992,7 +2436,7 @@ class BalancerTest(unittest.TestCase):
                                  'datetime': datetime.datetime.today().isoformat()})
 
         return_values = {'s1o': 'open', 'b2c': 'canceled'}
-        mock_fetch_order_status.side_effect = return_values.get
+        mock_fetch_order.side_effect = lambda order_id, symbol: {'id': order_id, 'status': return_values.get(order_id)}
 
         return1 = balancer.cancel_order(order1)
         mock_cancel_order.assert_called()
@@ -1004,8 +2448,8 @@ class BalancerTest(unittest.TestCase):
 
     @patch('balancer.logging')
     @mock.patch.object(ccxt.kraken, 'cancel_order')
-    @mock.patch.object(ccxt.kraken, 'fetch_order_status')
-    def test_cancel_order_already_filled(self, mock_fetch_order_status, mock_cancel_order, mock_logging):
+    @mock.patch.object(ccxt.kraken, 'fetch_order')
+    def test_cancel_order_already_filled(self, mock_fetch_order, mock_cancel_order, mock_logging):
         balancer.CONF = self.create_default_conf()
         balancer.CONF.test = False
         balancer.LOG = mock_logging
@@ -1015,7 +2459,7 @@ class BalancerTest(unittest.TestCase):
                                  'datetime': datetime.datetime.today().isoformat()})
 
         return_values = {'s1o': 'filled'}
-        mock_fetch_order_status.side_effect = return_values.get
+        mock_fetch_order.side_effect = lambda order_id, symbol: {'id': order_id, 'status': return_values.get(order_id)}
 
         return1 = balancer.cancel_order(order1)
         mock_cancel_order.assert_not_called()
@@ -1023,8 +2467,8 @@ class BalancerTest(unittest.TestCase):
 
     @patch('balancer.logging')
     @mock.patch.object(ccxt.kraken, 'cancel_order')
-    @mock.patch.object(ccxt.kraken, 'fetch_order_status')
-    def test_cancel_order_not_found_already_filled(self, mock_fetch_order_status, mock_cancel_order, mock_logging):
+    @mock.patch.object(ccxt.kraken, 'fetch_order')
+    def test_cancel_order_not_found_already_filled(self, mock_fetch_order, mock_cancel_order, mock_logging):
         balancer.CONF = self.create_default_conf()
         balancer.CONF.test = False
         balancer.LOG = mock_logging
@@ -1034,7 +2478,7 @@ class BalancerTest(unittest.TestCase):
                                  'datetime': datetime.datetime.today().isoformat()})
 
         return_values = {'s1o': 'open'}
-        mock_fetch_order_status.side_effect = return_values.get
+        mock_fetch_order.side_effect = lambda order_id, symbol: {'id': order_id, 'status': return_values.get(order_id)}
         mock_cancel_order.side_effect = ccxt.OrderNotFound('kraken cancelOrder() error {"error":["EOrder:Unknown order"]}')
 
         return1 = balancer.cancel_order(order1)
@@ -1042,8 +2486,8 @@ class BalancerTest(unittest.TestCase):
 
     @patch('balancer.logging')
     @mock.patch.object(ccxt.bitmex, 'cancel_order')
-    @mock.patch.object(ccxt.bitmex, 'fetch_order_status')
-    def test_cancel_order_not_found_already_filled_bitmex(self, mock_fetch_order_status, mock_cancel_order, mock_logging):
+    @mock.patch.object(ccxt.bitmex, 'fetch_order')
+    def test_cancel_order_not_found_already_filled_bitmex(self, mock_fetch_order, mock_cancel_order, mock_logging):
         balancer.CONF = self.create_default_conf()
         balancer.CONF.exchange = 'bitmex'
         balancer.LOG = mock_logging
@@ -1053,12 +2497,120 @@ class BalancerTest(unittest.TestCase):
                                  'datetime': datetime.datetime.today().isoformat()})
 
         return_values = {'s1o': 'open'}
-        mock_fetch_order_status.side_effect = return_values.get
+        mock_fetch_order.side_effect = lambda order_id, symbol: {'id': order_id, 'status': return_values.get(order_id)}
         mock_cancel_order.side_effect = ccxt.OrderNotFound('bitmex cancelOrder() failed: Unable to cancel order due to existing state: Filled')
 
         return1 = balancer.cancel_order(order1)
         self.assertEqual(order1, return1)
 
+    def test_get_adapter_is_created_once_per_exchange(self):
+        balancer.CONF = self.create_default_conf()
+        balancer.EXCHANGE = mock.MagicMock()
+        balancer.ADAPTER = None
+
+        adapter = balancer.get_adapter()
+
+        self.assertIsInstance(adapter, balancer.KrakenAdapter)
+        self.assertIs(adapter, balancer.get_adapter())
+        balancer.CONF.exchange = 'coinbase'
+        self.assertIsInstance(balancer.get_adapter(), balancer.CoinbaseAdapter)
+        balancer.CONF.exchange = 'unknown'
+        self.assertIs(type(balancer.get_adapter()), balancer.ExchangeAdapter)
+
+    @patch('balancer.sleep_for')
+    def test_bitmex_adapter_trades_fiat_amounts(self, mock_sleep_for):
+        balancer.CONF.exchange = 'bitmex'
+        adapter = balancer.BitmexAdapter(mock.MagicMock())
+
+        self.assertEqual(10000.5, adapter.round_price(10000.3))
+        self.assertEqual((0.1, 1000, 1000), adapter.order_amounts(0.1, None, 10000))
+        self.assertEqual((None, 5000), adapter.split_amount(4960))
+        self.assertEqual(50000, adapter.notional_amount(50000, 10000))
+
+    def test_spot_adapter_trades_crypto_amounts(self):
+        adapter = balancer.ExchangeAdapter(mock.MagicMock())
+
+        self.assertEqual(10000.3, adapter.round_price(10000.3))
+        self.assertEqual((0.1, None, 0.1), adapter.order_amounts(0.1, None, 10000))
+        self.assertEqual(5, adapter.notional_amount(50000, 10000))
+
+    def test_kraken_adapter_prefers_futures_wallet(self):
+        adapter = balancer.KrakenAdapter(mock.MagicMock())
+
+        self.assertEqual('XBT.F', adapter.balance_key('BTC', {'BTC': {'total': 1}, 'XBT.F': {'total': 2}}))
+        self.assertEqual('BTC', adapter.balance_key('BTC', {'BTC': {'total': 1}, 'XBT.F': {'total': 0}}))
+
+    @patch('balancer.sleep_for')
+    def test_submit_order_looks_up_lost_order_before_resending(self, mock_sleep_for):
+        balancer.CONF.exchange = 'binance'
+        balancer.EXCHANGE.create_limit_sell_order.side_effect = ccxt.RequestTimeout('timeout')
+        balancer.EXCHANGE.fetch_open_orders.side_effect = lambda symbol: [
+            {'id': 'o1', 'clientOrderId': balancer.EXCHANGE.create_limit_sell_order.call_args.args[3]['clientOrderId'],
+             'side': 'sell', 'price': 14000, 'amount': 0.025, 'datetime': '2021-08-16'}]
+        balancer.EXCHANGE.fetch_closed_orders.return_value = []
+
+        order = balancer.create_sell_order(14000, 0.025, None)
+
+        self.assertEqual('o1', order.id)
+        balancer.EXCHANGE.create_limit_sell_order.assert_called_once()
+
+    @patch('balancer.sleep_for')
+    def test_submit_order_resends_with_same_client_order_id(self, mock_sleep_for):
+        balancer.CONF.exchange = 'binance'
+        balancer.EXCHANGE.create_limit_buy_order.side_effect = [
+            ccxt.RequestTimeout('timeout'),
+            {'id': 'o2', 'side': 'buy', 'price': 9000, 'amount': 0.025, 'datetime': '2021-08-16'}]
+        balancer.EXCHANGE.fetch_open_orders.return_value = []
+        balancer.EXCHANGE.fetch_closed_orders.return_value = []
+
+        order = balancer.create_buy_order(9000, 0.025, None)
+
+        self.assertEqual('o2', order.id)
+        first, second = balancer.EXCHANGE.create_limit_buy_order.call_args_list
+        self.assertEqual(first.args[3], second.args[3])
+        self.assertNotEqual(first.args[3], balancer.client_order_id('buy', 0.025, 9000))
+
+    def test_kraken_adapter_tags_orders_with_userref(self):
+        adapter = balancer.KrakenAdapter(mock.MagicMock())
+
+        params = adapter.order_params('buy', 'ffffffff0000')
+
+        self.assertEqual({'userref': 0x7fffffff, 'oflags': 'fcib'}, params)
+
+    def test_adapter_probes_capabilities(self):
+        exchange = mock.MagicMock()
+        exchange.has = {'fetchOrder': True, 'cancelAllOrders': 'emulated', 'editOrder': False}
+
+        adapter = balancer.ExchangeAdapter(exchange)
+
+        self.assertTrue(adapter.can_fetch_order)
+        self.assertTrue(adapter.can_cancel_all)
+        self.assertFalse(adapter.can_edit)
+
+    def test_adapter_fetch_order_status_falls_back_to_order_lists(self):
+        balancer.CONF = self.create_default_conf()
+        exchange = mock.MagicMock()
+        exchange.has = {'fetchOrder': False}
+        exchange.fetch_open_orders.return_value = [{'id': 'o1'}]
+        exchange.fetch_closed_orders.return_value = [{'id': 'c1', 'status': 'closed'}]
+        adapter = balancer.ExchangeAdapter(exchange)
+
+        self.assertEqual('open', adapter.fetch_order_status('o1'))
+        self.assertEqual('closed', adapter.fetch_order_status('c1'))
+        self.assertEqual('unknown', adapter.fetch_order_status('x1'))
+        exchange.fetch_order_status.assert_not_called()
+        self.assertIsNone(adapter.cancel_all_orders())
+
+    def test_bitmex_adapter_fetches_balance_of_margin_currency_only(self):
+        balancer.CONF = self.create_default_conf()
+        balancer.CONF.exchange = 'bitmex'
+        exchange = mock.MagicMock()
+        adapter = balancer.BitmexAdapter(exchange)
+
+        adapter.fetch_balance()
+
+        exchange.fetch_balance.assert_called_with({'currency': 'XBt'})
+
     @patch('balancer.logging')
     @patch('ccxt.kraken')
     def test_get_closed_orders_should_return_most_recent_order(self, mock_kraken, mock_logging):
@@ -1098,7 +2650,8 @@ class BalancerTest(unittest.TestCase):
 
         balancer.create_sell_order(sell_price, amount_crypto, None)
 
-        mock_kraken.create_limit_sell_order.assert_called_with(balancer.CONF.pair, amount_crypto, sell_price)
+        mock_kraken.create_limit_sell_order.assert_called_with(balancer.CONF.pair, amount_crypto, sell_price,
+                                                               {'userref': mock.ANY})
 
     @patch('balancer.logging')
     @patch('ccxt.bitmex')
@@ -1114,7 +2667,8 @@ class BalancerTest(unittest.TestCase):
 
         balancer.create_sell_order(sell_price, amount_crypto, None)
 
-        mock_bitmex.create_limit_sell_order.assert_called_with(balancer.CONF.symbol, round(amount_crypto * sell_price, -2), sell_price)
+        mock_bitmex.create_limit_sell_order.assert_called_with(balancer.CONF.symbol, round(amount_crypto * sell_price, -2), sell_price,
+                                                               {'clientOrderId': mock.ANY})
 
     @patch('balancer.logging')
     @patch('ccxt.bitmex')
@@ -1130,7 +2684,8 @@ class BalancerTest(unittest.TestCase):
 
         balancer.create_sell_order(sell_price, None, amount_fiat)
 
-        mock_bitmex.create_limit_sell_order.assert_called_with(balancer.CONF.symbol, round(amount_fiat, -2), sell_price)
+        mock_bitmex.create_limit_sell_order.assert_called_with(balancer.CONF.symbol, round(amount_fiat, -2), sell_price,
+                                                               {'clientOrderId': mock.ANY})
 
     @patch('balancer.logging')
     @patch('ccxt.kraken')
@@ -1145,7 +2700,8 @@ class BalancerTest(unittest.TestCase):
 
         balancer.create_buy_order(buy_price, amount_crypto, None)
 
-        mock_kraken.create_limit_buy_order.assert_called_with(balancer.CONF.pair, amount_crypto, buy_price, {'oflags': 'fcib'})
+        mock_kraken.create_limit_buy_order.assert_called_with(balancer.CONF.pair, amount_crypto, buy_price,
+                                                              {'userref': mock.ANY, 'oflags': 'fcib'})
 
     def test_evaluate_mayer_buy(self):
         advice = balancer.evaluate_mayer({'current': 1, 'average': 1.5})
@@ -1400,6 +2956,18 @@ class BalancerTest(unittest.TestCase):
 
         mock_update_deposits.assert_called_with(1.5)
 
+    @mock.patch.object(balancer, 'ExchangeConfig')
+    @patch('balancer.update_deposits')
+    @patch('balancer.get_net_deposits', return_value=None)
+    def test_check_net_deposits_unavailable(self, mock_get_net_deposits, mock_update_deposits, mock_exchange_config):
+        balancer.CONF.exchange = 'bitmex'
+        balancer.CONF.reference_net_deposits = 1.0
+
+        conf = balancer.check_deposits()
+
+        self.assertIs(balancer.CONF, conf)
+        mock_update_deposits.assert_not_called()
+
     @mock.patch.object(balancer, 'ExchangeConfig')
     @patch('balancer.update_deposits')
     @patch('balancer.get_net_deposits', return_value=1.5)
@@ -1507,6 +3075,118 @@ class BalancerTest(unittest.TestCase):
         mock_logging.error.assert_called()
         mock_send_mail.assert_called_with('Deactivated RB ' + balancer.INSTANCE, message)
 
+    @patch('balancer.sleep_for')
+    def test_scheduler_runs_jobs_in_order_of_their_due_time(self, mock_sleep_for):
+        scheduler = balancer.Scheduler()
+        runs = []
+        now = time.time()
+
+        def job(name: str, every: float, times: int):
+            def run():
+                runs.append(name)
+                return time.time() + every if runs.count(name) < times else None
+            return run
+
+        scheduler.schedule('slow', job('slow', 1000, 5), now + 10)
+        scheduler.schedule('fast', job('fast', 1, 3), now)
+
+        scheduler.run()
+
+        self.assertEqual(['fast', 'fast', 'fast'], runs)
+        self.assertEqual('slow', scheduler.jobs[0][2])
+        self.assertGreater(mock_sleep_for.call_args_list[1].args[0], 0)
+
+    def test_scheduler_reschedules_job(self):
+        scheduler = balancer.Scheduler()
+        scheduler.schedule('report', mock.MagicMock(), time.time() + 3600)
+        scheduler.schedule('rebalance', mock.MagicMock(), time.time() + 600)
+
+        scheduler.reschedule('report')
+
+        self.assertEqual('report', scheduler.jobs[0][2])
+        self.assertLessEqual(scheduler.jobs[0][0], time.time())
+
+    @patch('balancer.daily_report')
+    def test_run_daily_report_schedules_next_day(self, mock_daily_report):
+        due = balancer.run_daily_report()
+
+        mock_daily_report.assert_called_once()
+        tomorrow = datetime.datetime.utcnow().date() + datetime.timedelta(days=1)
+        self.assertEqual(datetime.datetime(tomorrow.year, tomorrow.month, tomorrow.day, 12, 2,
+                                           tzinfo=datetime.timezone.utc).timestamp(), due)
+
+    @patch('balancer.daily_report', side_effect=balancer.RetriesExhausted('fetch_balance', 12))
+    def test_run_daily_report_postpones_on_exchange_errors(self, mock_daily_report):
+        balancer.CONF.period_in_seconds = 600
+
+        self.assertAlmostEqual(time.time() + 600, balancer.run_daily_report(), 0)
+
+    def test_first_report_time(self):
+        due = datetime.datetime.fromtimestamp(balancer.first_report_time(), datetime.timezone.utc)
+
+        self.assertEqual(datetime.time(12, 2), due.time())
+        self.assertGreater(due.timestamp(), time.time() - 23 * 60)
+        self.assertLess(due.timestamp(), time.time() + 86400)
+
+    @patch('balancer.cancel_ladder')
+    @patch('balancer.check_deposits')
+    def test_run_deposit_check_rebalances_after_deposit(self, mock_check_deposits, mock_cancel_ladder):
+        balancer.SCHEDULER = balancer.Scheduler()
+        balancer.SCHEDULER.schedule('rebalance', mock.MagicMock(), time.time() + 600)
+        conf = balancer.CONF
+        mock_check_deposits.return_value = mock.MagicMock()
+
+        balancer.run_deposit_check()
+
+        self.assertIsNot(conf, balancer.CONF)
+        mock_cancel_ladder.assert_called_once()
+        self.assertLessEqual(balancer.SCHEDULER.jobs[0][0], time.time())
+        balancer.CONF = conf
+
+    @patch('balancer.cancel_ladder')
+    @patch('balancer.check_deposits')
+    def test_run_deposit_check_without_deposit(self, mock_check_deposits, mock_cancel_ladder):
+        mock_check_deposits.return_value = balancer.CONF
+
+        self.assertAlmostEqual(time.time() + balancer.DEPOSIT_CHECK_SECONDS, balancer.run_deposit_check(), 0)
+
+        mock_cancel_ladder.assert_not_called()
+
+    @patch('balancer.calculate_period', return_value=300)
+    @patch('balancer.cancel_ladder')
+    @patch('balancer.is_ladder_outdated', return_value=False)
+    @patch('balancer.is_ladder_resting', return_value=True)
+    def test_rebalance_leaves_resting_ladder_alone(self, mock_is_ladder_resting, mock_is_ladder_outdated,
+                                                   mock_cancel_ladder, mock_calculate_period):
+        self.assertAlmostEqual(time.time() + 300, balancer.rebalance(), 0)
+
+        mock_cancel_ladder.assert_not_called()
+
+    @patch('balancer.calculate_period', return_value=300)
+    @patch('balancer.do_buy')
+    @patch('balancer.calculate_action', return_value=None)
+    @patch('balancer.cancel_ladder')
+    @patch('balancer.is_ladder_resting', return_value=False)
+    def test_rebalance_without_action(self, mock_is_ladder_resting, mock_cancel_ladder, mock_calculate_action,
+                                      mock_do_buy, mock_calculate_period):
+        with tempfile.TemporaryDirectory() as data_dir:
+            balancer.DATA_DIR = data_dir + os.path.sep
+
+            self.assertAlmostEqual(time.time() + 300, balancer.rebalance(), 0)
+        balancer.DATA_DIR = ''
+
+        mock_cancel_ladder.assert_called_once()
+        mock_do_buy.assert_not_called()
+
+    @patch('balancer.abandon_cycle')
+    @patch('balancer.is_ladder_resting', side_effect=balancer.RetriesExhausted('get_open_orders', 12))
+    def test_rebalance_abandons_cycle_on_exchange_errors(self, mock_is_ladder_resting, mock_abandon_cycle):
+        balancer.CONF.period_in_seconds = 600
+
+        self.assertAlmostEqual(time.time() + 600, balancer.rebalance(), 0)
+
+        mock_abandon_cycle.assert_called_once()
+
     def test_is_due_date(self):
         balancer.CONF = self.create_default_conf()
         day = datetime.date.replace(datetime.date.today(), 2020, 2, 28)
@@ -1539,6 +3219,48 @@ class BalancerTest(unittest.TestCase):
         balancer.CONF.report = 'T'
         self.assertTrue(balancer.is_due_date(day))
 
+    def test_volatility_estimator_variance_per_second(self):
+        estimator = balancer.VolatilityEstimator(3600)
+        for timestamp, price in [(0, 10000), (3000, 10100), (4000, 10000), (4100, 10100)]:
+            with patch('balancer.time.time', return_value=timestamp):
+                estimator.observe(price)
+
+        self.assertEqual([10100, 10000, 10100], [price for _, price in estimator.prices])
+        self.assertAlmostEqual(2 * math.log(1.01) ** 2 / 1100, estimator.variance_per_second())
+        self.assertEqual(10100, estimator.last_price())
+
+    def test_volatility_estimator_needs_three_prices(self):
+        estimator = balancer.VolatilityEstimator(3600)
+        estimator.observe(10000)
+        estimator.observe(10100)
+
+        self.assertIsNone(estimator.variance_per_second())
+
+    def test_calculate_period_within_configured_range(self):
+        balancer.CONF.min_period_in_seconds = 60
+        balancer.CONF.max_period_in_seconds = 3600
+        balancer.CONF.tolerance_in_percent = 2
+        balancer.VOLATILITY = mock.MagicMock()
+        balancer.VOLATILITY.last_price.return_value = 10000
+
+        balancer.VOLATILITY.variance_per_second.return_value = 1e-9
+        self.assertEqual(3600, balancer.calculate_period())
+
+        balancer.VOLATILITY.variance_per_second.return_value = 1e-4
+        self.assertEqual(60, balancer.calculate_period())
+
+        balancer.VOLATILITY.variance_per_second.return_value = 1e-7
+        self.assertEqual(1000, balancer.calculate_period())
+
+        balancer.BAND = {'low': 9900, 'high': 11000, 'timestamp': time.time()}
+        self.assertEqual(round(math.log(10000 / 9900) ** 2 / 4 / 1e-7), balancer.calculate_period())
+
+    def test_calculate_period_fixed_without_range(self):
+        balancer.VOLATILITY = mock.MagicMock()
+        balancer.VOLATILITY.variance_per_second.return_value = 1e-4
+
+        self.assertEqual(600, balancer.calculate_period())
+
     def test_sleep_for(self):
         before = time.time()
 
@@ -1624,6 +3346,18 @@ class BalancerTest(unittest.TestCase):
         conf.max_leverage_in_percent = 160
         conf.tolerance_in_percent = 2
         conf.period_in_minutes = 10
+        conf.period_in_seconds = 600
+        conf.min_period_in_seconds = 600
+        conf.max_period_in_seconds = 600
+        conf.ticker_max_age_seconds = 10
+        conf.mayer_file = ''
+        conf.reprice_orders = False
+        conf.ladder_steps = 0
+        conf.slice_notional = 0
+        conf.slice_mode = 'TWAP'
+        conf.slice_window_minutes = 30
+        conf.reconcile_minutes = 0
+        conf.trigger_band_minutes = 0
         conf.stop_buy = False
         conf.stop_sell = False
         conf.backtrade_only_on_profit = False
@@ -1636,5 +3370,23 @@ class BalancerTest(unittest.TestCase):
         return conf
 
 
+class StreamStandIn:
+    """
+    Local stand-in for a ccxt.pro websocket exchange
+    """
+
+    async def watch_ticker(self, symbol: str):
+        await asyncio.sleep(0.01)
+        return {'symbol': symbol, 'bid': 30000}
+
+    async def watch_orders(self, symbol: str):
+        await asyncio.sleep(0.01)
+        return [{'id': 'o1', 'symbol': symbol, 'status': 'closed'}]
+
+    async def watch_positions(self, symbols: list):
+        await asyncio.sleep(0.01)
+        return [{'info': {'symbol': symbols[0], 'currentQty': 500}}]
+
+
 if __name__ == '__main__':
     unittest.main()